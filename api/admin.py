@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt
 from database import User, ChatSession, ChatMessage, db
 from sqlalchemy import func
 from datetime import datetime
+from services import get_services
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -80,9 +81,7 @@ def list_sessions():
     sessions = ChatSession.query.order_by(ChatSession.start_time.desc()).limit(20).all()
     session_list = []
     
-    # Lazy Initialization
-    from response_generation.summarizer import HeuristicSummarizer
-    summarizer = HeuristicSummarizer()
+    summarizer = get_services().summarizer
 
     try:
         updated_any = False
@@ -133,3 +132,37 @@ def list_sessions():
         db.session.rollback()
         
     return jsonify(session_list)
+
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def pipeline_metrics():
+    if not is_admin():
+        return jsonify({"msg": "Admins only!"}), 403
+
+    svc = get_services()
+    prediction_cache = None
+    classifier_cascade = None
+    if svc.registry.is_loaded("text_classifier"):
+        prediction_cache = svc.classifier.prediction_cache.stats()
+        classifier_cascade = svc.classifier.cascade_stats.snapshot()
+
+    return jsonify({
+        "embedding_batcher": svc.embedding_batcher.stats(),
+        "embedding_cache": svc.embedding_cache.stats(),
+        "prediction_cache": prediction_cache,
+        "classifier_cascade": classifier_cascade,
+        "write_behind": svc.write_behind.stats(),
+        "memory": svc.memory.stats(),
+        "memory_lifecycle": svc.memory_lifecycle.stats(),
+        "audio_vad": svc.audio_prep.vad_stats.snapshot() if svc.audio_prep.vad is not None else None,
+        "streaming": svc.streaming_stats.snapshot(),
+        "asr_pool": svc.audio_prep.pool.stats()
+    })
+
+@admin_bp.route('/models', methods=['GET'])
+@jwt_required()
+def model_status():
+    if not is_admin():
+        return jsonify({"msg": "Admins only!"}), 403
+
+    return jsonify(get_services().registry.status())
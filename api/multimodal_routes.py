@@ -1,43 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
-import os
 import json
+import time
 import numpy as np
 import uuid
 from datetime import datetime
 
-# Processing Modules
-from input_preprocessing.sync_controller import SyncController
-from input_preprocessing.video_preprocess import VideoPreprocessor
-from input_preprocessing.audio_processor import AudioProcessor # Assuming this exists or I'll stub it
-from feature_extraction.text_features import TextFeatureExtractor
-from classification.hybrid_classifier import HybridClassifier
-from response_generation.cbt_engine import CBTEngine
-from response_generation.summarizer import HeuristicSummarizer # Import Summarizer
-from contextual_memory.chroma_manager import ContextualMemory
 from database import db, ChatSession, ChatMessage, User, Assessment
 from sqlalchemy.exc import IntegrityError
 from config import config
+from input_preprocessing.asr_pool import ASRBusy
+from input_preprocessing.audio_decode import decode_audio
+from input_preprocessing.streaming_asr import StreamingTranscriber
+from input_preprocessing.vad import EnergyVAD
+from keyword_scanner import SCANNER
+from stream_spool import StreamSpool
+from services import get_services
 
 multimodal_bp = Blueprint('multimodal', __name__)
 
-# Initialize Processors
-sync_ctrl = SyncController()
-video_prep = VideoPreprocessor()
-audio_prep = AudioProcessor() 
-# text_extractor = TextFeatureExtractor()
-# classifier = HybridClassifier()
-cbt = CBTEngine()
-summarizer = HeuristicSummarizer() # Initialize
-# memory = ContextualMemory(config.CHROMA_DB_PATH)
-
-# Re-using singletons from routes.py would be better in a production appFactory, 
-# but for this structure we'll re-instantiate or import. 
-# Better pattern: Import from a common 'extensions.py' or 'services.py'.
-# For now, to avoid refactoring the whole app, I will re-import classes but 
-# be aware of memory usage (loading BERT twice is bad).
-# OPTIMIZATION: I should assume they are singletons or lightweight.
+# Processors, CBT engine, summarizer and the text encoder/classifier come from the
+# shared ServiceContainer (run.create_app), so BERT is only ever loaded once.
 
 @multimodal_bp.route('/multimodal_session/start', methods=['POST'])
 @jwt_required(optional=True)
@@ -95,6 +78,8 @@ def end_session():
         try:
             session = ChatSession.query.get(int(session_id))
             if session:
+                # Summarize what was said, including turns still in the write-behind queue
+                get_services().write_behind.wait_for_user(session.user_id)
                 # Generate Summary
                 messages = ChatMessage.query.filter_by(session_id=session.id).all()
                 
@@ -111,7 +96,7 @@ def end_session():
                     except:
                        pass
                 
-                summary_text = summarizer.generate_summary(messages, final_state)
+                summary_text = get_services().summarizer.generate_summary(messages, final_state)
                 
                 session.end_time = datetime.utcnow()
                 session.summary = summary_text
@@ -125,111 +110,99 @@ def end_session():
             
     return jsonify({"status": "not_found"}), 404
 
-@multimodal_bp.route('/multimodal_input', methods=['POST'])
-@jwt_required(optional=True) 
-def multimodal_input():
-    # 1. Validation
-    if 'audio' not in request.files:
-        print("!!! ERROR: No audio file in request")
-        return jsonify({'error': 'No audio file provided'}), 400
-
-    audio_file = request.files['audio']
-    video_frames = request.files.getlist('frames')
-    metadata = request.form.get('metadata')
-    session_id = request.form.get('session_id')  # New: Get session ID
-
-    # Debug logs...
-    
-    current_user_id = get_jwt_identity()
-    # If session is guest, current_user_id might be None, which is fine.
+def _analyze_audio(svc, audio, text=None):
+    """
+    Transcript, prosodic features and text embedding for one decoded
+    16 kHz buffer. `text` skips ASR when the transcript is already known
+    (streaming turns transcribe while the audio arrives).
+    """
+    # Energy VAD: leading/trailing silence trimmed, no ASR call for a clip without speech
+    speech = svc.audio_prep.detect_speech(audio)
     
-    # 2. Parallel Processing Definition
-    def process_audio(f):
-        # Save temp
-        filename = secure_filename(f.filename)
-        path = os.path.join('/tmp', filename)
-        f.save(path)
-        
-        
+    if text is None:
         # TRANSCRIPTION (Real Whisper)
-        # Use global audio_prep to retrieve cached model
-        text = audio_prep.transcribe(path)
-        
-        # Audio Features (Real Librosa)
-        audio_features = audio_prep.extract_prosodic_features(path)
-        
-        # Audio Features (Librosa)
-        # audio_features = ...
-        
-        # BERT Embeddings
-        # text_features = text_extractor.get_embedding(text)
-        
-        return {
-            "text": text,
-            "text_features": np.zeros(768), # Stub
-            "audio_features": audio_features, # Pass features for prediction
-            "audio_emotion": None # Will be filled by classifier
-        }
+        # Shared audio_prep (Whisper weights live in the model registry)
+        text = svc.audio_prep.transcribe(speech if speech is not None else audio)
+    
+    # Audio Features (Real Librosa), same buffer, untrimmed: rf_audio.pkl is
+    # trained on whole clips (train_audio_model.py), so pauses and silence
+    # ratio must look the same here. VAD only gates and trims ASR.
+    audio_features = svc.audio_prep.extract_prosodic_features(audio)
+    
+    # BERT Embeddings (lazy, shared encoder; only computed if the classifier needs them)
+    clean_text = svc.text_cleaner.clean_text(text)
+    
+    return {
+        "text": text,
+        "clean_text": clean_text,
+        "text_features": svc.shared_encoder.encode(clean_text),
+        "audio_features": audio_features, # Pass features for prediction
+        "audio_emotion": None # Will be filled by classifier
+    }
 
-    def process_video(frame_list):
-        emotions = []
-        for frame in frame_list:
-            res = video_prep.extract_face_emotions(frame.read())
-            if res:
-                emotions.append(res)
+def _frame_emotions(svc, frame_list):
+    emotions = []
+    for frame in frame_list:
+        res = svc.video_prep.extract_face_emotions(frame.read())
+        if res:
+            emotions.append(res)
+    return emotions
+
+def _average_emotions(emotions):
+    # Aggregate
+    if not emotions:
+        return {"Neutral": 1.0}
         
-        # Aggregate
-        if not emotions:
-            return {"Neutral": 1.0}
-            
-        # Average probabilities
-        avg_emotion = {}
-        for k in emotions[0].keys():
-            avg_emotion[k] = sum(d[k] for d in emotions) / len(emotions)
-            
-        return avg_emotion
+    # Average probabilities
+    avg_emotion = {}
+    for k in emotions[0].keys():
+        avg_emotion[k] = sum(d[k] for d in emotions) / len(emotions)
+        
+    return avg_emotion
 
-    # 3. Execute Parallel
-    try:
-        audio_res, video_res = sync_ctrl.process_parallel(
-            audio_func=process_audio,
-            video_func=process_video,
-            audio_args=(audio_file,),
-            video_args=(video_frames,)
-        )
-    except Exception as e:
-        return jsonify({"error": f"Processing failed: {str(e)}"}), 500
+# Sanitize for JSON (Convert numpy types)
+def clean_obj(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {k: clean_obj(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [clean_obj(i) for i in obj]
+    return obj
 
+def _respond(svc, audio_res, video_res, session_id):
+    """
+    Fusion, CBT response and the persisted turn for one utterance; shared by
+    /multimodal_input and the streaming turns. Returns the JSON-ready reply.
+    """
     # 4. Fusion & Decision (Weighted Average)
     # Weights: Text=0.4, Video=0.4, Audio(Prosody)=0.2
     
-    # Text Analysis (Simple keyword heuristic + BERT in real flow)
-    # Since text_features stub is zeros, we use the text content directly for strong cues
-    text_cues = {
-        "Sadness": 1.0 if any(w in audio_res['text'].lower() for w in ['sad', 'down', 'depressed', 'cry', 'heavy']) else 0.0,
-        "Anxiety": 1.0 if any(w in audio_res['text'].lower() for w in ['anxious', 'worry', 'scared', 'panic']) else 0.0,
-        "Stress": 1.0 if any(w in audio_res['text'].lower() for w in ['stress', 'overwhelmed', 'tired', 'busy']) else 0.0,
-        "Happy": 1.0 if any(w in audio_res['text'].lower() for w in ['happy', 'good', 'great', 'joy']) else 0.0
-    }
+    # Text Analysis (keyword heuristic + the same text classifier as /api/chat)
+    cue_hits = SCANNER.categories(audio_res['text'])
+    text_cues = {label: 1.0 if f"cue:{label}" in cue_hits else 0.0 for label in ("Sadness", "Anxiety", "Stress", "Happy")}
+    if audio_res.get('clean_text'):
+        text_probs = svc.classifier.predict(audio_res['text_features'], text=audio_res['clean_text'])
+        # Strong keyword cues still win; the classifier fills in what keywords miss
+        text_cues["Sadness"] = max(text_cues["Sadness"], text_probs.get("Sadness", 0), text_probs.get("Depression", 0))
+        text_cues["Anxiety"] = max(text_cues["Anxiety"], text_probs.get("Anxiety", 0))
+        text_cues["Stress"] = max(text_cues["Stress"], text_probs.get("Stress", 0))
     
     # Video Analysis (Normalized from DeepFace)
     # DeepFace keys: 'sad', 'angry', 'surprise', 'fear', 'happy', 'disgust', 'neutral'
     vid = video_res
     
-    # Load Audio Model (Lazy Load)
-    import joblib
+    # Load Audio Model (Lazy Load via model registry)
     audio_probs = {"Neutral": 0.5} # Default
     if audio_res.get('audio_features') is not None:
-        model_path = os.path.join("models", "rf_audio.pkl")
-        if os.path.exists(model_path):
+        if svc.registry.is_registered("audio_rf"):
             try:
-                if not hasattr(multimodal_input, "audio_model"):
-                    multimodal_input.audio_model = joblib.load(model_path)
+                audio_model = svc.registry.get("audio_rf")
                 
                 # Predict
                 feats = audio_res['audio_features'].reshape(1, -1)
-                probs = multimodal_input.audio_model.predict_proba(feats)[0]
-                classes = multimodal_input.audio_model.classes_
+                probs = audio_model.predict_proba(feats)[0]
+                classes = audio_model.classes_
                 audio_probs = dict(zip(classes, probs))
             except Exception as e:
                 print(f"Audio prediction failed: {e}")
@@ -258,7 +231,8 @@ def multimodal_input():
          risk = "High"
     elif detected_state in ["Sadness", "Anxiety", "Stress", "fear", "Fear", "sad", "Sad"]:
          risk = "Medium"
-    
+
+
     # 5. Response Generation with Context
     # Use global cbt engine
     
@@ -270,6 +244,8 @@ def multimodal_input():
         try:
             current_session = ChatSession.query.get(int(session_id))
             if current_session:
+                # Read-your-writes: the previous turn may still be queued
+                svc.write_behind.wait_for_user(current_session.user_id)
                 # Fetch recent messages
                 recent_msgs = ChatMessage.query.filter_by(session_id=current_session.id)\
                                 .order_by(ChatMessage.timestamp.desc())\
@@ -287,59 +263,36 @@ def multimodal_input():
     # Use stub if no history
     conversation_history = conversation_history_text if conversation_history_text else None
     
-    response_text = cbt.get_cbt_response(detected_state, risk, conversation_history=conversation_history, user_input=audio_res['text'])
+    response_text = svc.cbt_engine.get_cbt_response(detected_state, risk, conversation_history=conversation_history, user_input=audio_res['text'])
     
-    # Update Database with New Turn
+    # Update Database with New Turn (write-behind: journaled now, committed in the background)
     if current_session:
         try:
-            # 1. User Message
-            user_msg = ChatMessage(
-                session_id=current_session.id,
-                sender='user',
-                content_text=audio_res['text'],
-                metadata_json=json.dumps({
-                    "audio_emotion": audio_res.get('audio_emotion', {}),
-                    "video_emotion": clean_obj(video_res)
-                })
-            )
-            db.session.add(user_msg)
-            
-            # 2. Bot Message
-            bot_msg = ChatMessage(
-                session_id=current_session.id,
-                sender='bot',
-                content_text=response_text,
-                metadata_json=json.dumps({
-                    "state": detected_state,
-                    "risk_level": risk
-                })
+            svc.write_behind.submit(
+                current_session.user_id,
+                messages=[
+                    # 1. User Message
+                    dict(session_id=current_session.id, sender='user', content_text=audio_res['text'],
+                         metadata_json=json.dumps({
+                             "audio_emotion": clean_obj(audio_res.get('audio_emotion') or {}),
+                             "video_emotion": clean_obj(video_res)
+                         })),
+                    # 2. Bot Message
+                    dict(session_id=current_session.id, sender='bot', content_text=response_text,
+                         metadata_json=json.dumps({
+                             "state": detected_state,
+                             "risk_level": risk
+                         }))
+                ],
+                # 3. Assessment Record (for analytics)
+                assessments=[
+                    dict(user_id=current_session.user_id, predicted_state=detected_state,
+                         risk_level=risk, confidence_score=0.85) # Placeholder confidence
+                ]
             )
-            db.session.add(bot_msg)
-            
-            # 3. Assessment Record (for analytics)
-            assessment = Assessment(
-                user_id=current_session.user_id,
-                predicted_state=detected_state,
-                risk_level=risk,
-                confidence_score=0.85 # Placeholder confidence
-            )
-            db.session.add(assessment)
-            
-            db.session.commit()
-            print(f"[Session] Persisted DB turn for Session {session_id}")
+            print(f"[Session] Queued DB turn for Session {session_id}")
         except Exception as e:
             print(f"[Session] Failed to persist turn: {e}")
-            db.session.rollback()
-
-    # Sanitize for JSON (Convert numpy types)
-    def clean_obj(obj):
-        if isinstance(obj, np.generic):
-            return obj.item()
-        if isinstance(obj, dict):
-            return {k: clean_obj(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [clean_obj(i) for i in obj]
-        return obj
 
     final_resp = {
         "response": response_text,
@@ -352,4 +305,197 @@ def multimodal_input():
         }
     }
 
-    return jsonify(clean_obj(final_resp))
+    return clean_obj(final_resp)
+
+def _asr_busy(retry_after, message="Speech recognition is busy, please retry"):
+    resp = jsonify({"error": message, "retry_after": retry_after})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
+
+@multimodal_bp.route('/multimodal_input', methods=['POST'])
+@jwt_required(optional=True) 
+def multimodal_input():
+    # 1. Validation
+    if 'audio' not in request.files:
+        print("!!! ERROR: No audio file in request")
+        return jsonify({'error': 'No audio file provided'}), 400
+
+    audio_file = request.files['audio']
+    video_frames = request.files.getlist('frames')
+    metadata = request.form.get('metadata')
+    session_id = request.form.get('session_id')  # New: Get session ID
+
+    # Debug logs...
+    
+    svc = get_services()
+    current_user_id = get_jwt_identity()
+    # If session is guest, current_user_id might be None, which is fine.
+
+    # Admission control: reject before decoding anything when ASR is saturated
+    if svc.audio_prep.pool.saturated():
+        return _asr_busy(svc.audio_prep.pool.retry_after())
+    
+    # 2. Parallel Processing Definition
+    def process_audio(f):
+        # Decode once, straight from the request stream: one 16 kHz float32
+        # buffer, no temp file (concurrent uploads can't collide on a filename)
+        return _analyze_audio(svc, svc.audio_prep.load_audio(f.stream))
+
+    def process_video(frame_list):
+        return _average_emotions(_frame_emotions(svc, frame_list))
+
+    # 3. Execute Parallel
+    try:
+        audio_res, video_res = svc.sync_ctrl.process_parallel(
+            audio_func=process_audio,
+            video_func=process_video,
+            audio_args=(audio_file,),
+            video_args=(video_frames,)
+        )
+    except ASRBusy as e:
+        return _asr_busy(e.retry_after, str(e))
+    except Exception as e:
+        return jsonify({"error": f"Processing failed: {str(e)}"}), 500
+
+    return jsonify(_respond(svc, audio_res, video_res, session_id))
+
+# --- Streaming turns ---------------------------------------------------------
+# POST /multimodal_stream/start            -> {"stream_id"}
+# POST /multimodal_stream/<id>/chunk        audio bytes (+ optional 'frames'), final=1 on the last one
+# GET  /multimodal_stream/<id>/events       SSE: partial / end_of_speech / response (or no_speech / error)
+# The stream id is the capability for the chunk and event calls (the SSE
+# request can't carry the Authorization header from an EventSource).
+
+# Raw s16le 16 kHz mono (what the frontend sends), or MediaRecorder fragments (webm/ogg)
+# from browsers without AudioWorklet
+STREAM_FORMATS = ("container", "pcm16")
+# Container streams re-decode everything received; wait at least this many times
+# the last decode before the next one, so ffmpeg gets a bounded share of a CPU
+CONTAINER_DECODE_BACKOFF = 4
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(clean_obj(payload))}\n\n"
+
+def _open_spool(stream_id):
+    try:
+        spool = StreamSpool(config.STREAM_SPOOL_DIR, stream_id)
+    except ValueError:
+        return None
+    return spool if spool.exists() else None
+
+@multimodal_bp.route('/multimodal_stream/start', methods=['POST'])
+@jwt_required(optional=True)
+def start_stream():
+    data = request.get_json(silent=True) or {}
+    stream_format = data.get('format', 'container')
+    if stream_format not in STREAM_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(STREAM_FORMATS)}"}), 400
+    svc = get_services()
+    if svc.audio_prep.pool.saturated():
+        return _asr_busy(svc.audio_prep.pool.retry_after())
+    spool = StreamSpool.create(config.STREAM_SPOOL_DIR, format=stream_format,
+                               session_id=data.get('session_id'), user_id=get_jwt_identity())
+    return jsonify({"stream_id": spool.stream_id})
+
+@multimodal_bp.route('/multimodal_stream/<stream_id>/chunk', methods=['POST'])
+def stream_chunk(stream_id):
+    spool = _open_spool(stream_id)
+    if spool is None:
+        return jsonify({"status": "not_found"}), 404
+
+    if request.files:
+        audio = request.files.get('audio')
+        spool.write_audio(audio.read() if audio else b"")
+        # Frames are scored as they arrive, so the reply doesn't wait for them
+        spool.write_frames(_frame_emotions(get_services(), request.files.getlist('frames')))
+    else:
+        spool.write_audio(request.get_data())
+    if request.values.get('final') == '1':
+        spool.mark_final()
+    return jsonify({"status": "ok"})
+
+@multimodal_bp.route('/multimodal_stream/<stream_id>/events', methods=['GET'])
+def stream_events(stream_id):
+    spool = _open_spool(stream_id)
+    if spool is None:
+        return jsonify({"status": "not_found"}), 404
+    if not spool.acquire():
+        return jsonify({"error": "Stream already has a listener"}), 409
+    svc = get_services()
+
+    def generate():
+        try:
+            yield from _run_stream(svc, spool, spool.meta())
+        except ASRBusy as e:
+            yield _sse("error", {"error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"[Stream] {stream_id} failed: {e}")
+            yield _sse("error", {"error": str(e)})
+        finally:
+            spool.remove()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _run_stream(svc, spool, meta):
+    """
+    Transcribes the spooled upload while it grows and replies as soon as the
+    utterance ends (server-detected pause, the client's final chunk, or a
+    timeout): by then only the last speech segment is left to decode.
+    """
+    transcriber = StreamingTranscriber(svc.audio_prep, svc.audio_prep.vad or EnergyVAD(),
+                                       partial_interval_s=config.STREAM_PARTIAL_INTERVAL_MS / 1000.0,
+                                       end_silence_ms=config.STREAM_END_SILENCE_MS)
+    pcm = meta.get('format') == 'pcm16'
+    poll = config.STREAM_POLL_MS / 1000.0
+    remainder = b""
+    decode_seconds = 0.0
+    started = last_chunk = decoded_at = time.monotonic()
+    size = 0
+    partials = 0
+    yield _sse("ready", {"stream_id": spool.stream_id})
+
+    while True:
+        now = time.monotonic()
+        final = spool.finished  # Read before the audio so the last chunk is included
+        if spool.audio_size() != size:
+            size, last_chunk = spool.audio_size(), now
+        timed_out = now - last_chunk > config.STREAM_IDLE_TIMEOUT or now - started > config.STREAM_MAX_SECONDS
+        if spool.has_new_audio():
+            if pcm:
+                data = remainder + spool.read_audio()
+                usable = len(data) - len(data) % 2
+                remainder = data[usable:]
+                transcriber.append(np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0)
+            elif final or timed_out or now - decoded_at >= max(transcriber.interval / float(transcriber.sr),
+                                                               CONTAINER_DECODE_BACKOFF * decode_seconds):
+                # Container fragments only decode as a whole stream (the prefix doesn't
+                # change), so each decode costs more than the last: space them out
+                try:
+                    transcriber.replace(decode_audio(spool.read_audio(everything=True)))
+                except ValueError:
+                    pass  # Not enough of the container yet
+                decoded_at = time.monotonic()
+                decode_seconds = decoded_at - now
+
+        events = transcriber.update(final=final or timed_out)
+        for event, payload in events:
+            partials += event == "partial"
+            yield _sse(event, payload)
+        if transcriber.ended:
+            break
+        time.sleep(poll)
+
+    if not transcriber.text:
+        # Nothing was said (or the client gave up): no turn to answer
+        yield _sse("no_speech", {})
+        return
+
+    # `now` is when the utterance was known to be over; the last decode is part of the wait
+    audio_res = _analyze_audio(svc, transcriber.audio, text=transcriber.text)
+    video_res = _average_emotions(spool.frame_emotions())
+    reply = _respond(svc, audio_res, video_res, meta.get('session_id'))
+    yield _sse("response", reply)
+    svc.streaming_stats.record(partials, transcriber.decodes, len(transcriber.audio) / float(transcriber.sr),
+                               time.monotonic() - now)
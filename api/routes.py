@@ -1,38 +1,66 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db, ChatSession, ChatMessage, Assessment, User
 from config import config
 
-# Module Imports
-from input_preprocessing.text_clean import TextPreprocessor
-from feature_extraction.text_features import TextFeatureExtractor
-from classification.hybrid_classifier import HybridClassifier
-from classification.risk_assessor import RiskAssessor
-from response_generation.cbt_engine import CBTEngine
-from response_generation.safety_guard import SafetyGuard
-from contextual_memory.chroma_manager import ContextualMemory
+from keyword_scanner import SCANNER
+from services import get_services
+from stage_graph import StageGraph
 
 api_bp = Blueprint('api', __name__)
 
-# Initialize singletons (In real app, might want to do this in app factory)
-# Models are lazy loaded inside classes usually, but good to init here
-text_cleaner = TextPreprocessor()
-feature_extractor = TextFeatureExtractor() # This loads BERT, might take a sec
-classifier = HybridClassifier()
-risk_assessor = RiskAssessor()
-cbt_engine = CBTEngine()
-safety_guard = SafetyGuard()
-memory_manager = ContextualMemory(config.CHROMA_DB_PATH)
+# Pipeline singletons (cleaner, encoder, classifier, memory, ...) live in the
+# ServiceContainer built once in run.create_app and shared with the other blueprints.
+
+def _with_app_context(app):
+    # Stage threads need their own app context (and therefore their own DB session)
+    def wrap(fn):
+        def run(inputs):
+            with app.app_context():
+                return fn(inputs)
+        return run
+    return wrap
+
+def _resolve_session(user_id, session_id=None):
+    """
+    Finds (or creates) the user's chat session and fetches its recent history.
+    Returns (session_id, conversation_history); safe to run on a stage thread.
+    """
+    session = None
+    
+    if session_id:
+        session = ChatSession.query.filter_by(id=session_id, user_id=user_id).first()
+        
+    if not session:
+        # Fallback to latest ACTIVE session
+        session = ChatSession.query.filter_by(user_id=user_id, end_time=None).order_by(ChatSession.start_time.desc()).first()
+        
+    if not session:
+        from datetime import datetime
+        session = ChatSession(user_id=user_id, start_time=datetime.utcnow())
+        db.session.add(session)
+        db.session.commit()
+
+    # Read-your-writes: the user's previous turn may still be in the write-behind queue
+    get_services().write_behind.wait_for_user(user_id)
+    conversation_history = []
+    recent_msgs = ChatMessage.query.filter_by(session_id=session.id).order_by(ChatMessage.timestamp.desc()).limit(6).all()
+    for msg in reversed(recent_msgs):
+        role = "User" if msg.sender == "user" else "Assistant"
+        conversation_history.append({"role": role, "content": msg.content_text, "detected_state": "Unknown"})
+
+    return session.id, conversation_history
 
 @api_bp.route('/chat', methods=['POST'])
 @jwt_required()
 def chat():
+    svc = get_services()
     current_user_id = get_jwt_identity()
     data = request.get_json()
     raw_message = data.get('message', '')
     
     # 1. Safety Check
-    is_safe, warning = safety_guard.is_safe(raw_message)
+    is_safe, warning = svc.safety_guard.is_safe(raw_message)
     if not is_safe:
          return jsonify({
             "response": "I cannot continue this conversation due to safety concerns. Please contact emergency services.",
@@ -40,71 +68,82 @@ def chat():
          })
 
     # 2. Input Preprocessing
-    clean_text = text_cleaner.clean_text(raw_message)
+    clean_text = svc.text_cleaner.clean_text(raw_message)
+    
+    # 3. Encoding (Text Only for this endpoint)
+    # Lazy and computed at most once per message: the RF branch and memory
+    # retrieval resolve it only if they need it (the cascade may decide on
+    # keywords alone, a user without memories has nothing to search)
+    features = svc.shared_encoder.encode(clean_text)
     
-    # 3. Context Retrieval (RAG)
-    # Get last 3 relevant memories
-    context = memory_manager.retrieve_context(current_user_id, clean_text)
+    # 4-7. Independent stages run concurrently; latency ~ slowest stage, not the sum
+    trace = {}
+    graph = StageGraph(svc.stage_pool, wrap=_with_app_context(current_app._get_current_object()))
     
-    # 4. Feature Extraction (Text Only for this endpoint)
-    # Real app would handle multimodal here if file uploaded
-    features = feature_extractor.get_embedding(clean_text)
+    # Context Retrieval (RAG): get last 3 relevant memories
+    def retrieve(_):
+        svc.write_behind.wait_for_user(current_user_id)  # include the previous turn's memory
+        return svc.memory.retrieve_context(current_user_id, clean_text, query_embedding=features)
+    graph.add("retrieve", retrieve, timeout=config.CHAT_RETRIEVAL_TIMEOUT, fallback=[])
+    # Session Resolution + History for the context-aware rule engine
+    graph.add("session",
+              lambda _: _resolve_session(current_user_id, data.get('session_id')),
+              timeout=config.CHAT_SESSION_TIMEOUT, fallback=None)
+    # Encoding + Classification
+    graph.add("classify",
+              lambda _: svc.classifier.predict(features, text=clean_text, trace=trace),
+              timeout=config.CHAT_CLASSIFY_TIMEOUT, fallback={"Normal": 1.0})
+    results = graph.run()
+    
+    context = results["retrieve"]
+    probs = results["classify"]
+    if results["session"] is None and "session" in graph.timed_out:
+        # Never start a second resolution next to one that is still running:
+        # both could create a ChatSession. Wait for the original instead.
+        try:
+            results["session"] = graph.timed_out["session"].result()
+        except Exception as e:
+            print(f"[Chat] session stage failed after its timeout: {e}")
+    if results["session"] is None:
+        # Session stage failed (or never started): we can't answer without one, do it inline
+        results["session"] = _resolve_session(current_user_id, data.get('session_id'))
+    session_id, conversation_history = results["session"]
     
-    # 5. Classification
-    probs = classifier.predict(features, text=clean_text)
+    trace["materialized"] = features.materialized
+    trace["timings_ms"] = features.timings_ms
+    trace["stages"] = graph.report
+    print(f"[Chat] trace: {trace}")
     # Determine dominant state
     predicted_state = max(probs, key=probs.get) if probs else "Normal"
     
-    # 6. Risk Assessment
+    # 8. Risk Assessment
     # Simple keyword count for demo (in real app, more complex NLP)
-    risk_keywords = ["sad", "hopeless", "dark"]
-    risk_count = sum(1 for w in risk_keywords if w in clean_text)
-    risk_level, risk_score = risk_assessor.calculate_risk(probs, risk_count)
+    risk_count = len(SCANNER.phrases(clean_text, "risk"))
+    risk_level, risk_score = svc.risk_assessor.calculate_risk(probs, risk_count)
     
-    # 7. Session Resolution (Moved up)
-    session_id = data.get('session_id')
-    session = None
-    
-    if session_id:
-        session = ChatSession.query.filter_by(id=session_id, user_id=current_user_id).first()
-        
-    if not session:
-        # Fallback to latest ACTIVE session
-        session = ChatSession.query.filter_by(user_id=current_user_id, end_time=None).order_by(ChatSession.start_time.desc()).first()
-        
-    if not session:
-        from datetime import datetime
-        session = ChatSession(user_id=current_user_id, start_time=datetime.utcnow())
-        db.session.add(session)
-        db.session.flush()
-
-    # 8. Response Generation
-    # History for Context-Aware Rule Engine
-    conversation_history = []
-    if session.id:
-        recent_msgs = ChatMessage.query.filter_by(session_id=session.id).order_by(ChatMessage.timestamp.desc()).limit(6).all()
-        for msg in reversed(recent_msgs):
-            role = "User" if msg.sender == "user" else "Assistant"
-            conversation_history.append({"role": role, "content": msg.content_text, "detected_state": "Unknown"})
-
-    response_text = cbt_engine.get_cbt_response(predicted_state, risk_level, conversation_history, user_input=raw_message)
-    
-    # 9. Save Interaction to SQL DB
-    user_msg = ChatMessage(session_id=session.id, sender="user", content_text=raw_message)
-    db.session.add(user_msg)
+    # 9. Response Generation
+    response_text = svc.cbt_engine.get_cbt_response(predicted_state, risk_level, conversation_history, user_input=raw_message)
     
-    bot_msg = ChatMessage(session_id=session.id, sender="bot", content_text=response_text, 
-                          metadata_json=f'{{"state": "{predicted_state}", "risk": "{risk_level}"}}')
-    db.session.add(bot_msg)
-    
-    # 9. Save Assessment
-    assessment = Assessment(user_id=current_user_id, predicted_state=predicted_state, risk_level=risk_level, confidence_score=risk_score)
-    db.session.add(assessment)
-    
-    # 10. Save to Chroma Memory
-    memory_manager.add_memory(current_user_id, clean_text, {"state": predicted_state})
-    
-    db.session.commit()
+    # 10-12. Persist the turn (messages, assessment, Chroma memory) via the
+    # write-behind queue: journaled now, group-committed in the background.
+    # The memory reuses the embedding if this request computed one; otherwise
+    # it is encoded with the rest of the batch, off the request path
+    memory_embedding = features.get("embedding") if features.is_materialized("embedding") else None
+    svc.write_behind.submit(
+        current_user_id,
+        messages=[
+            dict(session_id=session_id, sender="user", content_text=raw_message),
+            dict(session_id=session_id, sender="bot", content_text=response_text,
+                 metadata_json=f'{{"state": "{predicted_state}", "risk": "{risk_level}"}}')
+        ],
+        assessments=[
+            dict(user_id=current_user_id, predicted_state=predicted_state, risk_level=risk_level,
+                 confidence_score=risk_score)
+        ],
+        memories=[
+            dict(text=clean_text, metadata={"state": predicted_state}, embedding=memory_embedding)
+        ]
+    )
     
     return jsonify({
         "response": response_text,
@@ -127,6 +166,7 @@ def upload_audio():
 @jwt_required()
 def get_chat_history():
     current_user_id = get_jwt_identity()
+    get_services().write_behind.wait_for_user(current_user_id)
     
     # Fetch last 50 messages across all sessions for this user
     # Join with ChatSession to filter by user_id
@@ -160,6 +200,7 @@ def get_chat_history():
 @jwt_required()
 def get_user_analytics():
     current_user_id = get_jwt_identity()
+    get_services().write_behind.wait_for_user(current_user_id)
     
     # Fetch all assessments for this user
     assessments = Assessment.query.filter_by(user_id=current_user_id).order_by(Assessment.timestamp.asc()).all()
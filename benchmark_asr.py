@@ -0,0 +1,137 @@
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from input_preprocessing.asr_backends import ASR_BACKENDS, create_asr_backend
+from input_preprocessing.audio_decode import SAMPLE_RATE, decode_audio
+
+DATASET_DIR = "dataset/asr"  # <name>.wav with the reference transcript in <name>.txt
+ENGINES = [
+    "openai-whisper:base",
+    "faster-whisper:base:int8",
+    "faster-whisper:distil-small.en:int8",
+    "transformers:distil-whisper/distil-small.en",
+]
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """
+    Word-level edit distance (substitutions + deletions + insertions).
+    """
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_dataset(data_dir, limit=None):
+    samples = []
+    for wav in sorted(glob.glob(os.path.join(data_dir, "*.wav")))[:limit]:
+        txt = os.path.splitext(wav)[0] + ".txt"
+        if os.path.exists(txt):
+            with open(txt) as f:
+                samples.append((wav, f.read().strip()))
+    return samples
+
+
+def parse_engine(spec):
+    backend, _, rest = spec.partition(":")
+    model, _, compute_type = rest.partition(":")
+    return backend, model, compute_type or "int8"
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0  # bytes on macOS, KiB on Linux
+
+
+def run_engine(spec, data_dir, limit, threads, beam_size):
+    # Runs in its own process so peak RSS belongs to this engine alone
+    backend, model_name, compute_type = parse_engine(spec)
+    samples = load_dataset(data_dir, limit)
+    audio = [decode_audio(path, sr=SAMPLE_RATE) for path, _ in samples]
+    engine = create_asr_backend(backend, model_name, compute_type=compute_type, beam_size=beam_size,
+                                cpu_threads=threads)
+    started = time.perf_counter()
+    model = engine.load()
+    load_s = time.perf_counter() - started
+    engine.transcribe(model, audio[0][:SAMPLE_RATE])  # warmup
+
+    errors = words = 0
+    decode_s = 0.0
+    for (_, reference), clip in zip(samples, audio):
+        started = time.perf_counter()
+        text = engine.transcribe(model, clip)
+        decode_s += time.perf_counter() - started
+        ref_words = normalize(reference)
+        errors += word_errors(ref_words, normalize(text))
+        words += len(ref_words)
+    audio_s = sum(len(clip) for clip in audio) / SAMPLE_RATE
+    return {
+        "engine": spec,
+        "clips": len(samples),
+        "audio_s": round(audio_s, 1),
+        "load_s": round(load_s, 2),
+        "rtf": round(decode_s / audio_s, 4) if audio_s else None,
+        "wer": round(errors / words, 4) if words else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time factor, WER and peak RSS per ASR engine.")
+    parser.add_argument("--data", default=DATASET_DIR, help="Directory of <name>.wav + <name>.txt pairs")
+    parser.add_argument("--engines", nargs="+", default=ENGINES,
+                        help=f"backend:model[:compute_type], backends: {', '.join(ASR_BACKENDS)}")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N clips")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (faster-whisper; 0 = default)")
+    parser.add_argument("--beam-size", type=int, default=1)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_engine(args.worker, args.data, args.limit, args.threads, args.beam_size)))
+        return
+
+    samples = load_dataset(args.data, args.limit)
+    if not samples:
+        print(f"No <name>.wav + <name>.txt pairs found in '{args.data}'.")
+        return
+    print(f"{len(samples)} clips from {args.data}")
+
+    print("| engine | load s | RTF | WER | peak RSS MB |")
+    print("|---|---|---|---|---|")
+    for spec in args.engines:
+        backend = parse_engine(spec)[0]
+        if backend not in ASR_BACKENDS or not ASR_BACKENDS[backend].available():
+            print(f"| {spec} | skipped: {ASR_BACKENDS[backend].module if backend in ASR_BACKENDS else backend} "
+                  f"not installed | | | |")
+            continue
+        cmd = [sys.executable, __file__, "--worker", spec, "--data", args.data,
+               "--threads", str(args.threads), "--beam-size", str(args.beam_size)]
+        if args.limit:
+            cmd += ["--limit", str(args.limit)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"| {spec} | failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode} | | | |")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"| {spec} | {r['load_s']} | {r['rtf']} | {r['wer']} | {r['peak_rss_mb']} |")
+    print("\nRTF = decode seconds / audio seconds (lower is faster; < 1 is faster than real time).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from input_preprocessing.audio_decode import MAX_CLIP_SECONDS, SAMPLE_RATE, decode_audio
+
+
+def before(data, name):
+    # Old /multimodal_input path: temp file, Whisper's loader, then librosa at 22.05 kHz
+    import librosa
+    import whisper
+    path = os.path.join(tempfile.gettempdir(), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    asr_input = whisper.load_audio(path)
+    y, sr = librosa.load(path, duration=MAX_CLIP_SECONDS)
+    return asr_input, y
+
+
+def after(data, name):
+    audio = decode_audio(data, sr=SAMPLE_RATE)
+    return audio, audio[:int(MAX_CLIP_SECONDS * SAMPLE_RATE)]
+
+
+def timed_ms(fn, data, name, repeats):
+    fn(data, name)  # warmup
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(data, name)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return float(np.percentile(timings, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode cost per /multimodal_input upload, before and after.")
+    parser.add_argument("audio", help="A recorded upload (webm / wav / ogg ...)")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.audio, "rb") as f:
+        data = f.read()
+    name = os.path.basename(args.audio)
+    print(f"{name}: {len(data) / 1024:.0f} KiB, {args.repeats} repeats")
+    print("| path | decodes | bytes written to disk | p50 ms |")
+    print("|---|---|---|---|")
+    print(f"| temp file + whisper.load_audio + librosa.load | 2 | {len(data)} | "
+          f"{timed_ms(before, data, name, args.repeats):.1f} |")
+    print(f"| decode_audio from the request bytes | 1 | 0 | {timed_ms(after, data, name, args.repeats):.1f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from classification.forest_compiler import CompiledForest, parity_probe
+
+MODEL_DIR = "models"
+MODELS = {"rf_emotion": 768, "rf_audio": 15}  # name -> feature count when training a stand-in
+BATCH_SIZES = [1, 32, 1024]
+
+
+def synthetic_forest(n_features, seed=0):
+    # Same hyperparameters as train_text_model.py / train_audio_model.py
+    from sklearn.ensemble import RandomForestClassifier
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((3000, n_features)).astype(np.float32)
+    y = rng.choice(["Anxiety", "Depression", "Normal", "Stress"], size=len(X))
+    return RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y)
+
+
+def timed_ms(fn, X, repeats):
+    fn(X)  # warmup
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(X)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return float(np.percentile(timings, 50))
+
+
+def check(name, model, args):
+    # Flat-array walk only, and as served (batches above max_compiled_rows go back to sklearn)
+    compiled = CompiledForest(model, max_compiled_rows=None)
+    served = CompiledForest(model)
+    X = parity_probe(model, rows=max(BATCH_SIZES))
+    reference = model.predict_proba(X)
+    got = compiled.predict_proba(X)
+    max_diff = float(np.abs(reference - got).max())
+    agreement = float((reference.argmax(axis=1) == got.argmax(axis=1)).mean())
+    print(f"\n{name}: {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}, "
+          f"{model.n_features_in_} features")
+    print(f"parity on {len(X)} probe rows: max |p_sklearn - p_compiled| = {max_diff:.2e}, argmax agreement {agreement:.4f}")
+
+    print("| batch | sklearn p50 (ms) | compiled p50 (ms) | speedup | served p50 (ms) |")
+    print("|---|---|---|---|---|")
+    for batch in BATCH_SIZES:
+        repeats = args.repeats if batch < 1024 else max(3, args.repeats // 10)
+        sk = timed_ms(model.predict_proba, X[:batch], repeats)
+        cf = timed_ms(compiled.predict_proba, X[:batch], repeats)
+        sv = timed_ms(served.predict_proba, X[:batch], repeats)
+        print(f"| {batch} | {sk:.2f} | {cf:.2f} | {sk / cf:.1f}x | {sv:.2f} |")
+    return max_diff <= args.tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and latency of compiled forests vs sklearn predict_proba.")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Benchmark stand-in forests even if trained models exist")
+    args = parser.parse_args()
+
+    ok = True
+    for name, n_features in MODELS.items():
+        path = os.path.join(MODEL_DIR, f"{name}.pkl")
+        if os.path.exists(path) and not args.synthetic:
+            model = joblib.load(path)
+        else:
+            print(f"\n{path} not found (or --synthetic): training a stand-in forest with {n_features} features")
+            model = synthetic_forest(n_features)
+        ok = check(name, model, args) and ok
+    print("\nPARITY OK" if ok else "\nPARITY FAILED")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
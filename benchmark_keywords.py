@@ -0,0 +1,125 @@
+import argparse
+import re
+import time
+
+import numpy as np
+
+from classification.cascade import KeywordLexicon, LEXICON, NEGATIONS
+from keyword_scanner import LEXICONS, KeywordScanner, SUBSTRING_CATEGORIES
+
+MESSAGES = [
+    "I have an exam tomorrow and I'm so anxious I can't sleep.",
+    "My boss keeps piling on work and I feel overwhelmed and tired.",
+    "Had a good day, went for a walk and felt happy.",
+    "Everything feels dark and hopeless lately, I just want to cry.",
+    "I feel so lonely since the breakup, nobody is around.",
+    "Sometimes I think about how I want to end it all.",
+    "The studies were fine, nothing special to report today.",
+    "I'm not anxious, just a bit restless and distracted while studying.",
+]
+CUE_LABELS = ("Sadness", "Anxiety", "Stress", "Happy")
+TOPIC_PATTERNS = [
+    (r"\b(exam|test|study|grade|fail)\b", "topic:academic"),
+    (r"\b(job|work|boss|career)\b", "topic:work"),
+    (r"\b(lonely|alone|isolated)\b", "topic:loneliness"),
+    (r"\b(sleep|tired|insomnia)\b", "topic:sleep"),
+    (r"\b(breakup|ex|relationship|sad)\b", "topic:relationship"),
+    (r"\b(die|kill|suicide|end it)\b", "topic:risk"),
+]
+
+
+class LegacyLexicon:
+    # KeywordLexicon before the shared scanner: its own alternation, no overlaps
+    def __init__(self, lexicon=LEXICON, smoothing=0.25):
+        self.lexicon, self.smoothing = lexicon, smoothing
+        phrases = sorted({p for cues in lexicon.values() for p in cues}, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(" + "|".join(re.escape(p) for p in phrases) + r")\b")
+        self._labels = {p: label for label, cues in lexicon.items() for p in cues}
+
+    def __call__(self, text):
+        text = text.lower()
+        hits = dict.fromkeys(self.lexicon, 0)
+        for match in self._pattern.finditer(text):
+            if NEGATIONS.intersection(text[max(0, match.start() - 20):match.start()].split()[-3:]):
+                return None
+            hits[self._labels[match.group(1)]] += 1
+        total = sum(hits.values())
+        if total == 0:
+            return None
+        return {label: (c + self.smoothing) / (total + self.smoothing * len(hits)) for label, c in hits.items()}
+
+
+def legacy(text, lexicon):
+    # The call sites as they were: one regex / substring sweep per keyword or topic
+    lower = text.lower()
+    unsafe = False
+    for word in LEXICONS["safety"]:
+        if re.search(r'\b' + re.escape(word) + r'\b', lower):
+            unsafe = True
+            break
+    risk = sum(1 for w in LEXICONS["risk"] if w in lower)
+    topic = None
+    for pattern, name in TOPIC_PATTERNS:
+        if re.search(pattern, lower):
+            topic = name
+            break
+    cues = {label: any(w in lower for w in LEXICONS[f"cue:{label}"]) for label in CUE_LABELS}
+    return unsafe, risk, topic, cues, lexicon(text)
+
+
+def scanned(text, scanner, lexicon):
+    categories = scanner.categories(text)
+    topic = next((name for _, name in TOPIC_PATTERNS if name in categories), None)
+    cues = {label: f"cue:{label}" in categories for label in CUE_LABELS}
+    return ("safety" in categories, len(scanner.phrases(text, "risk")), topic, cues, lexicon(text))
+
+
+def per_message_us(fn, texts, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        timings.append((time.perf_counter() - started) * 1e6 / len(texts))
+    return float(np.percentile(timings, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword matching per message: per-call-site regexes vs one scan.")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    uncached = KeywordScanner(LEXICONS, SUBSTRING_CATEGORIES, cache_size=0)
+    cached = KeywordScanner(LEXICONS, SUBSTRING_CATEGORIES)
+    legacy_lexicon = LegacyLexicon()
+    lexicon = KeywordLexicon()
+    lexicon.scanner = uncached
+    cached_lexicon = KeywordLexicon()
+    cached_lexicon.scanner = cached
+
+    for text in MESSAGES:
+        old, new = legacy(text, legacy_lexicon), scanned(text, uncached, lexicon)
+        if old != new:
+            fields = ("unsafe", "risk", "topic", "cues", "lexicon")
+            diff = {f: (a, b) for f, a, b in zip(fields, old, new) if a != b}
+            print(f"differs (old, new) on {text!r}: {diff}")
+
+    def one_scan(text):
+        # As served: a new message misses the cache once, the other call sites hit it
+        cached._cached_scan.cache_clear()
+        return scanned(text, cached, cached_lexicon)
+
+    runs = [
+        ("per call site (before)", lambda t: legacy(t, legacy_lexicon)),
+        ("shared scanner, every call site rescans", lambda t: scanned(t, uncached, lexicon)),
+        ("shared scanner, one scan per message", one_scan),
+    ]
+    print(f"\n{len(MESSAGES)} messages, {args.repeats} repeats; safety + risk + topics + cues + cascade lexicon")
+    print("| matcher | p50 us / message |")
+    print("|---|---|")
+    for name, fn in runs:
+        print(f"| {name} | {per_message_us(fn, MESSAGES, args.repeats):.1f} |")
+
+
+if __name__ == "__main__":
+    main()
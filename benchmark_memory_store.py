@@ -0,0 +1,157 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from contextual_memory.mmap_store import MmapVectorStore
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000.0 if values else 0.0
+
+
+def batches(args):
+    # Random unit vectors, generated batch by batch so 1M x 768 never sits in RAM at once
+    rng = np.random.default_rng(0)
+    for start in range(0, args.n, args.batch):
+        n = min(args.batch, args.n - start)
+        vectors = rng.standard_normal((n, args.dim), dtype=np.float32)
+        users = rng.integers(0, args.users, size=n)
+        yield start, vectors, users
+
+
+class MmapBackend:
+    name = "mmap"
+
+    def __init__(self, path, args):
+        self.args = args
+        self.store = MmapVectorStore(path, args.dim, dtype=args.dtype, segment_rows=args.segment_rows)
+
+    def add(self, start, vectors, users):
+        self.store.add_batch([str(u) for u in users], [f"m{start + i}" for i in range(len(vectors))],
+                             [f"doc {start + i}" for i in range(len(vectors))],
+                             [{"user_id": str(u)} for u in users], vectors)
+
+    def query(self, user, vector, k):
+        return self.store.search(str(user), vector, k)
+
+    @staticmethod
+    def reopen(path, args):
+        return MmapVectorStore(path, args.dim, dtype=args.dtype, segment_rows=args.segment_rows)
+
+
+class ChromaBackend:
+    name = "chroma"
+
+    def __init__(self, path, args):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            name="bench", metadata={"hnsw:space": "cosine"}, embedding_function=None)
+
+    def add(self, start, vectors, users):
+        self.collection.add(
+            ids=[f"m{start + i}" for i in range(len(vectors))],
+            documents=[f"doc {start + i}" for i in range(len(vectors))],
+            metadatas=[{"user_id": str(u)} for u in users],
+            embeddings=vectors.tolist())
+
+    def query(self, user, vector, k):
+        return self.collection.query(query_embeddings=[vector.tolist()], n_results=k,
+                                     where={"user_id": str(user)})
+
+    @staticmethod
+    def reopen(path, args):
+        import chromadb
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_collection(name="bench", embedding_function=None)
+        collection.count()
+        return collection
+
+
+def run_backend(cls, args):
+    path = tempfile.mkdtemp(prefix=f"bench_{cls.name}_", dir=args.dir)
+    try:
+        backend = cls(path, args)
+
+        add_times = []
+        started = time.perf_counter()
+        for start, vectors, users in batches(args):
+            t = time.perf_counter()
+            backend.add(start, vectors, users)
+            add_times.append(time.perf_counter() - t)
+            if (start // args.batch) % 100 == 0:
+                print(f"  {cls.name}: {start + len(vectors)}/{args.n} vectors")
+        add_total = time.perf_counter() - started
+
+        # Single-memory add: what one chat turn costs on the write path
+        rng = np.random.default_rng(1)
+        single_times = []
+        for i in range(args.queries):
+            vector = rng.standard_normal((1, args.dim), dtype=np.float32)
+            t = time.perf_counter()
+            backend.add(args.n + i, vector, np.array([i % args.users]))
+            single_times.append(time.perf_counter() - t)
+
+        query_times = []
+        for i in range(args.queries):
+            vector = rng.standard_normal(args.dim, dtype=np.float32)
+            t = time.perf_counter()
+            backend.query(int(rng.integers(0, args.users)), vector, args.k)
+            query_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        cls.reopen(path, args)
+        open_seconds = time.perf_counter() - t
+
+        return {
+            "backend": cls.name,
+            "vectors_per_s": args.n / add_total,
+            "batch_p95_ms": percentile(add_times, 95),
+            "single_add_p50_ms": percentile(single_times, 50),
+            "single_add_p95_ms": percentile(single_times, 95),
+            "query_p50_ms": percentile(query_times, 50),
+            "query_p95_ms": percentile(query_times, 95),
+            "open_ms": open_seconds * 1000.0
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add / query latency: memory-mapped store vs ChromaDB.")
+    parser.add_argument("--n", type=int, default=1000000, help="Vectors to insert")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--users", type=int, default=1000, help="Distinct users the vectors are spread over")
+    parser.add_argument("--batch", type=int, default=1000, help="Vectors per bulk add")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--segment-rows", type=int, default=65536)
+    parser.add_argument("--backends", nargs="+", default=["mmap", "chroma"], choices=["mmap", "chroma"])
+    parser.add_argument("--dir", default=None, help="Scratch directory (needs ~n*dim*4 bytes free)")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.backends:
+        cls = MmapBackend if name == "mmap" else ChromaBackend
+        try:
+            rows.append(run_backend(cls, args))
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"\n{args.n} vectors x {args.dim} dims, {args.users} users, k={args.k}, dtype={args.dtype}")
+    print("| backend | bulk add (vec/s) | bulk batch p95 (ms) | single add p50/p95 (ms) | query p50/p95 (ms) | open (ms) |")
+    print("|---|---|---|---|---|---|")
+    for r in rows:
+        print(f"| {r['backend']} | {r['vectors_per_s']:.0f} | {r['batch_p95_ms']:.1f} | "
+              f"{r['single_add_p50_ms']:.2f} / {r['single_add_p95_ms']:.2f} | "
+              f"{r['query_p50_ms']:.2f} / {r['query_p95_ms']:.2f} | {r['open_ms']:.0f} |")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    main()
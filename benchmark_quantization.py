@@ -0,0 +1,101 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from contextual_memory.mmap_store import MmapVectorStore
+from contextual_memory.quantization import bytes_per_vector
+from contextual_memory.vector_index import VectorIndex
+
+# (storage dtype, rerank dtype)
+CONFIGS = [("float32", None), ("float16", None), ("int8", None), ("int8", "float16"), ("int8", "float32")]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000.0 if values else 0.0
+
+
+def corpus(args):
+    # Clustered unit vectors: chat embeddings are topical, so neighbours are
+    # close together and small rounding errors can actually swap them
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+    labels = rng.integers(0, args.clusters, size=args.n)
+    vectors = centers[labels] + args.spread * rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, args.n, size=args.queries)
+    queries = vectors[picks] + args.spread * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def build(store_kind, path, dtype, rerank_dtype, args):
+    if store_kind == "mmap":
+        return MmapVectorStore(path, args.dim, dtype=dtype, segment_rows=args.segment_rows,
+                               rerank_dtype=rerank_dtype, rerank_factor=args.rerank_factor)
+    return VectorIndex(args.dim, dtype=dtype, rerank_dtype=rerank_dtype, rerank_factor=args.rerank_factor)
+
+
+def run(store_kind, dtype, rerank_dtype, vectors, queries, truth, args):
+    path = tempfile.mkdtemp(prefix="bench_quant_", dir=args.dir)
+    try:
+        store = build(store_kind, path, dtype, rerank_dtype, args)
+        for start in range(0, len(vectors), args.batch):
+            chunk = vectors[start:start + args.batch]
+            ids = [f"m{start + i}" for i in range(len(chunk))]
+            store.add_batch(["bench"] * len(chunk), ids, ids, [{"user_id": "bench"}] * len(chunk), chunk)
+
+        hits, times = 0, []
+        for query, expected in zip(queries, truth):
+            t = time.perf_counter()
+            results = store.search("bench", query, args.k)
+            times.append(time.perf_counter() - t)
+            hits += len({int(r[0][1:]) for r in results} & set(expected.tolist()))
+        return {
+            "config": dtype + (f" + {rerank_dtype} rerank" if rerank_dtype else ""),
+            "bytes": bytes_per_vector(args.dim, dtype, rerank_dtype, residual=store_kind == "index"),
+            "scan_bytes": bytes_per_vector(args.dim, dtype),
+            "recall": hits / (len(queries) * args.k),
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95)
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per memory, recall@k and query latency of quantized memory storage.")
+    parser.add_argument("--n", type=int, default=50000, help="Memories of one (heavy) user")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.05, help="Noise around each cluster center")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--store", default="index", choices=["index", "mmap"])
+    parser.add_argument("--segment-rows", type=int, default=65536)
+    parser.add_argument("--dir", default=None, help="Scratch directory for --store mmap")
+    args = parser.parse_args()
+
+    vectors, queries = corpus(args)
+    # Ground truth: exact float32 search
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    rows = []
+    for dtype, rerank_dtype in CONFIGS:
+        print(f"  {dtype} / rerank {rerank_dtype} ...")
+        rows.append(run(args.store, dtype, rerank_dtype, vectors, queries, truth, args))
+
+    print(f"\n{args.n} memories x {args.dim} dims ({args.store}), {args.queries} queries, "
+          f"recall@{args.k} vs exact float32, rerank shortlist {args.k * args.rerank_factor}")
+    print(f"| storage | bytes / memory | scanned bytes / memory | recall@{args.k} | query p50 / p95 (ms) |")
+    print("|---|---|---|---|---|")
+    for r in rows:
+        print(f"| {r['config']} | {r['bytes']} | {r['scan_bytes']} | {r['recall']:.4f} | {r['p50']:.2f} / {r['p95']:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmark_asr import DATASET_DIR, load_dataset, normalize, parse_engine, word_errors
+from input_preprocessing.asr_backends import create_asr_backend
+from input_preprocessing.audio_decode import SAMPLE_RATE, decode_audio
+from input_preprocessing.vad import EnergyVAD
+
+
+def transcribe_all(engine, model, clips, vad):
+    texts, timings = [], []
+    for clip in clips:
+        started = time.perf_counter()
+        if vad is None:
+            text = engine.transcribe(model, clip)
+        else:
+            speech = vad.detect(clip)
+            text = " ".join(engine.transcribe(model, chunk).strip() for chunk in speech.chunks)
+        timings.append(time.perf_counter() - started)
+        texts.append(text)
+    return texts, np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR latency and WER with and without energy VAD trimming.")
+    parser.add_argument("--data", default=DATASET_DIR, help="Directory of <name>.wav + <name>.txt pairs")
+    parser.add_argument("--engine", default="openai-whisper:base", help="backend:model[:compute_type]")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    samples = load_dataset(args.data, args.limit)
+    if not samples:
+        print(f"No <name>.wav + <name>.txt pairs found in '{args.data}'.")
+        return
+    clips = [decode_audio(path, sr=SAMPLE_RATE) for path, _ in samples]
+    references = [normalize(text) for _, text in samples]
+    vad = EnergyVAD()
+
+    speech = [vad.detect(clip) for clip in clips]
+    total_s = sum(s.total_seconds for s in speech)
+    kept_s = sum(s.kept_seconds for s in speech)
+    no_speech = sum(1 for s in speech if not s.has_speech)
+    print(f"{len(clips)} clips, {total_s:.1f} s of audio; VAD keeps {kept_s:.1f} s "
+          f"({100.0 * (1 - kept_s / total_s):.0f}% trimmed), {no_speech} clips without speech")
+
+    backend, model_name, compute_type = parse_engine(args.engine)
+    engine = create_asr_backend(backend, model_name, compute_type=compute_type)
+    model = engine.load()
+    engine.transcribe(model, clips[0][:SAMPLE_RATE])  # warmup
+
+    print(f"\n{args.engine}")
+    print("| input | mean ms / clip | p95 ms / clip | WER |")
+    print("|---|---|---|---|")
+    for name, detector in (("full clip", None), ("VAD-trimmed", vad)):
+        texts, timings = transcribe_all(engine, model, clips, detector)
+        errors = sum(word_errors(ref, normalize(text)) for ref, text in zip(references, texts))
+        words = sum(len(ref) for ref in references)
+        print(f"| {name} | {timings.mean() * 1000:.0f} | {np.percentile(timings, 95) * 1000:.0f} | "
+              f"{errors / max(1, words):.4f} |")
+
+
+if __name__ == "__main__":
+    main()
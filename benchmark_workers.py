@@ -0,0 +1,154 @@
+import argparse
+import concurrent.futures
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+# Configuration
+BIND = "127.0.0.1:5055"
+MESSAGES = [
+    "i feel sad",
+    "i am stressed about my exams",
+    "my heart is racing and i keep worrying about work",
+    "today was a good day",
+    "i feel lonely even with friends around",
+]
+
+
+def proc_memory_kb(pid):
+    """
+    (RSS, PSS) in KB. PSS splits shared copy-on-write pages between the
+    processes mapping them, so summing PSS gives the real total footprint.
+    """
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def child_pids(pid):
+    try:
+        out = subprocess.check_output(["pgrep", "-P", str(pid)], text=True)
+        return [int(p) for p in out.split()]
+    except subprocess.CalledProcessError:
+        return []
+
+
+def wait_ready(base_url, workers, timeout=600):
+    deadline = time.time() + timeout
+    seen = set()
+    while time.time() < deadline:
+        try:
+            r = requests.get(f"{base_url}/ready", timeout=2)
+            if r.status_code == 200:
+                seen.add(r.json().get("pid"))
+                if len(seen) >= workers:
+                    return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def auth_headers(base_url):
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    requests.post(f"{base_url}/auth/register", json={"username": username, "password": "bench"})
+    token = requests.post(f"{base_url}/auth/login",
+                          json={"username": username, "password": "bench"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def load_test(base_url, headers, concurrency, duration):
+    deadline = time.time() + duration
+    latencies = []
+    errors = 0
+
+    def client(i):
+        nonlocal errors
+        session = requests.Session()
+        n = 0
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                r = session.post(f"{base_url}/api/chat", headers=headers,
+                                 json={"message": MESSAGES[(i + n) % len(MESSAGES)] + f" {n}"}, timeout=60)
+                if r.status_code != 200:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+            except requests.RequestException:
+                errors += 1
+            n += 1
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    return {"requests": len(latencies), "errors": errors,
+            "rps": len(latencies) / duration, "p95_ms": p95 * 1000.0}
+
+
+def run_one(workers, args):
+    env = dict(os.environ, WEB_WORKERS=str(workers), BIND=BIND)
+    # Chroma is single-process only (see gunicorn.conf.py)
+    env.setdefault("MEMORY_BACKEND", "mmap")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://{BIND}"
+    try:
+        if not wait_ready(base_url, workers):
+            print(f"workers={workers}: server never became ready")
+            return None
+
+        master_rss, master_pss = proc_memory_kb(server.pid)
+        worker_mem = [proc_memory_kb(p) for p in child_pids(server.pid)]
+        result = load_test(base_url, auth_headers(base_url), args.concurrency, args.duration)
+
+        # Memory after load, when workers have touched their pages
+        worker_mem_after = [proc_memory_kb(p) for p in child_pids(server.pid)]
+        result.update({
+            "workers": workers,
+            "master_rss_mb": master_rss / 1024.0,
+            "worker_rss_mb": sum(m[0] for m in worker_mem_after) / max(1, len(worker_mem_after)) / 1024.0,
+            "worker_pss_mb": sum(m[1] for m in worker_mem_after) / max(1, len(worker_mem_after)) / 1024.0,
+            "worker_pss_boot_mb": sum(m[1] for m in worker_mem) / max(1, len(worker_mem)) / 1024.0,
+            "total_pss_mb": (master_pss + sum(m[1] for m in worker_mem_after)) / 1024.0
+        })
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS per worker and /api/chat throughput vs gunicorn worker count.")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per configuration")
+    args = parser.parse_args()
+
+    rows = [r for r in (run_one(w, args) for w in args.workers) if r]
+
+    print("\n| workers | master RSS (MB) | worker RSS (MB) | worker PSS boot/after (MB) | total PSS (MB) | req/s | p95 (ms) | errors |")
+    print("|---|---|---|---|---|---|---|---|")
+    for r in rows:
+        print(f"| {r['workers']} | {r['master_rss_mb']:.0f} | {r['worker_rss_mb']:.0f} | "
+              f"{r['worker_pss_boot_mb']:.0f} / {r['worker_pss_mb']:.0f} | {r['total_pss_mb']:.0f} | "
+              f"{r['rps']:.1f} | {r['p95_ms']:.0f} | {r['errors']} |")
+
+
+if __name__ == "__main__":
+    main()
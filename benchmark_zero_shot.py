@@ -0,0 +1,75 @@
+import argparse
+import time
+
+import numpy as np
+
+from classification.hybrid_classifier import HybridClassifier
+from classification.zero_shot import ZERO_SHOT_MODEL, TorchZeroShotClassifier
+
+LABELS = HybridClassifier.ZERO_SHOT_LABELS
+TEXTS = [
+    "I can't sleep and my heart keeps racing before every exam.",
+    "Work has been non-stop for weeks and I feel completely overwhelmed.",
+    "Had a nice walk in the park today, feeling pretty good.",
+    "Nothing feels worth doing anymore, I just stay in bed all day.",
+    "My mood swings from euphoric to exhausted within a few days.",
+    "I keep starting tasks and jumping to something else before finishing.",
+    "I miss my grandmother so much since she passed away last month.",
+    "I'm nervous about the interview tomorrow but I've prepared well.",
+]
+
+
+def ordered(result):
+    scores = dict(zip(result["labels"], result["scores"]))
+    return [scores[label] for label in LABELS]
+
+
+def per_message_ms(fn, texts, batch, repeats):
+    fn(texts[:batch])  # warmup
+    timings = []
+    for _ in range(repeats):
+        for start in range(0, len(texts), batch):
+            chunk = texts[start:start + batch]
+            started = time.perf_counter()
+            fn(chunk)
+            timings.append((time.perf_counter() - started) * 1000.0 / len(chunk))
+    return float(np.percentile(timings, 50)), float(np.mean(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message zero-shot latency: pipeline vs batched pairs.")
+    parser.add_argument("--messages", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=16, help="Texts per call for the batched run")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    texts = (TEXTS * (args.messages // len(TEXTS) + 1))[:args.messages]
+    print(f"Loading {ZERO_SHOT_MODEL}...")
+    batched = TorchZeroShotClassifier(ZERO_SHOT_MODEL)
+    # Same weights and tokenizer, so the comparison is the inference path alone
+    pipe = pipeline("zero-shot-classification", model=batched.model, tokenizer=batched.tokenizer)
+
+    reference = np.array([ordered(pipe(t, LABELS)) for t in texts])
+    got = np.array([ordered(r) for r in batched(texts, LABELS)])
+    max_diff = float(np.abs(reference - got).max())
+    agreement = float((reference.argmax(axis=1) == got.argmax(axis=1)).mean())
+    print(f"parity on {len(texts)} messages: max |p_pipeline - p_batched| = {max_diff:.2e}, "
+          f"top-1 agreement {agreement:.4f}")
+
+    runs = [
+        ("pipeline, one text per call", lambda chunk: [pipe(t, LABELS) for t in chunk], 1),
+        ("batched, one text per call", lambda chunk: batched(chunk, LABELS), 1),
+        (f"batched, {args.batch} texts per call", lambda chunk: batched(chunk, LABELS), args.batch),
+    ]
+    print(f"\n{len(LABELS)} labels, {len(texts)} messages, {args.repeats} repeats")
+    print("| path | p50 ms / message | mean ms / message |")
+    print("|---|---|---|")
+    for name, fn, batch in runs:
+        p50, mean = per_message_ms(fn, texts, batch, args.repeats)
+        print(f"| {name} | {p50:.1f} | {mean:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
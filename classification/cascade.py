@@ -0,0 +1,131 @@
+import os
+import threading
+
+import joblib
+
+from keyword_scanner import LEXICONS, SCANNER, KeywordScanner
+from metrics import Histogram
+
+LABEL_CATEGORY = "label:"
+
+# Stage names HybridClassifier knows how to run, cheapest first
+STAGES = ("lexicon", "linear", "custom_bert", "rf", "zero_shot")
+
+LINEAR_MODEL_NAME = "cascade_linear.pkl"
+
+# Label -> cue words / phrases (the "label:" categories of the shared keyword scanner)
+LEXICON = {category[len(LABEL_CATEGORY):]: cues for category, cues in LEXICONS.items()
+           if category.startswith(LABEL_CATEGORY)}
+NEGATIONS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "wasnt", "wasn't", "nor", "without"}
+
+
+def parse_cascade(spec):
+    """
+    "lexicon:0.5,linear:0.5,custom_bert,rf,zero_shot" -> [(name, threshold)].
+    A stage with a threshold only answers when its top-1 minus top-2
+    probability reaches it; a stage without one answers whatever it can.
+    """
+    stages = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, threshold = part.partition(":")
+        if name not in STAGES:
+            raise ValueError(f"Unknown classifier cascade stage '{name}' (expected one of {', '.join(STAGES)})")
+        stages.append((name, float(threshold) if threshold else None))
+    return stages
+
+
+def margin(prediction):
+    scores = sorted(prediction.values(), reverse=True)
+    if not scores:
+        return 0.0
+    return float(scores[0] - (scores[1] if len(scores) > 1 else 0.0))
+
+
+class KeywordLexicon:
+    """
+    Cue-word scorer: counts lexicon hits per label and smooths them into
+    probabilities, so one stray keyword gives a small margin and several
+    agreeing keywords a large one. Negated cues ("not anxious") make the
+    message ambiguous (no answer) instead of counting for the label.
+    """
+    def __init__(self, lexicon=None, smoothing=0.25):
+        self.lexicon = lexicon or LEXICON
+        self.smoothing = smoothing
+        if lexicon is None:
+            self.scanner = SCANNER
+        else:
+            self.scanner = KeywordScanner({LABEL_CATEGORY + label: cues for label, cues in lexicon.items()})
+
+    def __call__(self, text):
+        """
+        Label probabilities, or None when the text has no usable cue.
+        """
+        text = text.lower()
+        hits = dict.fromkeys(self.lexicon, 0)
+        for hit in self.scanner.scan(text):
+            if not hit.category.startswith(LABEL_CATEGORY):
+                continue
+            preceding = text[max(0, hit.start - 20):hit.start].split()[-3:]
+            if NEGATIONS.intersection(preceding):
+                return None
+            hits[hit.category[len(LABEL_CATEGORY):]] += 1
+        total = sum(hits.values())
+        if total == 0:
+            return None
+        denominator = total + self.smoothing * len(hits)
+        return {label: (count + self.smoothing) / denominator for label, count in hits.items()}
+
+
+def load_linear_model(model_dir):
+    """
+    Hashed n-gram linear model written by train_cascade_model.py (a
+    sklearn Pipeline with predict_proba), or None.
+    """
+    path = os.path.join(model_dir, LINEAR_MODEL_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print(f"Failed to load cascade linear model: {e}")
+        return None
+
+
+class CascadeStats:
+    """
+    Per-stage counters for tuning thresholds: how many messages reached a
+    stage, how many it answered (exits), and how long a stage call took.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, name, reached, exited, seconds):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {
+                    "reached": 0, "exits": 0,
+                    "latency": Histogram([0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0])
+                }
+            stage["reached"] += reached
+            stage["exits"] += exited
+        stage["latency"].observe(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: dict(s) for name, s in self._stages.items()}
+        total = sum(s["exits"] for s in stages.values())
+        return {
+            name: {
+                "reached": s["reached"],
+                "exits": s["exits"],
+                "exit_rate": round(s["exits"] / s["reached"], 4) if s["reached"] else 0.0,
+                "share_of_answers": round(s["exits"] / total, 4) if total else 0.0,
+                "latency_s": s["latency"].snapshot()
+            }
+            for name, s in stages.items()
+        }
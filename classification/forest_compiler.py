@@ -0,0 +1,159 @@
+import numpy as np
+
+# Probe rows checked against sklearn when a forest is compiled
+PARITY_PROBE_ROWS = 256
+PARITY_TOLERANCE = 1e-9
+
+
+class CompiledForest:
+    """
+    A fitted sklearn forest classifier (RandomForest / ExtraTrees, or a
+    single DecisionTree) flattened into contiguous node arrays.
+
+    Every tree's nodes are appended to one set of arrays (feature,
+    threshold, left, right, leaf class distribution), with child indices
+    rewritten to global positions. A batch is evaluated by walking all
+    (row, tree) pairs one level per step with numpy gathers: no per-tree
+    Python loop and no sklearn input validation. Pairs drop out of the walk
+    once they reach a leaf, so deep, unbalanced trees don't cost max_depth
+    steps for every row. predict_proba matches sklearn: the average of the
+    per-tree normalized leaf distributions, with X compared as float32
+    against the float64 thresholds.
+
+    The walk does per-node work in numpy temporaries, so it wins on the
+    small batches of the serving path but loses to sklearn's Cython loop on
+    large ones; batches above max_compiled_rows go to the original model.
+
+    Drop-in for the parts of the estimator the app uses: classes_,
+    n_features_in_, predict_proba, predict.
+    """
+    def __init__(self, model, max_compiled_rows=256):
+        self.model = model
+        self.max_compiled_rows = max_compiled_rows
+        trees = [e.tree_ for e in getattr(model, "estimators_", [model])]
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Multi-output forests are not supported")
+        self.classes_ = model.classes_
+        self.n_features_in_ = getattr(model, "n_features_in_", trees[0].n_features)
+        n_classes = len(self.classes_)
+
+        features, thresholds, lefts, rights, values, missing_left, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            values.append(value / totals)
+            # sklearn >= 1.3 routes NaNs per split; older trees have no missing values
+            mgl = getattr(tree, "missing_go_to_left", None)
+            missing_left.append(np.zeros(n, dtype=bool) if mgl is None else np.asarray(mgl, dtype=bool))
+            depth = max(depth, tree.max_depth)
+            offset += n
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.missing_left = np.concatenate(missing_left)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        # Interleaved (left, right) per node: one gather per step picks the child
+        self.children = np.stack([self.left, self.right], axis=1).ravel()
+        # For float32 x, x <= t exactly when x <= the largest float32 not above t
+        threshold32 = self.threshold.astype(np.float32)
+        over = threshold32.astype(np.float64) > self.threshold
+        threshold32[over] = np.nextafter(threshold32[over], np.float32(-np.inf))
+        self.threshold32 = threshold32
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """
+        Leaf index (global) per row and tree, shape (n_samples, n_trees).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        flat = X.ravel()
+        leaves = np.tile(self.roots, len(X))
+        # (row, tree) pairs still walking: their pair number, node, and row offset into flat
+        pair = np.flatnonzero(~self.is_leaf[leaves])
+        current = leaves[pair]
+        base = (pair // self.n_trees) * X.shape[1]
+        has_nan = np.isnan(flat).any()
+        while len(pair):
+            x = flat[base + self.feature[current]]
+            go_right = x > self.threshold32[current]
+            if has_nan:
+                go_right |= np.isnan(x) & ~self.missing_left[current]
+            current = self.children[2 * current + go_right]
+            done = self.is_leaf[current]
+            if done.any():
+                leaves[pair[done]] = current[done]
+                walking = ~done
+                pair, current, base = pair[walking], current[walking], base[walking]
+        return leaves.reshape(len(X), self.n_trees)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.max_compiled_rows and len(X) > self.max_compiled_rows:
+            return self.model.predict_proba(X)
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def parity_probe(model, rows=PARITY_PROBE_ROWS, seed=0):
+    """
+    Inputs that exercise both sides of the forest's own split thresholds.
+    """
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    trees = [e.tree_ for e in getattr(model, "estimators_", [model])]
+    lo = np.full(n_features, -1.0)
+    hi = np.full(n_features, 1.0)
+    for tree in trees:
+        # Trees fit on NaNs can split at +inf (missing values vs everything else)
+        split = (tree.children_left != -1) & np.isfinite(tree.threshold)
+        np.minimum.at(lo, tree.feature[split], tree.threshold[split] - 1.0)
+        np.maximum.at(hi, tree.feature[split], tree.threshold[split] + 1.0)
+    return rng.uniform(lo, hi, size=(rows, n_features)).astype(np.float32)
+
+
+def compile_forest(model, check=True, max_compiled_rows=256):
+    """
+    CompiledForest for `model`, or `model` itself if it can't be compiled or
+    (check=True) disagrees with sklearn on a probe batch.
+    """
+    try:
+        compiled = CompiledForest(model, max_compiled_rows=max_compiled_rows)
+    except (AttributeError, ValueError) as e:
+        print(f"Forest compiler: keeping sklearn model ({e})")
+        return model
+    if check:
+        X = parity_probe(model)
+        diff = float(np.abs(compiled.value[compiled.apply(X)].mean(axis=1) - model.predict_proba(X)).max())
+        if diff > PARITY_TOLERANCE:
+            print(f"Forest compiler: parity check failed (max diff {diff:.2e}), keeping sklearn model")
+            return model
+    return compiled
@@ -1,73 +1,243 @@
 import numpy as np
 import os
+import time
 import joblib
+from classification.cascade import (CascadeStats, KeywordLexicon, load_linear_model, margin,
+                                    parse_cascade)
+from classification.zero_shot import ZERO_SHOT_MODEL
+from feature_extraction.embedding_cache import LRUCache, content_key
+from feature_extraction.lazy_features import resolve_features
 # from xgboost import XGBClassifier
 # from sklearn.ensemble import RandomForestClassifier
 
 class HybridClassifier:
-    def __init__(self, model_dir='models'):
+    def __init__(self, model_dir='models', prediction_cache_size=4096, backend='torch', onnx_dir=None, quantized=True,
+                 registry=None, rf_backend='compiled', cascade="custom_bert,rf,zero_shot"):
         self.model_dir = model_dir
+        # 'compiled' (flat-array forest, see forest_compiler.py) or 'sklearn'
+        self.rf_backend = rf_backend
+        # Ordered stages with optional confidence-margin exits (see classification/cascade.py)
+        self.cascade = parse_cascade(cascade)
+        self.cascade_stats = CascadeStats()
+        self._stages = {"lexicon": self._run_lexicon, "linear": self._run_linear,
+                        "custom_bert": self._run_custom_bert, "rf": self._run_rf,
+                        "zero_shot": self._run_zero_shot}
+        self.lexicon = KeywordLexicon()
+        self.linear_model = load_linear_model(model_dir)
         self.rf_model = None
         self.xgb_model = None
+        # Transformer outputs keyed by hash(model, cleaned text)
+        self.prediction_cache = LRUCache(prediction_cache_size)
+        # 'torch' or 'onnx' (see onnx_backend.py / export_onnx_models.py)
+        self.backend = backend
+        self.onnx_dir = onnx_dir or os.path.join(model_dir, 'onnx')
+        self.quantized = quantized
+        self.custom_bert_backend = 'torch'
+        self.zero_shot_backend = 'torch'
+        # Optional ModelRegistry: the (very heavy) zero-shot model is declared
+        # there as evictable instead of living on this object forever
+        self.registry = registry
+        if self.registry is not None:
+            self.registry.register("zero_shot", self._load_zero_shot, memory_mb=1650, evictable=True,
+                                   warmup=lambda m: m("warmup", ["Normal", "Stress"]))
         # self.dl_model = ... (PyTorch model)
         
         # Load models if they exist, else warn
         self._load_models()
 
+        self.custom_bert_pipeline = None
         if os.path.exists(os.path.join(self.model_dir, 'custom_bert')):
-            try:
-                from transformers import pipeline
-                self.custom_bert_pipeline = pipeline("text-classification", model=os.path.join(self.model_dir, 'custom_bert'), return_all_scores=True)
-                print("Loaded Custom Fine-Tuned BERT Model.")
-            except Exception as e:
-                print(f"Failed to load custom BERT: {e}")
-                self.custom_bert_pipeline = None
-        else:
-            self.custom_bert_pipeline = None
+            if self.backend == 'onnx':
+                self.custom_bert_pipeline = self._load_onnx('custom_bert')
+                if self.custom_bert_pipeline is not None:
+                    self.custom_bert_backend = self._onnx_variant()
+
+            if self.custom_bert_pipeline is None:
+                try:
+                    from transformers import pipeline
+                    self.custom_bert_pipeline = pipeline("text-classification", model=os.path.join(self.model_dir, 'custom_bert'), return_all_scores=True)
+                    print("Loaded Custom Fine-Tuned BERT Model.")
+                except Exception as e:
+                    print(f"Failed to load custom BERT: {e}")
+                    self.custom_bert_pipeline = None
+
+    def _onnx_variant(self):
+        return 'onnx-int8' if self.quantized else 'onnx-fp32'
+
+    def _load_onnx(self, name):
+        try:
+            from onnx_backend import resolve_model, OnnxTextClassifier, OnnxZeroShotClassifier
+            path = resolve_model(self.onnx_dir, name, quantized=self.quantized)
+            if path is None:
+                return None
+            cls = OnnxZeroShotClassifier if name == 'zero_shot' else OnnxTextClassifier
+            model = cls(path)
+            print(f"Loaded ONNX {name} model: {path}")
+            return model
+        except Exception as e:
+            print(f"ONNX {name} unavailable ({e}), falling back to PyTorch.")
+            return None
+
+    def _load_zero_shot(self):
+        if self.backend == 'onnx':
+            model = self._load_onnx('zero_shot')
+            if model is not None:
+                self.zero_shot_backend = self._onnx_variant()
+                return model
+        from classification.zero_shot import TorchZeroShotClassifier
+        model = TorchZeroShotClassifier(ZERO_SHOT_MODEL)
+        self.zero_shot_backend = 'torch'
+        return model
 
     def _load_models(self):
         rf_path = os.path.join(self.model_dir, 'rf_emotion.pkl')
         if os.path.exists(rf_path):
             self.rf_model = joblib.load(rf_path)
+            if self.rf_backend == 'compiled':
+                from classification.forest_compiler import compile_forest
+                self.rf_model = compile_forest(self.rf_model)
+
+    ZERO_SHOT_LABELS = ["Depression", "Anxiety", "Bipolar", "ADHD", "Normal", "Sadness", "Stress"]
 
-    def predict(self, feature_vector, text=None):
+    def predict(self, feature_vector, text=None, trace=None):
         """
-        Input: Concatenated feature vector, optional text.
+        Input: Concatenated feature vector (or a LazyFeatures provider, so the
+               embedding is only computed if the RF branch runs), optional text.
         Output: Probabilities for each class.
+        If a trace dict is passed, it is filled with the branch that answered.
+        """
+        return self.predict_batch([feature_vector], [text], traces=[trace])[0]
+
+    def predict_batch(self, features_matrix, texts=None, traces=None):
         """
-        # 1. Priority: Custom Fine-Tuned Model
-        if self.custom_bert_pipeline and text:
+        Batched predict(): messages go through the cascade stages in order
+        and each stage runs once for all the messages still unanswered (one
+        padded BERT forward, one forest call) instead of once per message.
+        A stage with a threshold only answers messages whose top-1 minus
+        top-2 probability reaches it; the rest fall through to the next one.
+
+        features_matrix is an (n, d) array or a list of vectors / LazyFeatures
+        (only resolved for rows that reach the RF stage); texts is a list of
+        n texts or None. Either may be None (text-only stages are skipped
+        without texts, the RF stage without features), not both. Returns a
+        list of n probability dicts. traces, if given, is a list of n dicts
+        (or None entries) filled like predict()'s trace.
+        """
+        if features_matrix is None and texts is None:
+            raise ValueError("predict_batch needs features_matrix or texts")
+        n = len(features_matrix) if features_matrix is not None else len(texts)
+        if texts is not None and len(texts) != n:
+            raise ValueError(f"predict_batch got {n} feature rows but {len(texts)} texts")
+        texts = list(texts) if texts is not None else [None] * n
+        traces = [t if t is not None else {} for t in (traces or [None] * n)]
+        for trace in traces:
+            trace["branch"] = None
+            trace["cache_hit"] = False
+        results = [None] * n
+
+        for name, threshold in self.cascade:
+            run = self._stages[name]
+            rows = [i for i in range(n)
+                    if results[i] is None and (features_matrix is not None if name == "rf" else texts[i])]
+            if not rows or not self._stage_available(name):
+                continue
+            started = time.perf_counter()
             try:
-                # Pipeline output: [[{'label': 'Sadness', 'score': 0.9}, ...]]
-                results = self.custom_bert_pipeline(text)[0]
-                prediction = {res['label']: res['score'] for res in results}
-                return prediction
+                predictions, cache_hits = run(rows, features_matrix, texts)
             except Exception as e:
-                print(f"BERT prediction failed: {e}")
-
-        # 2. Random Forest (Manual Training)
-        if self.rf_model is not None:
-             try:
-                proba = self.rf_model.predict_proba([feature_vector])[0]
-                classes = self.rf_model.classes_
-                return dict(zip(classes, proba))
-             except Exception as e:
-                print(f"RF prediction failed: {e}")
-
-        # 3. Fallback: Zero-Shot
-        try:
-            from transformers import pipeline
-            if not hasattr(self, 'zero_shot_classifier'):
-                    self.zero_shot_classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-            
-            if text:
-                candidate_labels = ["Depression", "Anxiety", "Bipolar", "ADHD", "Normal", "Sadness", "Stress"]
-                result = self.zero_shot_classifier(text, candidate_labels)
-                return dict(zip(result['labels'], result['scores']))
-        except Exception as e:
-            print(f"Zero-shot failed: {e}")
-            
-        return {"Normal": 1.0}
+                print(f"{name} prediction failed: {e}")
+                predictions, cache_hits = {}, set()
+            exited = 0
+            for i, prediction in predictions.items():
+                if threshold is None or margin(prediction) >= threshold:
+                    results[i] = prediction
+                    traces[i]["branch"] = name
+                    traces[i]["cache_hit"] = i in cache_hits
+                    exited += 1
+            self.cascade_stats.record(name, len(rows), exited, time.perf_counter() - started)
+
+        for i in range(n):
+            if results[i] is None:
+                traces[i]["branch"] = "default"
+                results[i] = {"Normal": 1.0}
+        return results
+
+    def _stage_available(self, name):
+        if name == "linear":
+            return self.linear_model is not None
+        if name == "custom_bert":
+            return self.custom_bert_pipeline is not None
+        if name == "rf":
+            return self.rf_model is not None
+        return True
+
+    # Stages: (rows, features_matrix, texts) -> ({row: prediction}, rows served from the prediction cache)
+
+    def _run_lexicon(self, rows, features_matrix, texts):
+        predictions = {}
+        for i in rows:
+            prediction = self.lexicon(texts[i])
+            if prediction is not None:
+                predictions[i] = prediction
+        return predictions, set()
+
+    def _run_linear(self, rows, features_matrix, texts):
+        probas = self.linear_model.predict_proba([texts[i] for i in rows])
+        classes = self.linear_model.classes_
+        return {i: dict(zip(classes, proba)) for i, proba in zip(rows, probas)}, set()
+
+    def _run_custom_bert(self, rows, features_matrix, texts):
+        model_key = f"custom_bert:{os.path.join(self.model_dir, 'custom_bert')}:{self.custom_bert_backend}"
+        # Pipeline output per text: [{'label': 'Sadness', 'score': 0.9}, ...]
+        return self._predict_cached(rows, texts, model_key,
+                                    lambda batch: [{res['label']: res['score'] for res in out}
+                                                   for out in self.custom_bert_pipeline(batch)])
+
+    def _run_rf(self, rows, features_matrix, texts):
+        if isinstance(features_matrix, np.ndarray):
+            X = features_matrix[rows]
+        else:
+            X = np.stack([np.asarray(resolve_features(features_matrix[i])).reshape(-1) for i in rows])
+        probas = self.rf_model.predict_proba(X)
+        classes = self.rf_model.classes_
+        return {i: dict(zip(classes, proba)) for i, proba in zip(rows, probas)}, set()
+
+    def _run_zero_shot(self, rows, features_matrix, texts):
+        # Resolve the model first: loading it decides the backend that goes into the cache key
+        zero_shot_classifier = self._zero_shot_model()
+        model_key = f"zero-shot:{ZERO_SHOT_MODEL}:{self.zero_shot_backend}"
+        return self._predict_cached(rows, texts, model_key,
+                                    lambda batch: self._zero_shot(batch, zero_shot_classifier))
+
+    def _predict_cached(self, rows, texts, model_key, run):
+        # Prediction-cache lookups first; one batched model call for the misses
+        predictions, keys, hits = {}, {}, set()
+        for i in rows:
+            keys[i] = content_key(texts[i], model_key)
+            cached = self.prediction_cache.get(keys[i])
+            if cached is not None:
+                predictions[i] = dict(cached)
+                hits.add(i)
+        misses = [i for i in rows if i not in predictions]
+        if misses:
+            for i, prediction in zip(misses, run([texts[i] for i in misses])):
+                self.prediction_cache.put(keys[i], prediction)
+                predictions[i] = dict(prediction)
+        return predictions, hits
+
+    def _zero_shot_model(self):
+        if self.registry is not None:
+            return self.registry.get("zero_shot")
+        if not hasattr(self, 'zero_shot_classifier'):
+            self.zero_shot_classifier = self._load_zero_shot()
+        return self.zero_shot_classifier
+
+    def _zero_shot(self, texts, zero_shot_classifier=None):
+        if zero_shot_classifier is None:
+            zero_shot_classifier = self._zero_shot_model()
+        # One call for the whole list: hypotheses are tokenized once and the pairs run in batches
+        results = zero_shot_classifier(list(texts), self.ZERO_SHOT_LABELS)
+        return [dict(zip(result['labels'], result['scores'])) for result in results]
 
     def train(self, X, y):
         pass
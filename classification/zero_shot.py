@@ -0,0 +1,137 @@
+import numpy as np
+
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+ZERO_SHOT_TEMPLATE = "This example is {}."
+
+# Premise/hypothesis pairs per forward pass (texts x labels)
+MAX_BATCH_PAIRS = 64
+
+
+def softmax(x, axis=-1):
+    x = x - np.max(x, axis=axis, keepdims=True)
+    e = np.exp(x)
+    return e / np.sum(e, axis=axis, keepdims=True)
+
+
+def entailment_index(label2id, default=2):
+    return {k.lower(): v for k, v in (label2id or {}).items()}.get("entailment", default)
+
+
+class PairEncoder:
+    """
+    Builds NLI premise/hypothesis batches for zero-shot classification.
+
+    bart-large-mnli is a cross-encoder: every layer attends across premise
+    and hypothesis, so the label side can't be encoded once and reused.
+    What can be reused is everything before the model: the hypotheses for
+    a label set are formatted and tokenized once and kept, each premise is
+    tokenized once (not once per label), and the pairs are assembled from
+    token ids with the tokenizer's own special-token layout. Truncation
+    matches the pipeline's "only_first".
+    """
+    def __init__(self, tokenizer, template=ZERO_SHOT_TEMPLATE, max_length=None):
+        self.tokenizer = tokenizer
+        self.template = template
+        self.max_length = max_length or min(getattr(tokenizer, "model_max_length", 1024), 1024)
+        self.n_special = tokenizer.num_special_tokens_to_add(pair=True)
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.with_token_types = "token_type_ids" in getattr(tokenizer, "model_input_names", [])
+        self._hypotheses = {}
+
+    def hypotheses(self, labels):
+        key = tuple(labels)
+        ids = self._hypotheses.get(key)
+        if ids is None:
+            texts = [self.template.format(label) for label in labels]
+            ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+            self._hypotheses[key] = ids
+        return ids
+
+    def premises(self, texts):
+        return self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+
+    def encode(self, premise_ids, hypothesis_ids):
+        """
+        Every premise paired with every hypothesis (premise-major), padded
+        to the longest pair: dict of int64 arrays (n_premises * n_labels, len).
+        """
+        rows, token_types = [], []
+        for premise in premise_ids:
+            for hypothesis in hypothesis_ids:
+                budget = max(0, self.max_length - self.n_special - len(hypothesis))
+                first = premise[:budget]
+                rows.append(self.tokenizer.build_inputs_with_special_tokens(first, hypothesis))
+                if self.with_token_types:
+                    token_types.append(self.tokenizer.create_token_type_ids_from_sequences(first, hypothesis))
+        width = max(len(r) for r in rows)
+        input_ids = np.full((len(rows), width), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+        for i, row in enumerate(rows):
+            input_ids[i, :len(row)] = row
+            attention_mask[i, :len(row)] = 1
+        encoded = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if self.with_token_types:
+            encoded["token_type_ids"] = np.zeros_like(input_ids)
+            for i, row in enumerate(token_types):
+                encoded["token_type_ids"][i, :len(row)] = row
+        return encoded
+
+
+class BatchedZeroShot:
+    """
+    Zero-shot classification over a list of texts with as few forward
+    passes as possible. Subclasses provide `encoder` (a PairEncoder),
+    `entailment_id` and `_logits(encoded)`.
+
+    Called like the transformers pipeline (single-label mode): a string
+    gives one result dict, a list gives a list of them. Texts are sorted
+    by length before chunking so a chunk pads to similar lengths, and each
+    chunk holds up to max_batch_pairs premise/hypothesis pairs.
+    """
+    max_batch_pairs = MAX_BATCH_PAIRS
+
+    def __call__(self, texts, candidate_labels):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        texts = list(texts)
+        labels = list(candidate_labels)
+        results = [None] * len(texts)
+        if texts:
+            hypotheses = self.encoder.hypotheses(labels)
+            premises = self.encoder.premises(texts)
+            order = sorted(range(len(texts)), key=lambda i: len(premises[i]))
+            per_chunk = max(1, self.max_batch_pairs // max(1, len(labels)))
+            for start in range(0, len(order), per_chunk):
+                chunk = order[start:start + per_chunk]
+                encoded = self.encoder.encode([premises[i] for i in chunk], hypotheses)
+                logits = self._logits(encoded)[:, self.entailment_id].reshape(len(chunk), len(labels))
+                for i, scores in zip(chunk, softmax(logits)):
+                    ranked = np.argsort(-scores, kind="stable")
+                    results[i] = {
+                        "sequence": texts[i],
+                        "labels": [labels[j] for j in ranked],
+                        "scores": [float(scores[j]) for j in ranked]
+                    }
+        return results[0] if single else results
+
+
+class TorchZeroShotClassifier(BatchedZeroShot):
+    """
+    PyTorch bart-large-mnli behind the batched zero-shot interface.
+    """
+    def __init__(self, model_name=ZERO_SHOT_MODEL, max_batch_pairs=MAX_BATCH_PAIRS):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        self.encoder = PairEncoder(self.tokenizer)
+        self.entailment_id = entailment_index(self.model.config.label2id)
+        self.max_batch_pairs = max_batch_pairs
+
+    def _logits(self, encoded):
+        feeds = {k: self._torch.from_numpy(v) for k, v in encoded.items()}
+        with self._torch.inference_mode():
+            return self.model(**feeds).logits.float().numpy()
@@ -15,13 +15,139 @@ class Config:
     
     # ChromaDB Config
     CHROMA_DB_PATH = os.path.join(os.getcwd(), 'chroma_data')
+    # Contextual memory backend: 'chroma' (falls back to an in-memory index if
+    # Chroma can't load) or 'mmap' (memory-mapped segments under CHROMA_DB_PATH/mmap_store)
+    MEMORY_BACKEND = os.environ.get('MEMORY_BACKEND', 'chroma')
+    # Storage dtype of the local vector stores: 'float32', 'float16' or 'int8' (scalar-quantized)
+    MEMORY_VECTOR_DTYPE = os.environ.get('MEMORY_VECTOR_DTYPE', 'float32')
+    # int8 only: precision used to rerank the best k * MEMORY_RERANK_FACTOR (empty = approximate scores).
+    # mmap keeps a copy of this dtype on disk; the in-memory index a 4-bit (float16) or 8-bit (float32) residual
+    MEMORY_RERANK_DTYPE = os.environ.get('MEMORY_RERANK_DTYPE', 'float16') or None
+    MEMORY_RERANK_FACTOR = int(os.environ.get('MEMORY_RERANK_FACTOR', 4))
+    # Rows per mmap segment file; fixed when the store is created (state.json wins on later opens)
+    MEMORY_MMAP_SEGMENT_ROWS = int(os.environ.get('MEMORY_MMAP_SEGMENT_ROWS', 16384))
+    # Chroma: hash-partition users over this many collections (1 = single collection).
+    # Fixed once shard_map.json exists; hot users are moved with `python -m contextual_memory.sharding --rebalance`
+    MEMORY_SHARDS = int(os.environ.get('MEMORY_SHARDS', 1))
+
+    # Per-user retrieval cache (query embedding -> top-k), updated on every memory write
+    RETRIEVAL_CACHE_ENABLED = os.environ.get('RETRIEVAL_CACHE_ENABLED', '1') == '1'
+    RETRIEVAL_CACHE_TTL = float(os.environ.get('RETRIEVAL_CACHE_TTL', 300))  # seconds; other workers' writes are seen via the mmap store state
+    RETRIEVAL_CACHE_MAX_USERS = int(os.environ.get('RETRIEVAL_CACHE_MAX_USERS', 10000))
+    RETRIEVAL_CACHE_QUERIES_PER_USER = int(os.environ.get('RETRIEVAL_CACHE_QUERIES_PER_USER', 8))
+    # Cosine similarity at which a new query reuses a cached one (1.0 = identical vector only)
+    RETRIEVAL_CACHE_MATCH = float(os.environ.get('RETRIEVAL_CACHE_MATCH', 0.999))
+
+    # Memory lifecycle (contextual_memory/lifecycle.py); 0 disables a step
+    MEMORY_TTL_DAYS = float(os.environ.get('MEMORY_TTL_DAYS', 365))
+    # Older snippets are merged per state into one summary memory per MEMORY_CONSOLIDATE_GROUP
+    MEMORY_CONSOLIDATE_AFTER_DAYS = float(os.environ.get('MEMORY_CONSOLIDATE_AFTER_DAYS', 30))
+    MEMORY_CONSOLIDATE_GROUP = int(os.environ.get('MEMORY_CONSOLIDATE_GROUP', 20))
+    # Per-user cap, least recently retrieved memories are evicted first
+    MEMORY_MAX_PER_USER = int(os.environ.get('MEMORY_MAX_PER_USER', 2000))
+    MEMORY_LIFECYCLE_INTERVAL = float(os.environ.get('MEMORY_LIFECYCLE_INTERVAL', 3600))  # seconds between runs
     
     # Uploads
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
 
     # Model Paths (Placeholders)
-    WHISPER_MODEL_SIZE = "base"
+    WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', "base")
+
+    # Speech-to-text engine: 'openai-whisper' (PyTorch fp32), 'faster-whisper'
+    # (CTranslate2, int8 on CPU) or 'transformers' (e.g. distil-whisper checkpoints).
+    # Compare them on local recordings with benchmark_asr.py.
+    ASR_BACKEND = os.environ.get('ASR_BACKEND', 'openai-whisper')
+    ASR_MODEL = os.environ.get('ASR_MODEL', WHISPER_MODEL_SIZE)  # size, hub id or local path
+    ASR_COMPUTE_TYPE = os.environ.get('ASR_COMPUTE_TYPE', 'int8')  # faster-whisper only
+    ASR_BEAM_SIZE = int(os.environ.get('ASR_BEAM_SIZE', 1))  # 1 = greedy, as openai-whisper's default
+    ASR_CPU_THREADS = int(os.environ.get('ASR_CPU_THREADS', 0))  # 0 = engine default
+    ASR_LANGUAGE = os.environ.get('ASR_LANGUAGE') or None  # Unset = detect per clip
+    # ASR inference pool (per worker process): each replica is one more copy of the model in memory.
+    # Requests beyond ASR_MAX_QUEUE waiting ones get 503 + Retry-After; ASR_TIMEOUT is the
+    # per-request deadline in seconds (keep it above a cold model load, or eager-load 'whisper')
+    ASR_REPLICAS = int(os.environ.get('ASR_REPLICAS', 1))
+    ASR_MAX_QUEUE = int(os.environ.get('ASR_MAX_QUEUE', 4))  # 0 = unbounded
+    ASR_TIMEOUT = float(os.environ.get('ASR_TIMEOUT', 15.0))
+
+    # Energy VAD before ASR / prosodic features: trims silence, skips ASR on silent clips
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', '1') == '1'
+    VAD_FLOOR_DB = float(os.environ.get('VAD_FLOOR_DB', -50))  # dBFS; quieter frames are never speech
+    VAD_MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 12))  # above the clip's own noise floor
+    VAD_MIN_SILENCE_MS = int(os.environ.get('VAD_MIN_SILENCE_MS', 300))  # shorter pauses stay inside a segment
+    VAD_PAD_MS = int(os.environ.get('VAD_PAD_MS', 150))
+
+    # Streaming turns (/api/multimodal_stream): chunks are spooled to disk so the
+    # chunk POSTs and the SSE response may be served by different workers
+    STREAM_SPOOL_DIR = os.environ.get('STREAM_SPOOL_DIR') or os.path.join(os.getcwd(), 'stream_spool')
+    STREAM_PARTIAL_INTERVAL_MS = int(os.environ.get('STREAM_PARTIAL_INTERVAL_MS', 1000))  # min new audio per partial
+    STREAM_END_SILENCE_MS = int(os.environ.get('STREAM_END_SILENCE_MS', 700))  # pause that ends the utterance
+    STREAM_POLL_MS = int(os.environ.get('STREAM_POLL_MS', 50))
+    STREAM_IDLE_TIMEOUT = float(os.environ.get('STREAM_IDLE_TIMEOUT', 10))  # seconds without a chunk -> finalize
+    STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 60))
     BERT_MODEL_NAME = "bert-base-uncased"
+
+    # Cross-request embedding micro-batching
+    EMBED_BATCH_MAX_SIZE = int(os.environ.get('EMBED_BATCH_MAX_SIZE', 16))
+    EMBED_BATCH_MAX_WAIT_MS = float(os.environ.get('EMBED_BATCH_MAX_WAIT_MS', 5))
+
+    # Content-addressed embedding / prediction caches
+    EMBED_CACHE_MAX_ITEMS = int(os.environ.get('EMBED_CACHE_MAX_ITEMS', 10000))  # ~30MB of float32 BERT vectors
+    EMBED_CACHE_DIR = os.environ.get('EMBED_CACHE_DIR')  # Unset = no on-disk tier
+    EMBED_CACHE_DISK_MAX_ITEMS = int(os.environ.get('EMBED_CACHE_DISK_MAX_ITEMS', 100000))
+    PREDICTION_CACHE_MAX_ITEMS = int(os.environ.get('PREDICTION_CACHE_MAX_ITEMS', 4096))
+
+    # Inference backend for the text models: 'torch' (eager fp32) or 'onnx'
+    # ONNX graphs are produced by export_onnx_models.py; a model only switches
+    # over if its variant passed the parity check recorded in the manifest.
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch')
+    ONNX_MODEL_DIR = os.path.join('models', 'onnx')
+    ONNX_QUANTIZED = os.environ.get('ONNX_QUANTIZED', '1') == '1'  # Prefer dynamic-int8 graphs
+    # Random forests (rf_emotion / rf_audio): 'compiled' flattens the trees into numpy
+    # node arrays (classification/forest_compiler.py, parity-checked at load) or 'sklearn'
+    RF_BACKEND = os.environ.get('RF_BACKEND', 'compiled')
+    # Text classifier cascade, cheapest stage first. 'stage:margin' answers only when its
+    # top-1 minus top-2 probability reaches margin; stages without one answer unconditionally.
+    # Stages: lexicon, linear (train_cascade_model.py), custom_bert, rf, zero_shot.
+    # The default is the original BERT -> RF -> zero-shot chain; the cheap stages are opt-in,
+    # prepend them once their margins are tuned with `python evaluate_models.py --cascade`.
+    CLASSIFIER_CASCADE = os.environ.get('CLASSIFIER_CASCADE', 'custom_bert,rf,zero_shot')
+
+    # Model registry (see model_registry.py)
+    # Comma-separated model names loaded + warmed up at boot; everything else loads on first use
+    MODEL_EAGER_LOAD = os.environ.get('MODEL_EAGER_LOAD', 'bert_encoder,text_classifier')
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
+    # Evict rarely used evictable models (e.g. zero-shot BART) above this RSS. 0 = no budget
+    MODEL_RSS_BUDGET_MB = int(os.environ.get('MODEL_RSS_BUDGET_MB', 0))
+    # Evict evictable models unused for this long, checked every MODEL_REAP_INTERVAL_S. 0 = never
+    MODEL_IDLE_TTL_S = int(os.environ.get('MODEL_IDLE_TTL_S', 1800))
+    MODEL_REAP_INTERVAL_S = int(os.environ.get('MODEL_REAP_INTERVAL_S', 60))
+
+    # Pre-fork serving (gunicorn.conf.py)
+    # Default 1 with Chroma (single-process only), 2 with the other backends
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1 if MEMORY_BACKEND == 'chroma' else 2))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    # torch intra-op threads per worker; 0 = cpu_count // WEB_WORKERS
+    TORCH_THREADS_PER_WORKER = int(os.environ.get('TORCH_THREADS_PER_WORKER', 0))
+
+    # /api/chat concurrent stages (stage_graph.py): shared pool size + per-stage timeouts (seconds)
+    CHAT_STAGE_WORKERS = int(os.environ.get('CHAT_STAGE_WORKERS', 8))
+    # /api/multimodal_input video frames run on this pool; audio goes through the ASR pool
+    SYNC_VIDEO_WORKERS = int(os.environ.get('SYNC_VIDEO_WORKERS', 4))
+    SYNC_VIDEO_TIMEOUT = float(os.environ.get('SYNC_VIDEO_TIMEOUT', 10.0))
+    CHAT_RETRIEVAL_TIMEOUT = float(os.environ.get('CHAT_RETRIEVAL_TIMEOUT', 2.0))
+    CHAT_SESSION_TIMEOUT = float(os.environ.get('CHAT_SESSION_TIMEOUT', 3.0))
+    CHAT_CLASSIFY_TIMEOUT = float(os.environ.get('CHAT_CLASSIFY_TIMEOUT', 10.0))
+
+    # Write-behind persistence for chat turns (write_behind.py)
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '1') == '1'  # 0 = write on the request thread
+    WRITE_BEHIND_DIR = os.environ.get('WRITE_BEHIND_DIR') or os.path.join(os.getcwd(), 'write_behind')
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 64))
+    WRITE_BEHIND_MAX_WAIT_MS = float(os.environ.get('WRITE_BEHIND_MAX_WAIT_MS', 50))
+    WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', '1') == '1'
+    # Max seconds a history read waits for the user's queued turns to commit
+    WRITE_BEHIND_READ_TIMEOUT = float(os.environ.get('WRITE_BEHIND_READ_TIMEOUT', 2.0))
+    # A journal that never fully drains is rewritten with only its unapplied turns past this size
+    WRITE_BEHIND_COMPACT_BYTES = int(os.environ.get('WRITE_BEHIND_COMPACT_BYTES', 1 << 20))
     
 config = Config()
@@ -2,91 +2,415 @@ import os
 import uuid
 import datetime
 
+from contextual_memory.vector_index import VectorIndex
+from contextual_memory.mmap_store import MmapVectorStore
+from contextual_memory.sharding import ShardRouter
+from feature_extraction.lazy_features import resolve_features
+
+DEFAULT_DIM = 768  # bert-base CLS
+LEGACY_COLLECTION = "conversation_history"
+
 class ContextualMemory:
-    def __init__(self, persist_path):
+    def __init__(self, persist_path, encoder=None, backend="chroma", vector_dtype="float32",
+                 segment_rows=16384, num_shards=1, retrieval_cache=None, rerank_dtype=None, rerank_factor=4):
         self.use_chroma = False
         self.collection = None
-        self.memory_store = [] # Fallback list of dicts
-        
+        # Chroma only: >1 hash-partitions users over that many collections
+        self.num_shards = num_shards
+        self.router = None
+        self._collections = {}
+        # Optional SharedEncoder. When set, vectors come from the app's own
+        # encoder and Chroma never runs its default embedding model.
+        self.encoder = encoder
+        # 'chroma', or 'mmap' for the Chroma-free memory-mapped store
+        self.backend = backend
+        self.dim = encoder.dim if encoder is not None else DEFAULT_DIM
+        # Local engines only: float32 / float16 / int8 storage; int8 keeps a
+        # rerank_dtype copy (None = no rerank) to rescore the best k * rerank_factor
+        self.vector_dtype = vector_dtype
+        self.rerank_dtype = rerank_dtype
+        self.rerank_factor = rerank_factor
+        self.segment_rows = segment_rows
+        # Local engine (per-user exact cosine search): the in-memory index is
+        # the fallback when Chroma is unavailable, or the mmap store when selected
+        self.index = VectorIndex(self.dim, dtype=vector_dtype, rerank_dtype=rerank_dtype, rerank_factor=rerank_factor)
+
+        # Optional RetrievalCache: per-user query -> top-k, kept current by add_memories
+        self.retrieval_cache = retrieval_cache
+        # Optional lifecycle.MemoryLifecycle: touch(ids) records when memories were last retrieved
+        self.access_tracker = None
+
+        self.persist_path = persist_path
+        self._connect()
+
+    def _connect(self):
+        if self.backend == "mmap":
+            self.index = MmapVectorStore(os.path.join(self.persist_path, "mmap_store"), self.dim,
+                                         dtype=self.vector_dtype, segment_rows=self.segment_rows,
+                                         rerank_dtype=self.rerank_dtype, rerank_factor=self.rerank_factor)
+            self.use_chroma = False
+            print(f"ContextualMemory: memory-mapped store loaded ({self.index.count()} memories).")
+            return
         try:
             import chromadb
             # Try initializing client to see if it works
-            self.client = chromadb.PersistentClient(path=persist_path)
-            self.collection = self.client.get_or_create_collection(
-                name="conversation_history",
-                metadata={"hnsw:space": "cosine"}
-            )
+            self.client = chromadb.PersistentClient(path=self.persist_path)
+            self._collections = {}
+            if self.encoder is not None:
+                base_name = f"{LEGACY_COLLECTION}_d{self.encoder.dim}"
+                self.collection = self._open_collection(base_name)
+                self._migrate_legacy_collection()
+            else:
+                base_name = LEGACY_COLLECTION
+                self.collection = self._open_collection(base_name)
+            if self.num_shards > 1:
+                self.router = ShardRouter(os.path.join(self.persist_path, "shard_map.json"),
+                                          base_name, self.num_shards)
+                self._migrate_to_shards()
             self.use_chroma = True
             print("ContextualMemory: ChromaDB loaded successfully.")
         except Exception as e:
             print(f"ContextualMemory Warning: ChromaDB failed to load ({e}). Using in-memory fallback.")
             self.use_chroma = False
 
-    def add_memory(self, user_id, text, metadata=None):
+    def reopen(self):
         """
-        Add a conversation snippet to vector memory.
+        Re-create the Chroma client, e.g. in a freshly forked worker
+        (SQLite handles must not be shared across fork).
         """
-        if metadata is None:
-            metadata = {}
-        
-        metadata['user_id'] = str(user_id)
-        metadata['timestamp'] = str(datetime.datetime.now().isoformat())
-        
         if self.use_chroma:
+            self._connect()
+        elif hasattr(self.index, "reopen"):
+            self.index.reopen()
+
+    def _open_collection(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            if self.encoder is not None:
+                collection = self.client.get_or_create_collection(
+                    name=name,
+                    metadata={"hnsw:space": "cosine"},
+                    embedding_function=None
+                )
+            else:
+                collection = self.client.get_or_create_collection(
+                    name=name,
+                    metadata={"hnsw:space": "cosine"}
+                )
+            self._collections[name] = collection
+        return collection
+
+    def _collection_for(self, user_id):
+        if self.router is None:
+            return self.collection
+        return self._open_collection(self.router.shard_for(user_id))
+
+    def _migrate_to_shards(self, batch_size=256):
+        """
+        Move snippets from the single unsharded collection into the user's
+        shard. Items are deleted from the source as they are moved, so an
+        interrupted migration simply resumes on the next start.
+        """
+        total = self.collection.count()
+        if not total:
+            return
+        print(f"ContextualMemory: moving {total} memories into {self.router.num_shards} shards...")
+        while True:
+            page = self.collection.get(limit=batch_size, include=["documents", "metadatas", "embeddings"])
+            if not page['ids']:
+                break
+            by_shard = {}
+            for i, meta in enumerate(page['metadatas']):
+                by_shard.setdefault(self.router.shard_for(meta.get('user_id')), []).append(i)
+            for name, rows in by_shard.items():
+                kwargs = {
+                    "ids": [page['ids'][i] for i in rows],
+                    "documents": [page['documents'][i] for i in rows],
+                    "metadatas": [page['metadatas'][i] for i in rows]
+                }
+                if page.get('embeddings') is not None and len(page['embeddings']):
+                    kwargs["embeddings"] = [[float(x) for x in page['embeddings'][i]] for i in rows]
+                shard = self._open_collection(name)
+                getattr(shard, "upsert", shard.add)(**kwargs)
+            self.collection.delete(ids=page['ids'])
+
+    def _migrate_legacy_collection(self, batch_size=256):
+        """
+        One-off: re-embed snippets stored under Chroma's default embedding
+        function into the shared-encoder collection.
+        """
+        if self.collection.count() > 0:
+            return
+        try:
+            legacy = self.client.get_collection(name=LEGACY_COLLECTION)
+        except Exception:
+            return
+
+        total = legacy.count()
+        if not total:
+            return
+        print(f"ContextualMemory: re-embedding {total} legacy memories with the shared encoder...")
+        for offset in range(0, total, batch_size):
+            page = legacy.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not page['ids']:
+                break
+            vectors = self.encoder.embed_many(page['documents'])
             self.collection.add(
-                documents=[text],
-                metadatas=[metadata],
-                ids=[str(uuid.uuid4())]
+                ids=page['ids'],
+                documents=page['documents'],
+                metadatas=page['metadatas'],
+                embeddings=vectors.tolist()
             )
+
+    def _embedding_for(self, text, embedding):
+        if embedding is not None:
+            return [float(x) for x in embedding]
+        if self.encoder is not None:
+            return self.encoder.embed_many([text])[0].tolist()
+        return None
+
+    def add_memory(self, user_id, text, metadata=None, embedding=None):
+        """
+        Add a conversation snippet to vector memory.
+        Pass a precomputed embedding to avoid re-encoding the text.
+        """
+        self.add_memories([{"user_id": user_id, "text": text,
+                            "metadata": metadata, "embedding": embedding}])
+
+    def add_memories(self, items):
+        """
+        Batch insert: one Chroma call for many snippets.
+        Each item is a dict with user_id, text and optional metadata,
+        embedding, timestamp and id. Items with an id are upserted, so
+        re-applying the same batch is harmless.
+        """
+        if not items:
+            return
+
+        ids, documents, metadatas, vectors = [], [], [], []
+        for item in items:
+            metadata = dict(item.get("metadata") or {})
+            metadata['user_id'] = str(item["user_id"])
+            metadata['timestamp'] = str(item.get("timestamp") or datetime.datetime.now().isoformat())
+            ids.append(item.get("id") or str(uuid.uuid4()))
+            documents.append(item["text"])
+            metadatas.append(metadata)
+            vectors.append(item.get("embedding"))
+
+        users = [m['user_id'] for m in metadatas]
+        before = {}  # user -> store state before this write (mmap store only)
+        if self.use_chroma:
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            if missing and self.encoder is not None:
+                encoded = self.encoder.embed_many([documents[i] for i in missing])
+                for i, vector in zip(missing, encoded):
+                    vectors[i] = vector
+
+            # One write per collection (a single one unless sharded)
+            by_collection = {}
+            for i, metadata in enumerate(metadatas):
+                collection = self._collection_for(metadata['user_id'])
+                by_collection.setdefault(id(collection), (collection, []))[1].append(i)
+            for collection, rows in by_collection.values():
+                write = getattr(collection, "upsert", collection.add)
+                if all(vectors[i] is not None for i in rows):
+                    write(
+                        documents=[documents[i] for i in rows],
+                        metadatas=[metadatas[i] for i in rows],
+                        embeddings=[[float(x) for x in vectors[i]] for i in rows],
+                        ids=[ids[i] for i in rows]
+                    )
+                else:
+                    write(
+                        documents=[documents[i] for i in rows],
+                        metadatas=[metadatas[i] for i in rows],
+                        ids=[ids[i] for i in rows]
+                    )
         else:
-            # Fallback
-            self.memory_store.append({
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "metadata": metadata
-            })
+            # Local engine: one partition per user
+            if self.encoder is not None:
+                missing = [i for i, v in enumerate(vectors) if v is None]
+                if missing:
+                    encoded = self.encoder.embed_many([documents[i] for i in missing])
+                    for i, vector in zip(missing, encoded):
+                        vectors[i] = vector
+            if self.retrieval_cache is not None:
+                before = {u: self._store_state(u) for u in set(users)}
+            self.index.add_batch(users, ids, documents, metadatas, vectors)
+
+        if self.retrieval_cache is not None:
+            for id_, text, metadata, vector in zip(ids, documents, metadatas, vectors):
+                self.retrieval_cache.add(metadata['user_id'], vector, {"id": id_, "text": text, "metadata": metadata})
+            for user_id, state in before.items():
+                # Patched entries stay valid only if nobody else wrote in between
+                if state is not None:
+                    n = users.count(user_id)
+                    expected = (state[0], state[1] + n, state[2] + n)
+                    if self._store_state(user_id) == expected:
+                        self.retrieval_cache.retoken(user_id, state, expected)
 
-    def retrieve_context(self, user_id, query_text, n_results=3):
+    def retrieve_context(self, user_id, query_text, n_results=3, query_embedding=None):
         """
         Retrieve relevant past interactions for a specific user.
+        Pass a precomputed query_embedding (or the request's LazyFeatures) to
+        avoid re-encoding the query; a lazy one is only resolved if there is
+        something to search.
         """
+        store_state = self._store_state(user_id)
+        if not self.use_chroma and (store_state[2] if store_state else self.index.count(user_id)) == 0:
+            return []
+        vector = self._embedding_for(query_text, resolve_features(query_embedding))
+        cache = self.retrieval_cache if vector is not None else None
+        if cache is not None:
+            cached = cache.get(user_id, vector, n_results, token=store_state)
+            if cached is not None:
+                self._touch(cached)
+                return cached
+            version = cache.version(user_id)
+
+        hits = self._search(user_id, query_text, vector, n_results)
+        if cache is not None and all(score is not None for score, _ in hits):
+            cache.put(user_id, vector, n_results, hits, version=version, token=store_state)
+        items = [item for _, item in hits]
+        self._touch(items)
+        return items
+
+    def _store_state(self, user_id):
+        # Cross-process change token for the retrieval cache. Only the mmap
+        # store is shared by several workers (Chroma is served by one, the
+        # in-memory index is per process), so the others need none.
+        if self.use_chroma or not hasattr(self.index, "user_state"):
+            return None
+        return self.index.user_state(user_id)
+
+    def _touch(self, items):
+        # Feeds least-recently-retrieved eviction (contextual_memory.lifecycle)
+        if self.access_tracker is not None and items:
+            self.access_tracker.touch([item["id"] for item in items])
+
+    def _search(self, user_id, query_text, vector, n_results):
+        # [(cosine similarity or None, {"id", "text", "metadata"})], best first
         if self.use_chroma:
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                where={"user_id": str(user_id)}
-            )
-            
+            collection = self._collection_for(user_id)
+            if vector is not None:
+                results = collection.query(
+                    query_embeddings=[vector],
+                    n_results=n_results,
+                    where={"user_id": str(user_id)}
+                )
+            else:
+                results = collection.query(
+                    query_texts=[query_text],
+                    n_results=n_results,
+                    where={"user_id": str(user_id)}
+                )
+
             if not results['documents']:
                 return []
-                
+
             documents = results['documents'][0]
             metadatas = results['metadatas'][0]
-            
+            # Cosine space: similarity = 1 - distance
+            distances = (results.get('distances') or [[None] * len(documents)])[0]
+
             context_items = []
-            for doc, meta in zip(documents, metadatas):
-                context_items.append({
+            for id_, doc, meta, dist in zip(results['ids'][0], documents, metadatas, distances):
+                context_items.append((None if dist is None else 1.0 - float(dist), {
+                    "id": id_,
                     "text": doc,
                     "metadata": meta
-                })
+                }))
             return context_items
         else:
-            # Fallback: Simple keyword match or recent history
-            # For simplicity, just return recent items for this user
-            user_items = [item for item in self.memory_store if item['metadata']['user_id'] == str(user_id)]
-            # Reverse to get most recent
-            recent = user_items[-n_results:]
-            return [{"text": i["text"], "metadata": i["metadata"]} for i in recent]
+            # Local engine: cosine top-k over this user's partition only
+            # (most recent items if there is nothing to embed the query with)
+            hits = self.index.search(user_id, vector, k=n_results)
+            return [(score, {"id": id_, "text": doc, "metadata": meta}) for id_, doc, meta, score in hits]
 
     def delete_user_memory(self, user_id):
         """
         Clear memory for a specific user.
         """
         if self.use_chroma:
-            self.collection.delete(
+            self._collection_for(user_id).delete(
                 where={"user_id": str(user_id)}
             )
         else:
-            self.memory_store = [item for item in self.memory_store if item['metadata']['user_id'] != str(user_id)]
+            self.index.delete(user_id)
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate(user_id)
+
+    # --- lifecycle support (contextual_memory.lifecycle) ---------------------
+
+    def _all_collections(self):
+        if self.router is None:
+            return [self.collection]
+        return [self._open_collection(name) for name in self.router.all_shards()]
+
+    def list_users(self, page_size=1000):
+        """
+        user_ids that have at least one memory.
+        """
+        if not self.use_chroma:
+            return self.index.users()
+        users = set()
+        for collection in self._all_collections():
+            offset = 0
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                if not page['ids']:
+                    break
+                users.update(str(m.get('user_id')) for m in page['metadatas'] if m.get('user_id') is not None)
+                offset += page_size
+        return sorted(users)
+
+    def user_memories(self, user_id):
+        """
+        All memories of one user as dicts with id, text, metadata, embedding.
+        """
+        if not self.use_chroma:
+            return [{"id": id_, "text": doc, "metadata": meta, "embedding": vector}
+                    for id_, doc, meta, vector in self.index.items(user_id)]
+        page = self._collection_for(user_id).get(where={"user_id": str(user_id)},
+                                                 include=["documents", "metadatas", "embeddings"])
+        embeddings = page.get('embeddings')
+        if embeddings is None or not len(embeddings):
+            embeddings = [None] * len(page['ids'])
+        return [{"id": id_, "text": doc, "metadata": meta, "embedding": emb}
+                for id_, doc, meta, emb in zip(page['ids'], page['documents'], page['metadatas'], embeddings)]
+
+    def delete_memories(self, user_id, ids):
+        if not ids:
+            return
+        if self.use_chroma:
+            self._collection_for(user_id).delete(ids=list(ids))
+        else:
+            self.index.delete(user_id, list(ids))
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate(user_id)
+
+    def compact(self):
+        """
+        Reclaim space after bulk deletes (Chroma manages its own index).
+        """
+        if self.use_chroma:
+            return None
+        if hasattr(self.index, "merge"):
+            return self.index.merge()
+        self.index.compact()
+        return None
+
+    def stats(self):
+        if not self.use_chroma:
+            stats = dict(self.index.stats(), backend=self.backend if self.backend == "mmap" else "fallback")
+        elif self.router is None:
+            stats = {"backend": "chroma", "items": self.collection.count()}
+        else:
+            shards = {name: self._open_collection(name).count() for name in self.router.all_shards()}
+            stats = {"backend": "chroma", "items": sum(shards.values()), "shards": shards,
+                     "overrides": len(self.router.overrides)}
+        if self.retrieval_cache is not None:
+            stats["retrieval_cache"] = self.retrieval_cache.stats()
+        return stats
 
 # Singleton instance will be created in app init
@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from contextual_memory.mmap_store import FileLock
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+ACCESS_FILE = "memory_access.json"
+JOB_LOCK_FILE = "lifecycle.lock"
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Snippet:
+    # What HeuristicSummarizer.generate_summary expects from a message
+    __slots__ = ("content_text", "sender")
+
+    def __init__(self, text):
+        self.content_text = text
+        self.sender = "user"
+
+
+class MemoryLifecycle:
+    """
+    Keeps each user's memory partition bounded as it ages:
+
+      1. expiry        memories older than ttl_days are deleted
+      2. consolidation snippets older than consolidate_after_days are merged,
+                       per detected state and in time order, into one summary
+                       memory per group_size snippets (HeuristicSummarizer
+                       text, centroid embedding)
+      3. size cap      above max_per_user, the least recently retrieved
+                       memories are evicted (never retrieved = created time)
+
+    Retrievals are recorded in-process by touch() (ContextualMemory calls it
+    with the ids it returns) and merged into a small JSON file shared by all
+    workers. A background thread flushes that file every flush_interval and
+    runs the job every interval_seconds; a non-blocking file lock makes sure
+    only one process runs it at a time. Any setting <= 0 disables that step.
+    """
+    def __init__(self, memory, summarizer, state_dir, ttl_days=365, consolidate_after_days=30,
+                 group_size=20, max_per_user=2000, interval_seconds=3600, flush_interval=60):
+        self.memory = memory
+        self.summarizer = summarizer
+        self.state_dir = state_dir
+        self.ttl_days = ttl_days
+        self.consolidate_after_days = consolidate_after_days
+        self.group_size = max(2, int(group_size))
+        self.max_per_user = max_per_user
+        self.interval = interval_seconds
+        self.flush_interval = flush_interval
+
+        self._pending = {}  # memory id -> last retrieved (epoch seconds), not yet flushed
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.runs = 0
+        self.last_run = None
+        self.last_report = None
+
+    @property
+    def access_path(self):
+        return os.path.join(self.state_dir, ACCESS_FILE)
+
+    # --- access tracking -----------------------------------------------------
+
+    def touch(self, ids):
+        now = time.time()
+        with self._lock:
+            for id_ in ids:
+                self._pending[id_] = now
+        self._ensure_worker()
+
+    def _read_access(self):
+        try:
+            with open(self.access_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_access(self, access):
+        tmp = f"{self.access_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(access, f, separators=(",", ":"))
+        os.replace(tmp, self.access_path)
+
+    def flush(self, forget=()):
+        """
+        Merge this process's retrievals into the shared access file (newest
+        timestamp wins) and drop `forget` ids. Returns the merged map.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        os.makedirs(self.state_dir, exist_ok=True)
+        with FileLock(self.access_path + ".lock"):
+            access = self._read_access()
+            for id_, ts in pending.items():
+                if ts > access.get(id_, 0):
+                    access[id_] = ts
+            for id_ in forget:
+                access.pop(id_, None)
+            if pending or forget:
+                self._write_access(access)
+            return access
+
+    # --- background thread ---------------------------------------------------
+
+    def _ensure_worker(self):
+        # One thread per serving process; after a fork each worker starts its own
+        if self.interval <= 0 and self.flush_interval <= 0:
+            return
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._lock = threading.Lock()
+                self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="memory-lifecycle", daemon=True)
+            self._worker.start()
+
+    def start(self):
+        self._ensure_worker()
+
+    def _run(self):
+        tick = min(t for t in (self.interval, self.flush_interval) if t > 0)
+        while not self._stop.wait(tick):
+            try:
+                if self._pending:
+                    self.flush()
+                if self.interval > 0 and self._due():
+                    self.run_once(blocking=False)
+            except Exception as e:
+                print(f"Memory lifecycle error: {e}")
+
+    def _due(self):
+        # Last completed run across all processes = mtime of the job lock file
+        try:
+            return time.time() - os.stat(os.path.join(self.state_dir, JOB_LOCK_FILE)).st_mtime >= self.interval
+        except OSError:
+            return True
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    # --- the job -------------------------------------------------------------
+
+    def run_once(self, blocking=True):
+        """
+        Expire, consolidate and cap every user's memories. Returns a report,
+        or None if another process holds the job lock (blocking=False).
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        lock_path = os.path.join(self.state_dir, JOB_LOCK_FILE)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return None
+            started = time.perf_counter()
+            access = self.flush()
+            report = {"users": 0, "expired": 0, "consolidated": 0, "summaries": 0, "evicted": 0}
+            live, complete = set(), True
+            for user_id in self.memory.list_users():
+                try:
+                    live.update(self._process_user(user_id, access, report))
+                except Exception as e:
+                    print(f"Memory lifecycle failed for user {user_id}: {e}")
+                    complete = False
+                report["users"] += 1
+            # Forget deleted memories so the access file stays as small as the store
+            if complete:
+                self.flush(forget=[i for i in access if i not in live])
+            compacted = self.memory.compact()
+            if compacted is not None:
+                report["compaction"] = compacted
+            report["seconds"] = round(time.perf_counter() - started, 3)
+
+            os.utime(lock_path)
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+            self.last_report = report
+            print(f"Memory lifecycle: {report}")
+            return report
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _process_user(self, user_id, access, report, now=None):
+        """
+        One user's pass. Returns the ids that survive it.
+        """
+        now = now or datetime.now()
+        items = self.memory.user_memories(user_id)
+        if not items:
+            return set()
+        for item in items:
+            item["created"] = _parse_ts(item["metadata"].get("timestamp")) or now
+
+        doomed = []
+        if self.ttl_days > 0:
+            cutoff = now - timedelta(days=self.ttl_days)
+            doomed = [i for i in items if i["created"] < cutoff]
+            items = [i for i in items if i["created"] >= cutoff]
+            report["expired"] += len(doomed)
+
+        summaries = []
+        if self.consolidate_after_days > 0:
+            cutoff = now - timedelta(days=self.consolidate_after_days)
+            old = [i for i in items if i["created"] < cutoff and i["metadata"].get("kind") != "summary"]
+            by_state = {}
+            for item in sorted(old, key=lambda i: i["created"]):
+                by_state.setdefault(item["metadata"].get("state") or "Neutral", []).append(item)
+            merged = set()
+            for state, group in by_state.items():
+                for start in range(0, len(group), self.group_size):
+                    chunk = group[start:start + self.group_size]
+                    if len(chunk) < 2:
+                        continue
+                    summaries.append(self._summarize(user_id, state, chunk))
+                    merged.update(i["id"] for i in chunk)
+                    doomed.extend(chunk)
+                    report["consolidated"] += len(chunk)
+            items = [i for i in items if i["id"] not in merged]
+            report["summaries"] += len(summaries)
+
+        if self.max_per_user > 0 and len(items) + len(summaries) > self.max_per_user:
+            # Least recently retrieved first; a new summary dates from its newest snippet
+            candidates = items + [dict(s, created=_parse_ts(s["timestamp"])) for s in summaries]
+            candidates.sort(key=lambda i: access.get(i["id"]) or i["created"].timestamp())
+            evicted = {i["id"] for i in candidates[:len(candidates) - self.max_per_user]}
+            doomed.extend(i for i in items if i["id"] in evicted)
+            summaries = [s for s in summaries if s["id"] not in evicted]
+            items = [i for i in items if i["id"] not in evicted]
+            report["evicted"] += len(evicted)
+
+        # Summaries land before the originals go, so a concurrent query never sees a gap
+        if summaries:
+            self.memory.add_memories(summaries)
+        self.memory.delete_memories(user_id, [i["id"] for i in doomed])
+        return {i["id"] for i in items} | {s["id"] for s in summaries}
+
+    def _summarize(self, user_id, state, chunk):
+        vectors = [np.asarray(i["embedding"], dtype=np.float32) for i in chunk if i.get("embedding") is not None]
+        vectors = [v for v in vectors if np.linalg.norm(v) > 0]
+        centroid = None
+        text = self.summarizer.generate_summary([_Snippet(i["text"]) for i in chunk], detected_state=state)
+        if vectors:
+            matrix = np.stack(vectors)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            centroid = matrix.mean(axis=0)
+            centroid /= np.linalg.norm(centroid) or 1.0
+            # Keep the most representative snippet verbatim so the summary still reads like the user
+            representative = [i for i in chunk if i.get("embedding") is not None
+                              and np.linalg.norm(i["embedding"]) > 0][int(np.argmax(matrix @ centroid))]
+            text = f"{text} | e.g. \"{representative['text']}\""
+        first, last = chunk[0], chunk[-1]
+        return {
+            # Deterministic id: re-running over the same snippets upserts instead of duplicating
+            "id": f"summary-{user_id}-{zlib.crc32(','.join(i['id'] for i in chunk).encode('utf-8')):08x}",
+            "user_id": user_id,
+            "text": text,
+            "metadata": {"kind": "summary", "state": state, "source_count": len(chunk),
+                         "period_start": first["created"].isoformat(),
+                         "period_end": last["created"].isoformat()},
+            "embedding": None if centroid is None else centroid.tolist(),
+            "timestamp": last["created"].isoformat()
+        }
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_report": self.last_report,
+            "pending_access_updates": pending,
+            "ttl_days": self.ttl_days,
+            "consolidate_after_days": self.consolidate_after_days,
+            "max_per_user": self.max_per_user
+        }
+
+
+if __name__ == "__main__":
+    # Maintenance: python -m contextual_memory.lifecycle  (one run, same settings as the app)
+    from config import config
+    from services import ServiceContainer
+
+    services = ServiceContainer(config)
+    report = services.memory_lifecycle.run_once()
+    print(json.dumps(report, indent=2))
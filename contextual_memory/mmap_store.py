@@ -0,0 +1,568 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from contextual_memory import quantization
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+STATE_FILE = "state.json"
+LOCK_FILE = "LOCK"
+
+
+def _hash64(value):
+    return np.uint64(int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little"))
+
+
+class _Segment:
+    """
+    One fixed-capacity, append-only segment. Column files (all .npy, opened
+    as shared memory maps):
+      vec    (capacity, dim)  unit-normalized embeddings
+      user   (capacity,)      64-bit hash of the owner's user_id
+      idh    (capacity,)      64-bit hash of the memory id (upserts / deletes)
+      alive  (capacity,)      1 = live, 0 = tombstone
+      loc    (capacity, 2)    (byte offset, length) of the row in meta.jsonl
+    int8 stores add
+      scale  (capacity,)      float32 quantization scale per row
+      exact  (capacity, dim)  rerank copy (only with a rerank dtype); only
+                              the shortlist's rows are ever paged in
+    plus meta.jsonl, the sidecar with id, document and metadata per row.
+    """
+    def __init__(self, base, dim, dtype, capacity, create=False, rerank_dtype=None):
+        mode = "w+" if create else "r+"
+        self.base = base
+        self.scale = self.exact = None
+        if quantization.is_quantized(dtype):
+            self.scale = np.lib.format.open_memmap(base + ".scale.npy", mode=mode, dtype=np.float32,
+                                                   shape=(capacity,) if create else None)
+            if rerank_dtype:
+                self.exact = np.lib.format.open_memmap(base + ".exact.npy", mode=mode, dtype=rerank_dtype,
+                                                       shape=(capacity, dim) if create else None)
+        self.vec = np.lib.format.open_memmap(base + ".vec.npy", mode=mode, dtype=dtype,
+                                             shape=(capacity, dim) if create else None)
+        self.user = np.lib.format.open_memmap(base + ".user.npy", mode=mode, dtype=np.uint64,
+                                              shape=(capacity,) if create else None)
+        self.idh = np.lib.format.open_memmap(base + ".idh.npy", mode=mode, dtype=np.uint64,
+                                             shape=(capacity,) if create else None)
+        self.alive = np.lib.format.open_memmap(base + ".alive.npy", mode=mode, dtype=np.uint8,
+                                               shape=(capacity,) if create else None)
+        self.loc = np.lib.format.open_memmap(base + ".loc.npy", mode=mode, dtype=np.int64,
+                                             shape=(capacity, 2) if create else None)
+        self.meta_path = base + ".meta.jsonl"
+        if create:
+            open(self.meta_path, "ab").close()
+        self.meta_fd = os.open(self.meta_path, os.O_RDONLY)
+
+    @property
+    def capacity(self):
+        return self.vec.shape[0]
+
+    def read_meta(self, row):
+        offset, length = self.loc[row]
+        return json.loads(os.pread(self.meta_fd, int(length), int(offset)))
+
+    @property
+    def columns(self):
+        return [c for c in ("vec", "user", "idh", "alive", "loc", "scale", "exact") if getattr(self, c) is not None]
+
+    def flush(self):
+        for column in self.columns:
+            getattr(self, column).flush()
+
+    def close(self):
+        try:
+            os.close(self.meta_fd)
+        except OSError:
+            pass
+
+
+class MmapVectorStore:
+    """
+    ChromaDB-free persistent vector store for ContextualMemory.
+
+    Vectors live in append-only, memory-mapped .npy segments under one
+    directory. Every process maps the same files, so workers open the store
+    in milliseconds and share pages through the OS page cache. A per-user
+    offset index (user -> global row numbers) is built with numpy when the
+    store is opened and extended as rows are appended, so a query only
+    touches the requesting user's rows.
+
+    Deletes flip the row's `alive` byte in place (a tombstone every process
+    sees at once); merge() rewrites the live rows into a new generation of
+    segments. Writers serialize on a file lock; state.json (generation,
+    segment count, rows in the tail segment) tells readers when to pick up
+    new rows or reopen after a merge.
+
+    The storage dtype (float32 / float16 / int8, plus the int8 rerank
+    copy, kept on disk here rather than as VectorIndex's in-RAM residual)
+    and segment_rows are recorded in state.json when the store is created
+    and win over the arguments on later opens.
+
+    Same interface as VectorIndex: add / search / delete / count / stats.
+    """
+    def __init__(self, path, dim, dtype="float32", segment_rows=16384, rerank_dtype=None, rerank_factor=4):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.rerank_dtype = np.dtype(rerank_dtype) if rerank_dtype and quantization.is_quantized(dtype) else None
+        self.rerank_factor = rerank_factor
+        self.segment_rows = int(segment_rows)
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._state = None
+        self._segments = []
+        self._by_user = {}   # user hash -> list of int64 arrays of global rows
+        self._indexed = 0    # global rows covered by _by_user
+        with self._file_lock():
+            if not os.path.exists(os.path.join(path, STATE_FILE)):
+                self._write_state({"generation": 0, "segments": 0, "tail_rows": 0, "dtype": self.dtype.name,
+                                   "rerank_dtype": self.rerank_dtype.name if self.rerank_dtype is not None else None,
+                                   "segment_rows": self.segment_rows})
+        self._adopt_layout(self._read_state())
+        self._refresh()
+
+    def _adopt_layout(self, state):
+        # Row addressing depends on segment_rows: the value the files were written with wins
+        segment_rows = state.get("segment_rows")
+        if segment_rows is None and state["segments"]:
+            # Store created before segment_rows was recorded: the capacity of its segment files
+            segment_rows = np.load(self._segment_base(state["generation"], 0) + ".user.npy", mmap_mode="r").shape[0]
+        if segment_rows is not None and int(segment_rows) != self.segment_rows:
+            print(f"MmapVectorStore: {self.path} uses {segment_rows} rows per segment; "
+                  f"ignoring the configured {self.segment_rows} (MEMORY_MMAP_SEGMENT_ROWS).")
+            self.segment_rows = int(segment_rows)
+
+        if "dtype" not in state:
+            # Store created before dtypes were recorded: whatever the vector files hold
+            if state["segments"]:
+                vec = np.load(self._segment_base(state["generation"], 0) + ".vec.npy", mmap_mode="r")
+                self.dtype, self.rerank_dtype = vec.dtype, None
+            return
+        dtype = np.dtype(state["dtype"])
+        rerank_dtype = np.dtype(state["rerank_dtype"]) if state.get("rerank_dtype") else None
+        if (dtype, rerank_dtype) != (self.dtype, self.rerank_dtype):
+            print(f"MmapVectorStore: {self.path} stores {dtype.name} vectors "
+                  f"(rerank {rerank_dtype.name if rerank_dtype is not None else 'off'}); ignoring the configured dtype.")
+        self.dtype, self.rerank_dtype = dtype, rerank_dtype
+
+    # --- files / state -------------------------------------------------------
+
+    def _file_lock(self):
+        return FileLock(os.path.join(self.path, LOCK_FILE))
+
+    def _gen_dir(self, generation):
+        return os.path.join(self.path, f"gen-{generation:05d}")
+
+    def _segment_base(self, generation, index):
+        return os.path.join(self._gen_dir(generation), f"seg-{index:05d}")
+
+    def _read_state(self):
+        with open(os.path.join(self.path, STATE_FILE)) as f:
+            return json.load(f)
+
+    def _write_state(self, state):
+        tmp = os.path.join(self.path, STATE_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, STATE_FILE))
+
+    @property
+    def _total_rows(self):
+        if not self._state or not self._state["segments"]:
+            return 0
+        return (self._state["segments"] - 1) * self.segment_rows + self._state["tail_rows"]
+
+    def _refresh(self):
+        """
+        Catch up with other writers: open new segments, index new rows, or
+        reopen everything if a merge started a new generation.
+        """
+        with self._lock:
+            state = self._read_state()
+            if state == self._state:
+                return
+            if self._state is None or state["generation"] != self._state["generation"]:
+                for seg in self._segments:
+                    seg.close()
+                self._segments = []
+                self._by_user = {}
+                self._indexed = 0
+            while len(self._segments) < state["segments"]:
+                self._segments.append(_Segment(self._segment_base(state["generation"], len(self._segments)),
+                                               self.dim, self.dtype, self.segment_rows,
+                                               rerank_dtype=self.rerank_dtype))
+            self._state = state
+            self._index_rows(self._indexed, self._total_rows)
+
+    def _index_rows(self, start, end):
+        # Extend the per-user offset index with global rows [start, end)
+        row = start
+        while row < end:
+            seg_index, offset = divmod(row, self.segment_rows)
+            stop = min(end - seg_index * self.segment_rows, self.segment_rows)
+            users = np.asarray(self._segments[seg_index].user[offset:stop])
+            order = np.argsort(users, kind="stable")
+            keys, starts = np.unique(users[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            for key, a, b in zip(keys.tolist(), starts.tolist(), bounds):
+                rows = (order[a:b] + offset + seg_index * self.segment_rows).astype(np.int64)
+                self._by_user.setdefault(key, []).append(np.sort(rows))
+            row = seg_index * self.segment_rows + stop
+        self._indexed = end
+
+    def _user_rows(self, user_hash):
+        parts = self._by_user.get(int(user_hash))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if len(parts) > 1:
+            parts[:] = [np.concatenate(parts)]
+        return parts[0]
+
+    def _gather(self, rows, column):
+        # Column values for global rows (in the order given), one slice per segment touched
+        seg_ids, offsets = np.divmod(rows, self.segment_rows)
+        out, order = [], []
+        for seg_index in np.unique(seg_ids):
+            mask = np.flatnonzero(seg_ids == seg_index)
+            out.append(np.asarray(getattr(self._segments[seg_index], column)[offsets[mask]]))
+            order.append(mask)
+        if not out:
+            return np.empty(0)
+        gathered = np.concatenate(out)
+        if len(out) > 1:
+            result = np.empty_like(gathered)
+            result[np.concatenate(order)] = gathered
+            return result
+        return gathered
+
+    def _normalize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # --- public API ----------------------------------------------------------
+
+    def add(self, user_id, ids, documents, metadatas, vectors=None):
+        """
+        Append memories for one user. Re-adding an existing id tombstones
+        the old row first (upsert), so replayed batches don't duplicate.
+        """
+        self.add_batch([user_id] * len(ids), ids, documents, metadatas, vectors)
+
+    def add_batch(self, user_ids, ids, documents, metadatas, vectors=None):
+        """
+        Append memories of many users under one lock / one flush
+        (user_ids gives the owner of each row).
+        """
+        if not ids:
+            return
+        rows = np.zeros((len(ids), self.dim), dtype=np.float32)
+        if vectors is not None:
+            for i, v in enumerate(vectors):
+                if v is not None:
+                    rows[i] = v
+        rows = self._normalize(rows)
+        codes, scales = quantization.encode(rows, self.dtype)
+        user_hashes = np.array([_hash64(u) for u in user_ids], dtype=np.uint64)
+        id_hashes = np.array([_hash64(i) for i in ids], dtype=np.uint64)
+
+        with self._file_lock(), self._lock:
+            self._refresh()
+            for user_hash in np.unique(user_hashes):
+                self._tombstone(self._user_rows(user_hash), id_hashes[user_hashes == user_hash])
+
+            state = dict(self._state)
+            state.setdefault("dtype", self.dtype.name)
+            state.setdefault("rerank_dtype", self.rerank_dtype.name if self.rerank_dtype is not None else None)
+            state.setdefault("segment_rows", self.segment_rows)
+            touched = set()
+            pos = 0
+            while pos < len(ids):
+                if state["segments"] == 0 or state["tail_rows"] >= self.segment_rows:
+                    os.makedirs(self._gen_dir(state["generation"]), exist_ok=True)
+                    self._segments.append(_Segment(self._segment_base(state["generation"], state["segments"]),
+                                                   self.dim, self.dtype, self.segment_rows, create=True,
+                                                   rerank_dtype=self.rerank_dtype))
+                    state["segments"] += 1
+                    state["tail_rows"] = 0
+                seg = self._segments[state["segments"] - 1]
+                n = min(len(ids) - pos, self.segment_rows - state["tail_rows"])
+                src = slice(pos, pos + n)
+                dst = slice(state["tail_rows"], state["tail_rows"] + n)
+
+                lines = [(json.dumps({"id": ids[i], "document": documents[i], "metadata": metadatas[i]}) + "\n").encode("utf-8")
+                         for i in range(pos, pos + n)]
+                self._append_meta(seg, dst, lines)
+                seg.vec[dst] = codes[src]
+                if seg.scale is not None:
+                    seg.scale[dst] = scales[src]
+                if seg.exact is not None:
+                    seg.exact[dst] = rows[src]
+                seg.user[dst] = user_hashes[src]
+                seg.idh[dst] = id_hashes[src]
+                seg.alive[dst] = 1
+                state["tail_rows"] += n
+                pos += n
+                touched.add(seg)
+
+            for seg in touched:
+                seg.flush()
+            self._write_state(state)
+            self._refresh()
+
+    @staticmethod
+    def _append_meta(seg, dst, lines):
+        with open(seg.meta_path, "ab") as f:
+            base = f.tell()
+            f.write(b"".join(lines))
+        lengths = np.array([len(line) for line in lines], dtype=np.int64)
+        seg.loc[dst, 0] = base + np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        seg.loc[dst, 1] = lengths
+
+    def _tombstone(self, rows, id_hashes=None):
+        if not len(rows):
+            return 0
+        if id_hashes is not None:
+            rows = rows[np.isin(self._gather(rows, "idh"), id_hashes)]
+        rows = rows[self._gather(rows, "alive") == 1] if len(rows) else rows
+        seg_ids, offsets = np.divmod(rows, self.segment_rows)
+        for seg_index in np.unique(seg_ids):
+            seg = self._segments[seg_index]
+            seg.alive[offsets[seg_ids == seg_index]] = 0
+            seg.alive.flush()
+        return len(rows)
+
+    def search(self, user_id, query_vector=None, k=3):
+        """
+        Top-k memories of one user by cosine similarity, best first, as
+        (id, document, metadata, score) tuples. Without a query vector the
+        k most recent memories are returned instead.
+        """
+        with self._lock:
+            self._refresh()
+            rows = self._user_rows(_hash64(user_id))
+            if not len(rows):
+                return []
+            rows = rows[self._gather(rows, "alive") == 1]
+            if not len(rows):
+                return []
+
+            if query_vector is None:
+                top = rows[::-1][:k]
+                scores = [None] * len(top)
+            else:
+                query = self._normalize(query_vector)[0]
+                scales = self._gather(rows, "scale") if quantization.is_quantized(self.dtype) else None
+                approx = quantization.scores(self._gather(rows, "vec").reshape(len(rows), self.dim), scales, query)
+                rerank = None
+                if self.rerank_dtype is not None:
+                    # Only the shortlist's rerank rows are paged in
+                    rerank = lambda pos: self._gather(rows[pos], "exact").reshape(len(pos), self.dim).astype(np.float32) @ query
+                best, scores = quantization.top_k(approx, k, rerank, self.rerank_factor)
+                top, scores = rows[best], scores.tolist()
+
+            results = []
+            for row, score in zip(top, scores):
+                seg_index, offset = divmod(int(row), self.segment_rows)
+                meta = self._segments[seg_index].read_meta(offset)
+                results.append((meta["id"], meta["document"], meta["metadata"], score))
+            return results
+
+    def delete(self, user_id, ids=None):
+        """
+        Tombstone some (ids) or all (ids=None) memories of one user; only
+        that user's rows are touched. Returns the number removed.
+        """
+        with self._file_lock(), self._lock:
+            self._refresh()
+            rows = self._user_rows(_hash64(user_id))
+            id_hashes = None if ids is None else np.array([_hash64(i) for i in ids], dtype=np.uint64)
+            return self._tombstone(rows, id_hashes)
+
+    def items(self, user_id):
+        """
+        All live memories of one user as (id, document, metadata, vector).
+        """
+        with self._lock:
+            self._refresh()
+            rows = self._user_rows(_hash64(user_id))
+            if not len(rows):
+                return []
+            rows = rows[self._gather(rows, "alive") == 1]
+            if not len(rows):
+                return []
+            if self.rerank_dtype is not None:
+                vectors = self._gather(rows, "exact").reshape(len(rows), self.dim).astype(np.float32)
+            else:
+                vectors = quantization.decode(self._gather(rows, "vec").reshape(len(rows), self.dim),
+                                              self._gather(rows, "scale") if quantization.is_quantized(self.dtype) else None)
+            out = []
+            for row, vector in zip(rows, vectors):
+                seg_index, offset = divmod(int(row), self.segment_rows)
+                meta = self._segments[seg_index].read_meta(offset)
+                out.append((meta["id"], meta["document"], meta["metadata"], vector))
+            return out
+
+    def users(self):
+        """
+        user_ids with at least one live memory (rows only store a hash of
+        the user, so the id is read back from one row's metadata).
+        """
+        with self._lock:
+            self._refresh()
+            found = []
+            for key in list(self._by_user):
+                rows = self._user_rows(key)
+                rows = rows[self._gather(rows, "alive") == 1] if len(rows) else rows
+                if len(rows):
+                    seg_index, offset = divmod(int(rows[0]), self.segment_rows)
+                    meta = self._segments[seg_index].read_meta(offset)
+                    found.append(str(meta["metadata"].get("user_id")))
+            return found
+
+    def count(self, user_id=None):
+        with self._lock:
+            self._refresh()
+            if user_id is not None:
+                rows = self._user_rows(_hash64(user_id))
+                return int((self._gather(rows, "alive") == 1).sum()) if len(rows) else 0
+            return sum(int(np.asarray(seg.alive).sum()) for seg in self._segments)
+
+    def user_state(self, user_id):
+        """
+        (generation, rows, live rows) of one user. Rows only ever grow
+        within a generation, so this changes whenever any process adds,
+        deletes or merges the user's memories; per-process caches compare
+        it to notice another worker's writes.
+        """
+        with self._lock:
+            self._refresh()
+            rows = self._user_rows(_hash64(user_id))
+            alive = int((self._gather(rows, "alive") == 1).sum()) if len(rows) else 0
+            return (self._state["generation"], len(rows), alive)
+
+    def merge(self, min_dead_ratio=0.2):
+        """
+        Rewrite live rows into a fresh generation of segments (dropping
+        tombstones and coalescing partially filled segments). Skipped while
+        fewer than min_dead_ratio of the rows are dead. Readers switch over
+        on their next call; the old generation is removed afterwards.
+        """
+        with self._file_lock(), self._lock:
+            self._refresh()
+            total = self._total_rows
+            live = self.count()
+            if not total or (total - live) < min_dead_ratio * total:
+                return {"merged": False, "rows": total, "live": live}
+
+            old_generation = self._state["generation"]
+            generation = old_generation + 1
+            os.makedirs(self._gen_dir(generation), exist_ok=True)
+            new_segments = []
+            tail = self.segment_rows
+            for seg_index, seg in enumerate(self._segments):
+                used = self.segment_rows if seg_index < len(self._segments) - 1 else self._state["tail_rows"]
+                live_rows = np.flatnonzero(np.asarray(seg.alive[:used]) == 1)
+                pos = 0
+                while pos < len(live_rows):
+                    if tail >= self.segment_rows:
+                        new_segments.append(_Segment(self._segment_base(generation, len(new_segments)),
+                                                     self.dim, self.dtype, self.segment_rows, create=True,
+                                                     rerank_dtype=self.rerank_dtype))
+                        tail = 0
+                    out = new_segments[-1]
+                    n = min(len(live_rows) - pos, self.segment_rows - tail)
+                    chunk = live_rows[pos:pos + n]
+                    dst = slice(tail, tail + n)
+
+                    lines = [os.pread(seg.meta_fd, int(length), int(offset)) for offset, length in seg.loc[chunk]]
+                    self._append_meta(out, dst, lines)
+                    for column in ("vec", "user", "idh", "scale", "exact"):
+                        if getattr(out, column) is not None:
+                            getattr(out, column)[dst] = getattr(seg, column)[chunk]
+                    out.alive[dst] = 1
+                    tail += n
+                    pos += n
+            for seg in new_segments:
+                seg.flush()
+                seg.close()
+
+            self._write_state(dict(self._state, generation=generation, segments=len(new_segments),
+                                   tail_rows=tail if new_segments else 0))
+            self._refresh()
+            # Processes still mapping the old files keep valid (unlinked) pages until they refresh
+            shutil.rmtree(self._gen_dir(old_generation), ignore_errors=True)
+            return {"merged": True, "rows": total, "live": live}
+
+    def reopen(self):
+        with self._lock:
+            self._state = None
+            self._refresh()
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {
+                "backend": "mmap",
+                "generation": self._state["generation"],
+                "segments": self._state["segments"],
+                "rows": self._total_rows,
+                "items": self.count(),
+                "users": len(self._by_user),
+                "dtype": self.dtype.name,
+                "rerank_dtype": self.rerank_dtype.name if self.rerank_dtype is not None else None,
+                "bytes_per_vector": quantization.bytes_per_vector(self.dim, self.dtype, self.rerank_dtype)
+            }
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file (no-op where fcntl is unavailable).
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+if __name__ == "__main__":
+    # Maintenance: python -m contextual_memory.mmap_store [--merge] [--min-dead-ratio 0.2]
+    import argparse
+    from config import config
+
+    parser = argparse.ArgumentParser(description="Inspect / merge the memory-mapped contextual memory store.")
+    parser.add_argument("--path", default=os.path.join(config.CHROMA_DB_PATH, "mmap_store"))
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--merge", action="store_true", help="Rewrite live rows, dropping tombstones")
+    parser.add_argument("--min-dead-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    store = MmapVectorStore(args.path, args.dim, dtype=config.MEMORY_VECTOR_DTYPE,
+                            segment_rows=config.MEMORY_MMAP_SEGMENT_ROWS,
+                            rerank_dtype=config.MEMORY_RERANK_DTYPE, rerank_factor=config.MEMORY_RERANK_FACTOR)
+    if args.merge:
+        print(store.merge(min_dead_ratio=args.min_dead_ratio))
+    print(store.stats())
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Storage dtypes the local vector stores accept. float16 is scored as-is;
+# int8 is scalar-quantized per vector and can rerank: the mmap store keeps
+# a float copy on disk, the in-memory index a residual of the rounding.
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def is_quantized(dtype):
+    return np.dtype(dtype) == np.int8
+
+
+def encode(vectors, dtype):
+    """
+    Unit vectors (n, dim) float32 -> (codes, scales). For int8 every row
+    gets its own scale (max |x| / 127), so codes use the full range; other
+    dtypes are a plain cast and scales is None.
+    """
+    if not is_quantized(dtype):
+        return vectors.astype(dtype), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def decode(codes, scales=None):
+    vectors = np.asarray(codes).astype(np.float32)
+    if scales is not None:
+        vectors *= np.asarray(scales, dtype=np.float32)[:, None]
+    return vectors
+
+
+# Rows converted to float32 at a time: the converted block stays in cache
+# instead of materializing a full float32 copy of the partition per query
+SCORE_BLOCK_ROWS = 256
+
+# float32 bits of a float16 moved into place: the sign stays at bit 31,
+# exponent + mantissa shift right by 13 and the bias gap (127 - 15) is
+# fixed by one multiply, which also gets float16 subnormals right
+_HALF_KEEP_BITS = np.int32(-0x70000001)  # 0x8FFFFFFF: drop the copies of the sign bit
+_HALF_EXP_FIX = np.float32(2.0 ** 112)
+
+
+def _half_to_float(codes, out):
+    """
+    float16 rows -> float32 into `out` (same shape). Bit-exact for finite
+    values, about twice as fast as astype(np.float32), whose per-element
+    conversion dominated float16 queries. Unit vectors have no inf/NaN.
+    """
+    bits = out.view(np.int32)
+    np.left_shift(codes.view(np.int16), 16, out=bits, dtype=np.int32, casting="unsafe")
+    np.right_shift(bits, 3, out=bits)
+    np.bitwise_and(bits, _HALF_KEEP_BITS, out=bits)
+    np.multiply(out, _HALF_EXP_FIX, out=out)
+    return out
+
+
+def scores(codes, scales, query):
+    """
+    Approximate cosine scores of a float32 query against stored rows. The
+    query stays float, only the stored side is quantized, so the error is
+    the per-row rounding alone; int8 rows are scaled after the dot product.
+    """
+    codes = np.asarray(codes)
+    if codes.dtype == np.float32:
+        out = codes @ query
+    else:
+        out = np.empty(len(codes), dtype=np.float32)
+        block = np.empty((min(SCORE_BLOCK_ROWS, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            rows = codes[start:start + SCORE_BLOCK_ROWS]
+            converted = block[:len(rows)]
+            if rows.dtype == np.float16:
+                _half_to_float(rows, converted)
+            else:
+                converted[...] = rows
+            np.dot(converted, query, out=out[start:start + len(rows)])
+    if scales is not None:
+        out *= np.asarray(scales, dtype=np.float32)
+    return out
+
+
+def top_k(approx, k, rerank=None, rerank_factor=4):
+    """
+    Positions of the k best rows, best first, and their scores. `approx`
+    may hold -inf for rows that must not be returned. With `rerank`
+    (positions -> exact float scores) the best k * rerank_factor rows by the
+    approximate score are rescored and the final order comes from the
+    exact scores.
+    """
+    n = len(approx)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if rerank is not None:
+        m = min(n, k * max(1, int(rerank_factor)))
+        shortlist = np.argpartition(-approx, m - 1)[:m] if m < n else np.arange(n)
+        exact = np.where(np.isfinite(approx[shortlist]), rerank(shortlist), -np.inf)
+        order = np.argsort(-exact, kind="stable")[:k]
+        best, best_scores = shortlist[order], exact[order]
+    else:
+        best = np.argpartition(-approx, k - 1)[:k] if k < n else np.arange(n)
+        best = best[np.argsort(-approx[best], kind="stable")]
+        best_scores = approx[best]
+    keep = np.isfinite(best_scores)
+    return best[keep], best_scores[keep]
+
+
+# Bits per dimension of the residual that stands in for a rerank copy of
+# this dtype: 4 bits shrink the int8 rounding error about 15x (around
+# float16 precision), 8 bits about 250x
+RESIDUAL_BITS = {"float16": 4, "float32": 8}
+
+
+def residual_bits(rerank_dtype):
+    return RESIDUAL_BITS[np.dtype(rerank_dtype).name]
+
+
+def encode_residual(vectors, codes, scales, bits):
+    """
+    What int8 (codes, scales) still gets wrong, quantized per row to `bits`
+    (4 or 8) -> (residual, residual_scales). 4-bit codes are packed two per
+    byte, so a row takes ceil(dim / 2) bytes instead of a float copy's
+    dim * 2 or dim * 4.
+    """
+    error = vectors - decode(codes, scales)
+    levels = 2 ** (bits - 1) - 1
+    rscales = np.abs(error).max(axis=1) / levels
+    rscales[rscales == 0] = 1.0
+    rcodes = np.clip(np.rint(error / rscales[:, None]), -levels, levels).astype(np.int8)
+    if bits == 8:
+        return rcodes, rscales.astype(np.float32)
+    if rcodes.shape[1] % 2:
+        rcodes = np.pad(rcodes, ((0, 0), (0, 1)))
+    low = (rcodes[:, 0::2] + 8).astype(np.uint8)
+    high = (rcodes[:, 1::2] + 8).astype(np.uint8)
+    return low | (high << 4), rscales.astype(np.float32)
+
+
+def decode_residual(residual, rscales, dim):
+    residual = np.asarray(residual)
+    if residual.dtype == np.uint8:
+        unpacked = np.empty((len(residual), residual.shape[1] * 2), dtype=np.float32)
+        unpacked[:, 0::2] = (residual & 0x0F).astype(np.float32) - 8
+        unpacked[:, 1::2] = (residual >> 4).astype(np.float32) - 8
+        residual = unpacked[:, :dim]
+    return decode(residual, rscales)
+
+
+def bytes_per_vector(dim, dtype, rerank_dtype=None, residual=False):
+    size = dim * np.dtype(dtype).itemsize
+    if is_quantized(dtype):
+        size += 4  # float32 scale
+        if rerank_dtype and residual:
+            size += -(-dim * residual_bits(rerank_dtype) // 8) + 4  # codes + float32 scale
+        elif rerank_dtype:
+            size += dim * np.dtype(rerank_dtype).itemsize
+    return size
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("query", "k", "hits", "expires_at", "token")
+
+    def __init__(self, query, k, hits, expires_at, token=None):
+        self.query = query
+        self.k = k
+        self.hits = hits  # [(score, item)] best first
+        self.expires_at = expires_at
+        self.token = token  # Store state the hits were read at
+
+
+class RetrievalCache:
+    """
+    Per-user cache of recent query embeddings -> top-k retrieval results.
+
+    A lookup hits when one of the user's cached queries has cosine
+    similarity >= match_threshold with the new query (1.0 = same vector).
+    Writes go through the cache: a new memory can only displace the
+    current k-th neighbour of a cached query, so add() scores it against
+    each of the user's cached queries and splices it in where it belongs
+    instead of throwing the entry away. Anything we can't score (no vector)
+    or deletes invalidate the user's entries.
+
+    Bounded by max_users (LRU over users), queries_per_user (LRU within a
+    user) and ttl_seconds. Entries are per process: callers whose store is
+    shared between workers pass a token (the store's state for that user)
+    to put() and get(), and entries read at another state are dropped, so
+    another worker's write is seen on the next lookup. Without a token the
+    TTL bounds how stale a worker can be.
+    """
+    def __init__(self, max_users=10000, queries_per_user=8, ttl_seconds=300, match_threshold=0.999):
+        self.max_users = max_users
+        self.queries_per_user = queries_per_user
+        self.ttl = ttl_seconds
+        self.match_threshold = match_threshold
+        self._users = OrderedDict()  # user_id -> [_Entry], most recently used last
+        # Bumped by every write; a query that raced with a write isn't cached
+        self._versions = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0        # entries patched in place by a write
+        self.invalidations = 0  # users whose entries were dropped by a write/delete
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0          # entries dropped because the store changed under them
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, user_id, query_vector, k, token=None):
+        """
+        Cached top-k items for this query, or None on a miss.
+        """
+        query = self._normalize(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._users.get(str(user_id))
+            if entries:
+                live = [e for e in entries if e.expires_at > now]
+                self.expirations += len(entries) - len(live)
+                current = [e for e in live if e.token == token]
+                self.stale += len(live) - len(current)
+                entries[:] = current
+                for e in reversed(entries):
+                    if e.k >= k and float(e.query @ query) >= self.match_threshold:
+                        entries.remove(e)
+                        entries.append(e)
+                        self._users.move_to_end(str(user_id))
+                        self.hits += 1
+                        return [item for _, item in e.hits[:k]]
+            self.misses += 1
+            return None
+
+    def version(self, user_id):
+        with self._lock:
+            return (self._epoch, self._versions.get(str(user_id), 0))
+
+    def put(self, user_id, query_vector, k, hits, version=None, token=None):
+        """
+        Store the result of a real query. `hits` is [(score, item)] with
+        cosine similarity scores, best first. Pass the version() read before
+        querying so results that may predate a concurrent write are dropped.
+        """
+        entry = _Entry(self._normalize(query_vector), k, list(hits), time.monotonic() + self.ttl, token)
+        with self._lock:
+            if version is not None and (self._epoch, self._versions.get(str(user_id), 0)) != version:
+                return
+            entries = self._users.setdefault(str(user_id), [])
+            self._users.move_to_end(str(user_id))
+            entries.append(entry)
+            if len(entries) > self.queries_per_user:
+                del entries[0]
+                self.evictions += 1
+            while len(self._users) > self.max_users:
+                _, dropped = self._users.popitem(last=False)
+                self.evictions += len(dropped)
+
+    def add(self, user_id, vector, item):
+        """
+        Write-through for a new memory of this user.
+        """
+        with self._lock:
+            self._bump(user_id)
+            entries = self._users.get(str(user_id))
+            if not entries:
+                return
+            if vector is None:
+                del self._users[str(user_id)]
+                self.invalidations += 1
+                return
+            v = self._normalize(vector)
+            for e in entries:
+                score = float(e.query @ v)
+                if len(e.hits) < e.k or score > e.hits[-1][0]:
+                    e.hits.append((score, item))
+                    e.hits.sort(key=lambda h: h[0], reverse=True)
+                    del e.hits[e.k:]
+                    self.updates += 1
+
+    def retoken(self, user_id, before, after):
+        """
+        This process's own write moved the store from `before` to `after`
+        and add() already patched the entries: keep them current.
+        """
+        with self._lock:
+            for e in self._users.get(str(user_id), ()):
+                if e.token == before:
+                    e.token = after
+
+    def _bump(self, user_id):
+        # Caller holds self._lock
+        self._versions[str(user_id)] = self._versions.get(str(user_id), 0) + 1
+        if len(self._versions) > 2 * self.max_users:
+            # Only in-flight queries care about versions; a new epoch makes them all stale
+            self._versions.clear()
+            self._epoch += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._bump(user_id)
+            if self._users.pop(str(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._users),
+                "entries": sum(len(e) for e in self._users.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "updates": self.updates,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale": self.stale
+            }
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import zlib
+
+
+class ShardRouter:
+    """
+    Maps each user to the Chroma collection that holds their memories.
+
+    Users are hash-partitioned over `num_shards` collections
+    (<base>_shard<i>), so a filtered query only has to search the handful
+    of users sharing a shard instead of everyone. Hot users can be moved to
+    a dedicated collection (<base>_user<id>) or to another shard; those
+    moves are recorded as overrides in a small JSON map next to the Chroma
+    data. Other processes pick up changes to the map on their next lookup.
+
+    The shard count is fixed when the map is first written; changing
+    MEMORY_SHARDS afterwards only takes effect for a fresh store.
+    """
+    def __init__(self, map_path, base_name, num_shards=8):
+        self.map_path = map_path
+        self.base_name = base_name
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.num_shards = int(num_shards)
+        self.overrides = {}
+        if os.path.exists(map_path):
+            self._load()
+        else:
+            self._save()
+
+    def _load(self):
+        with open(self.map_path) as f:
+            data = json.load(f)
+        if data.get("base_name", self.base_name) == self.base_name:
+            self.num_shards = int(data.get("num_shards", self.num_shards))
+            self.overrides = dict(data.get("overrides", {}))
+        self._mtime = os.stat(self.map_path).st_mtime_ns
+
+    def _save(self):
+        tmp = self.map_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"base_name": self.base_name, "num_shards": self.num_shards,
+                       "overrides": self.overrides}, f, indent=2)
+        os.replace(tmp, self.map_path)
+        self._mtime = os.stat(self.map_path).st_mtime_ns
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self.map_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def hash_shard(self, user_id):
+        # crc32 is stable across processes and restarts (unlike hash())
+        return f"{self.base_name}_shard{zlib.crc32(str(user_id).encode('utf-8')) % self.num_shards}"
+
+    def dedicated_shard(self, user_id):
+        return f"{self.base_name}_user{user_id}"
+
+    def shard_for(self, user_id):
+        with self._lock:
+            self._maybe_reload()
+            return self.overrides.get(str(user_id)) or self.hash_shard(user_id)
+
+    def all_shards(self):
+        with self._lock:
+            self._maybe_reload()
+            names = {f"{self.base_name}_shard{i}" for i in range(self.num_shards)}
+            names.update(self.overrides.values())
+            return sorted(names)
+
+    def assign(self, user_id, shard_name):
+        """
+        Point a user at a new collection (the caller moves the data).
+        Assigning the user's hash shard clears the override.
+        """
+        with self._lock:
+            self._maybe_reload()
+            if shard_name == self.hash_shard(user_id):
+                self.overrides.pop(str(user_id), None)
+            else:
+                self.overrides[str(user_id)] = shard_name
+            self._save()
+
+
+# Copy/delete passes after the route switch (late writers are rare and short)
+MOVE_PASSES = 3
+
+
+def move_user(memory, user_id, target, page_size=500):
+    """
+    Move one user's memories to another collection without a window in
+    which reads miss them: copy, switch the route, copy anything written
+    to the old shard meanwhile, then delete from the old shard. Only ids
+    that were copied are deleted: a row written to the old shard after a
+    copy pass read it is picked up by the next pass, never lost.
+    """
+    router = memory.router
+    source_name = router.shard_for(user_id)
+    if source_name == target:
+        return 0
+    source = memory._open_collection(source_name)
+    dest = memory._open_collection(target)
+    where = {"user_id": str(user_id)}
+
+    def copy():
+        copied = []
+        offset = 0
+        while True:
+            page = source.get(where=where, limit=page_size, offset=offset,
+                              include=["documents", "metadatas", "embeddings"])
+            if not page["ids"]:
+                return copied
+            kwargs = {"ids": page["ids"], "documents": page["documents"], "metadatas": page["metadatas"]}
+            if page.get("embeddings") is not None and len(page["embeddings"]):
+                kwargs["embeddings"] = [list(map(float, e)) for e in page["embeddings"]]
+            getattr(dest, "upsert", dest.add)(**kwargs)
+            copied.extend(page["ids"])
+            offset += page_size
+
+    moved = len(copy())
+    router.assign(user_id, target)
+    # Writers that looked up the route before the switch may still add to the
+    # old shard: copy again (upsert, no duplicates) and delete exactly what
+    # was copied, until a pass finds nothing left
+    for _ in range(MOVE_PASSES):
+        copied = copy()
+        if not copied:
+            break
+        source.delete(ids=copied)
+    return moved
+
+
+def rebalance(memory, hot_factor=2.0, dedicated_min_items=2000):
+    """
+    Spread load when shards get hot. A shard holding more than
+    hot_factor x the mean is relieved by moving its largest users: users
+    with at least dedicated_min_items memories get their own collection,
+    smaller ones go to the currently coldest shard. Returns the moves made.
+    """
+    router = memory.router
+    counts = {name: memory._open_collection(name).count() for name in router.all_shards()}
+    hash_shards = [f"{router.base_name}_shard{i}" for i in range(router.num_shards)]
+    mean = sum(counts.values()) / max(1, len(hash_shards))
+    moves = []
+
+    for name in sorted(counts, key=counts.get, reverse=True):
+        if counts[name] <= hot_factor * mean or name not in hash_shards:
+            continue
+        metadatas = memory._open_collection(name).get(include=["metadatas"])["metadatas"]
+        per_user = {}
+        for meta in metadatas:
+            per_user[meta.get("user_id")] = per_user.get(meta.get("user_id"), 0) + 1
+
+        for user_id, n in sorted(per_user.items(), key=lambda kv: kv[1], reverse=True):
+            if counts[name] <= hot_factor * mean or user_id is None:
+                break
+            if n >= dedicated_min_items:
+                target = router.dedicated_shard(user_id)
+            else:
+                target = min((s for s in hash_shards if s != name), key=lambda s: counts[s], default=None)
+                if target is None:
+                    break
+            move_user(memory, user_id, target)
+            counts[name] -= n
+            counts[target] = counts.get(target, 0) + n
+            moves.append({"user_id": user_id, "from": name, "to": target, "items": n})
+    return moves
+
+
+if __name__ == "__main__":
+    # Maintenance: python -m contextual_memory.sharding [--rebalance]
+    import argparse
+    from config import config
+    from services import ServiceContainer
+
+    parser = argparse.ArgumentParser(description="Inspect / rebalance the sharded Chroma memory collections.")
+    parser.add_argument("--rebalance", action="store_true")
+    parser.add_argument("--hot-factor", type=float, default=2.0)
+    parser.add_argument("--dedicated-min-items", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Same memory setup as the app (models stay unloaded unless a migration needs them)
+    memory = ServiceContainer(config).memory
+    if memory.router is None:
+        raise SystemExit("Sharding is disabled (MEMORY_SHARDS <= 1) or Chroma is unavailable.")
+    if args.rebalance:
+        for move in rebalance(memory, args.hot_factor, args.dedicated_min_items):
+            print(f"moved user {move['user_id']}: {move['from']} -> {move['to']} ({move['items']} items)")
+    print(json.dumps(memory.stats(), indent=2))
@@ -0,0 +1,272 @@
+import threading
+
+import numpy as np
+
+from contextual_memory import quantization
+
+
+class _Partition:
+    """
+    One user's memories. Unit-normalized embeddings live in one contiguous
+    (capacity, dim) matrix that doubles when full, so appends are amortized
+    O(1) and a search is a single matrix-vector product over this user only.
+    Deletes leave tombstones until compaction.
+
+    int8 partitions also keep a per-row scale and, if rerank_dtype is set,
+    a residual of the int8 rounding (quantization.encode_residual) used to
+    rescore the shortlist. A float copy would cost more RAM than storing
+    float16/float32 in the first place; the residual costs half or one
+    byte per dimension.
+    """
+    def __init__(self, dim, dtype, rerank_dtype=None, initial_capacity=16):
+        self.vectors = np.zeros((initial_capacity, dim), dtype=dtype)
+        self.alive = np.zeros(initial_capacity, dtype=bool)
+        quantized = quantization.is_quantized(dtype)
+        self.scales = np.zeros(initial_capacity, dtype=np.float32) if quantized else None
+        self.residual = self.residual_scales = None
+        self.residual_bits = None
+        if quantized and rerank_dtype:
+            self.residual_bits = quantization.residual_bits(rerank_dtype)
+            width, code = (dim, np.int8) if self.residual_bits == 8 else ((dim + 1) // 2, np.uint8)
+            self.residual = np.zeros((initial_capacity, width), dtype=code)
+            self.residual_scales = np.zeros(initial_capacity, dtype=np.float32)
+        self.dim = dim
+        self.size = 0
+        self.dead = 0
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.positions = {}  # id -> row
+
+    def _columns(self):
+        return [name for name in ("vectors", "alive", "scales", "residual", "residual_scales") if getattr(self, name) is not None]
+
+    def _resize(self, capacity, rows, n):
+        # Copy `rows` (n of them) of every column into fresh arrays of `capacity` rows
+        for name in self._columns():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n] = old[rows]
+            setattr(self, name, new)
+
+    def _grow(self, needed):
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._resize(capacity, slice(0, self.size), self.size)
+
+    def add(self, ids, documents, metadatas, vectors):
+        # `vectors`: unit-normalized float32; re-adding an id replaces the old row (upsert semantics)
+        replaced = [i for i in ids if i in self.positions]
+        if replaced:
+            self.delete(replaced)
+
+        n = len(ids)
+        self._grow(self.size + n)
+        rows = slice(self.size, self.size + n)
+        codes, scales = quantization.encode(vectors, self.vectors.dtype)
+        self.vectors[rows] = codes
+        if self.scales is not None:
+            self.scales[rows] = scales
+        if self.residual is not None:
+            self.residual[rows], self.residual_scales[rows] = quantization.encode_residual(
+                vectors, codes, scales, self.residual_bits)
+        self.alive[rows] = True
+        for offset, id_ in enumerate(ids):
+            self.positions[id_] = self.size + offset
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+        self.size += n
+
+    def delete(self, ids):
+        removed = 0
+        for id_ in ids:
+            row = self.positions.pop(id_, None)
+            if row is not None:
+                self.alive[row] = False
+                removed += 1
+        self.dead += removed
+        # Compact once tombstones make up half the partition
+        if self.dead and self.dead * 2 >= self.size:
+            self.compact()
+        return removed
+
+    def compact(self):
+        keep = np.flatnonzero(self.alive[:self.size])
+        capacity = 16
+        while capacity < len(keep):
+            capacity *= 2
+        self._resize(capacity, keep, len(keep))
+
+        self.ids = [self.ids[i] for i in keep]
+        self.documents = [self.documents[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.positions = {id_: row for row, id_ in enumerate(self.ids)}
+        self.size = len(keep)
+        self.dead = 0
+
+    @property
+    def count(self):
+        return self.size - self.dead
+
+    def search(self, query, k, rerank_factor=4):
+        if self.count == 0:
+            return [], []
+        scales = None if self.scales is None else self.scales[:self.size]
+        scores = quantization.scores(self.vectors[:self.size], scales, query)
+        scores[~self.alive[:self.size]] = -np.inf
+        rerank = None
+        if self.residual is not None:
+            rerank = lambda rows: scores[rows] + self._residual(rows) @ query
+        return quantization.top_k(scores, min(k, self.count), rerank, rerank_factor)
+
+    def _residual(self, rows):
+        return quantization.decode_residual(self.residual[rows], self.residual_scales[rows], self.dim)
+
+    def vector(self, row):
+        vector = quantization.decode(self.vectors[row:row + 1], None if self.scales is None else self.scales[row:row + 1])[0]
+        if self.residual is not None:
+            vector += self._residual(slice(row, row + 1))[0]
+        return vector
+
+    def recent(self, k):
+        rows = np.flatnonzero(self.alive[:self.size])[-k:]
+        return rows[::-1]
+
+
+class VectorIndex:
+    """
+    Local exact vector search, partitioned by user.
+
+    Used by ContextualMemory when ChromaDB is unavailable. Every query and
+    delete only touches the requesting user's partition, so cost scales
+    with that user's history rather than the whole store. Scores are cosine
+    similarities (vectors are normalized on insert).
+
+    dtype is float32, float16 or int8 (see contextual_memory.quantization);
+    int8 with a rerank_dtype (None = approximate scores only) rescores the
+    best k * rerank_factor candidates with a residual about as precise as
+    that dtype, not a copy of it, so int8 stays the smallest option in RAM.
+    """
+    def __init__(self, dim, dtype="float32", rerank_dtype=None, rerank_factor=4):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.rerank_dtype = np.dtype(rerank_dtype) if rerank_dtype and quantization.is_quantized(dtype) else None
+        self.rerank_factor = rerank_factor
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _normalize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, user_id, ids, documents, metadatas, vectors=None):
+        """
+        Append memories for one user. `vectors` may contain None entries
+        (stored as zero vectors: findable by recency, never by similarity).
+        """
+        if not ids:
+            return
+        rows = np.zeros((len(ids), self.dim), dtype=np.float32)
+        if vectors is not None:
+            for i, v in enumerate(vectors):
+                if v is not None:
+                    rows[i] = v
+        rows = self._normalize(rows)
+
+        with self._lock:
+            partition = self._partitions.get(str(user_id))
+            if partition is None:
+                partition = self._partitions[str(user_id)] = _Partition(self.dim, self.dtype, self.rerank_dtype)
+            partition.add(list(ids), list(documents), list(metadatas), rows)
+
+    def add_batch(self, user_ids, ids, documents, metadatas, vectors=None):
+        """
+        Append memories of many users (user_ids gives the owner of each row).
+        """
+        by_user = {}
+        for i, user_id in enumerate(user_ids):
+            by_user.setdefault(str(user_id), []).append(i)
+        for user_id, rows in by_user.items():
+            self.add(user_id, [ids[i] for i in rows], [documents[i] for i in rows],
+                     [metadatas[i] for i in rows], None if vectors is None else [vectors[i] for i in rows])
+
+    def search(self, user_id, query_vector=None, k=3):
+        """
+        Top-k memories of one user by cosine similarity, best first, as
+        (id, document, metadata, score) tuples. Without a query vector the
+        k most recent memories are returned instead.
+        """
+        with self._lock:
+            partition = self._partitions.get(str(user_id))
+            if partition is None:
+                return []
+            if query_vector is None:
+                rows = partition.recent(k)
+                return [(partition.ids[r], partition.documents[r], partition.metadatas[r], None) for r in rows]
+            query = self._normalize(query_vector)[0]
+            rows, scores = partition.search(query, k, self.rerank_factor)
+            return [(partition.ids[r], partition.documents[r], partition.metadatas[r], float(s))
+                    for r, s in zip(rows, scores)]
+
+    def delete(self, user_id, ids=None):
+        """
+        Delete some (ids) or all (ids=None) memories of one user. Returns
+        the number removed. Dropping a whole user is a dict pop.
+        """
+        with self._lock:
+            if ids is None:
+                partition = self._partitions.pop(str(user_id), None)
+                return partition.count if partition else 0
+            partition = self._partitions.get(str(user_id))
+            if partition is None:
+                return 0
+            removed = partition.delete(ids)
+            if partition.count == 0:
+                del self._partitions[str(user_id)]
+            return removed
+
+    def items(self, user_id):
+        """
+        All live memories of one user as (id, document, metadata, vector).
+        """
+        with self._lock:
+            partition = self._partitions.get(str(user_id))
+            if partition is None:
+                return []
+            return [(partition.ids[r], partition.documents[r], partition.metadatas[r], partition.vector(r))
+                    for r in np.flatnonzero(partition.alive[:partition.size])]
+
+    def users(self):
+        with self._lock:
+            return list(self._partitions.keys())
+
+    def compact(self):
+        with self._lock:
+            for partition in self._partitions.values():
+                if partition.dead:
+                    partition.compact()
+
+    def count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                partition = self._partitions.get(str(user_id))
+                return partition.count if partition else 0
+            return sum(p.count for p in self._partitions.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._partitions),
+                "items": sum(p.count for p in self._partitions.values()),
+                "tombstones": sum(p.dead for p in self._partitions.values()),
+                "dtype": self.dtype.name,
+                "rerank_dtype": self.rerank_dtype.name if self.rerank_dtype is not None else None,
+                "bytes_per_vector": quantization.bytes_per_vector(self.dim, self.dtype, self.rerank_dtype, residual=True),
+                "bytes": sum(sum(getattr(p, c).nbytes for c in p._columns()) for p in self._partitions.values())
+            }
@@ -49,6 +49,9 @@ class ChatMessage(db.Model):
     # e.g., {"emotion_detected": "sad", "voice_pitch": "low", "risk_score": 0.8}
     metadata_json = db.Column(db.Text, default="{}") 
 
+    # Deterministic id from the write-behind journal: a replayed turn is skipped, not inserted twice
+    write_id = db.Column(db.String(64), unique=True)
+
 class Assessment(db.Model):
     __tablename__ = 'assessments'
     id = db.Column(db.Integer, primary_key=True)
@@ -59,3 +62,22 @@ class Assessment(db.Model):
     predicted_state = db.Column(db.String(50)) # e.g. "Depression", "Anxiety"
     risk_level = db.Column(db.String(20)) # "Low", "Medium", "High"
     confidence_score = db.Column(db.Float)
+
+    write_id = db.Column(db.String(64), unique=True)  # See ChatMessage.write_id
+
+
+def ensure_write_ids():
+    """
+    Add the write_id columns to databases created before they existed
+    (db.create_all only creates missing tables). Call in an app context.
+    """
+    inspector = db.inspect(db.engine)
+    for model in (ChatMessage, Assessment):
+        table = model.__tablename__
+        if not inspector.has_table(table):
+            continue  # create_all makes it with the column
+        if "write_id" not in {c["name"] for c in inspector.get_columns(table)}:
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN write_id VARCHAR(64)"))
+                conn.execute(db.text(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_write_id ON {table} (write_id)"))
+            print(f"Database: added {table}.write_id")
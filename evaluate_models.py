@@ -6,6 +6,7 @@ import joblib
 from sklearn.metrics import classification_report, confusion_matrix
 from feature_extraction.text_features import TextFeatureExtractor
 from input_preprocessing.audio_processor import AudioProcessor
+from classification.forest_compiler import compile_forest
 import glob
 from tqdm import tqdm
 
@@ -13,6 +14,7 @@ from tqdm import tqdm
 TEXT_DATASET = "dataset.csv"
 AUDIO_DATASET = "dataset/audio"
 MODEL_DIR = "models"
+EMBED_BATCH_SIZE = 32
 
 def evaluate_text_model():
     print("\n--- Evaluating Text Model ---")
@@ -37,7 +39,7 @@ def evaluate_text_model():
     # Check for RF if BERT not loaded
     if not model and os.path.exists(model_path_rf):
         print(f"Found Random Forest at {model_path_rf}")
-        model = joblib.load(model_path_rf)
+        model = compile_forest(joblib.load(model_path_rf))
         model_type = "rf"
         
     if not model:
@@ -71,13 +73,20 @@ def evaluate_text_model():
             print("Extracting features (BERT embeddings)...")
             X = []
             valid_indices = []
-            for idx, text in tqdm(enumerate(df['text']), total=len(df)):
+            texts = [str(t) for t in df['text']]
+            for start in tqdm(range(0, len(texts), EMBED_BATCH_SIZE)):
+                batch = list(range(start, min(start + EMBED_BATCH_SIZE, len(texts))))
                 try:
-                    emb = extractor.get_embedding(str(text))
-                    X.append(emb)
-                    valid_indices.append(idx)
+                    X.extend(extractor.get_embeddings([texts[i] for i in batch]))
+                    valid_indices.extend(batch)
                 except:
-                    pass
+                    # Retry one by one so a single bad row doesn't drop the batch
+                    for idx in batch:
+                        try:
+                            X.append(extractor.get_embedding(texts[idx]))
+                            valid_indices.append(idx)
+                        except:
+                            pass
             
             if not X:
                 print("Feature extraction failed.")
@@ -121,7 +130,7 @@ def evaluate_audio_model():
         return
 
     print("Loading model...")
-    model = joblib.load(model_path)
+    model = compile_forest(joblib.load(model_path))
     processor = AudioProcessor()
     
     X = []
@@ -170,6 +179,91 @@ def evaluate_audio_model():
     print(f"Labels: {unique_labels}")
     print(cm)
 
+def evaluate_cascade(cascade_spec, sample_limit=2000):
+    """
+    Accuracy cost of the cheap cascade stages. Every stage is run once over
+    the dataset; threshold settings are then simulated on those outputs, so
+    the sweep doesn't re-run BERT / BART per setting.
+    """
+    print("\n--- Evaluating Classifier Cascade ---")
+    from classification.cascade import margin, parse_cascade
+    from classification.hybrid_classifier import HybridClassifier
+
+    if not os.path.exists(TEXT_DATASET):
+        print(f"Dataset '{TEXT_DATASET}' not found. Cannot evaluate.")
+        return
+    df = pd.read_csv(TEXT_DATASET)
+    df.columns = [c.lower() for c in df.columns]
+    if 'content' in df.columns: df.rename(columns={'content': 'text'}, inplace=True)
+    if 'sentiment' in df.columns: df.rename(columns={'sentiment': 'emotion'}, inplace=True)
+    df = df.dropna(subset=['text', 'emotion']).head(sample_limit)
+    texts = [str(t)[:512] for t in df['text']]
+    y_true = [str(e) for e in df['emotion']]
+
+    stages = parse_cascade(cascade_spec)
+    cheap = [(name, t) for name, t in stages if name in ("lexicon", "linear")]
+    heavy = ",".join(name for name, _ in stages if name not in ("lexicon", "linear"))
+
+    # Reference: the heavy stages alone (what every message got before the cascade)
+    reference_clf = HybridClassifier(model_dir=MODEL_DIR, cascade=heavy or "zero_shot")
+    features = None
+    if reference_clf.rf_model is not None:
+        extractor = TextFeatureExtractor()
+        features = np.vstack([extractor.get_embeddings(texts[i:i + 32]) for i in range(0, len(texts), 32)])
+    reference = [max(p, key=p.get) for p in reference_clf.predict_batch(features, texts)]
+    accuracy = lambda y_pred: float(np.mean([a == b for a, b in zip(y_true, y_pred)]))
+    print(f"Reference ({heavy}) accuracy: {accuracy(reference):.4f} on {len(texts)} samples")
+
+    # Raw outputs of each cheap stage (no thresholds)
+    outputs = {}
+    for name, _ in cheap:
+        clf = HybridClassifier(model_dir=MODEL_DIR, cascade=name)
+        if not clf._stage_available(name):
+            print(f"Stage '{name}' unavailable (for 'linear', run train_cascade_model.py first)")
+            continue
+        traces = [{} for _ in texts]
+        predictions = clf.predict_batch(None, texts, traces=traces)
+        outputs[name] = [p if t["branch"] == name else None for p, t in zip(predictions, traces)]
+    if not outputs:
+        return
+
+    def simulate(thresholds):
+        y_pred, exits = [], dict.fromkeys(thresholds, 0)
+        for i in range(len(texts)):
+            for name, threshold in thresholds.items():
+                p = outputs[name][i]
+                if p is not None and margin(p) >= threshold:
+                    y_pred.append(max(p, key=p.get))
+                    exits[name] += 1
+                    break
+            else:
+                y_pred.append(reference[i])
+        return accuracy(y_pred), {n: e / len(texts) for n, e in exits.items()}
+
+    configured = {name: t if t is not None else 0.0 for name, t in cheap if name in outputs}
+    acc, exits = simulate(configured)
+    print(f"Configured cascade ({cascade_spec}): accuracy {acc:.4f} "
+          f"(loss {accuracy(reference) - acc:+.4f}), early exits {exits}")
+
+    print("\n| " + " | ".join(f"{n} threshold" for n in outputs) + " | accuracy | loss | early-exit rate |")
+    print("|" + "---|" * (len(outputs) + 3))
+    grid = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+    for combo in np.array(np.meshgrid(*[grid] * len(outputs))).T.reshape(-1, len(outputs)):
+        acc, exits = simulate(dict(zip(outputs, combo)))
+        print("| " + " | ".join(f"{t:.1f}" for t in combo) +
+              f" | {acc:.4f} | {accuracy(reference) - acc:+.4f} | {sum(exits.values()):.3f} |")
+
+
 if __name__ == "__main__":
+    import argparse
+    from config import config
+
+    parser = argparse.ArgumentParser(description="Evaluate the trained text / audio models.")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Also measure the accuracy cost of the cheap cascade stages (CLASSIFIER_CASCADE)")
+    args = parser.parse_args()
+
     evaluate_text_model()
     evaluate_audio_model()
+    if args.cascade:
+        evaluate_cascade(config.CLASSIFIER_CASCADE)
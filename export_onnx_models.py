@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from config import config
+from onnx_backend import (MANIFEST_NAME, OnnxTextEncoder, OnnxTextClassifier,
+                          OnnxZeroShotClassifier, _softmax)
+
+# Configuration
+MODEL_DIR = "models"
+TEXT_DATASET = "dataset.csv"
+ZERO_SHOT_LABELS = ["Depression", "Anxiety", "Bipolar", "ADHD", "Normal", "Sadness", "Stress"]
+
+# Parity thresholds (int8 is allowed to drift a little more than fp32)
+MIN_COSINE = {"fp32": 0.9999, "int8": 0.99}
+MIN_ARGMAX_AGREEMENT = {"fp32": 1.0, "int8": 0.97}
+MAX_PROB_DIFF = {"fp32": 1e-3, "int8": 0.08}
+
+SAMPLE_TEXTS = [
+    "i feel sad",
+    "i am stressed about my exams",
+    "nothing seems to matter anymore and i cannot sleep",
+    "my heart is racing and i keep worrying about work",
+    "today was a good day, i went for a walk",
+    "i feel lonely even when i am with my friends",
+    "i am so tired of everything",
+    "i can't focus on anything and keep jumping between tasks",
+]
+
+
+def load_sample_texts(limit):
+    texts = list(SAMPLE_TEXTS)
+    if os.path.exists(TEXT_DATASET):
+        try:
+            import pandas as pd
+            df = pd.read_csv(TEXT_DATASET)
+            df.columns = [c.lower() for c in df.columns]
+            col = 'text' if 'text' in df.columns else ('content' if 'content' in df.columns else None)
+            if col:
+                texts += [str(t)[:512] for t in df[col].dropna().head(limit).tolist()]
+        except Exception as e:
+            print(f"Could not read {TEXT_DATASET}: {e}")
+    return texts[:max(limit, len(SAMPLE_TEXTS))]
+
+
+def latency_stats(fn, texts, warmup=2):
+    for t in texts[:warmup]:
+        fn(t)
+    timings = []
+    for t in texts:
+        started = time.perf_counter()
+        fn(t)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    timings = np.array(timings)
+    return {
+        "mean_ms": round(float(timings.mean()), 2),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2)
+    }
+
+
+def quantize(fp32_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    int8_path = fp32_path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def export_graph(model, tokenizer, out_dir, sample_inputs, output_name):
+    import torch
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "model.onnx")
+    input_names = list(sample_inputs.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+    torch.onnx.export(
+        model,
+        tuple(sample_inputs[name] for name in input_names),
+        path,
+        input_names=input_names,
+        output_names=[output_name],
+        dynamic_axes=dynamic_axes,
+        opset_version=14,
+        do_constant_folding=True
+    )
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+    return path
+
+
+def check_encoder(name, out_dir, texts, quantize_models):
+    import torch
+    from transformers import BertTokenizer, BertModel
+
+    print(f"\n--- {name}: {config.BERT_MODEL_NAME} ---")
+    tokenizer = BertTokenizer.from_pretrained(config.BERT_MODEL_NAME)
+    model = BertModel.from_pretrained(config.BERT_MODEL_NAME).eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(texts[:2], return_tensors="pt", padding=True)
+    fp32_path = export_graph(model, tokenizer, out_dir,
+                             {k: sample[k] for k in ("input_ids", "attention_mask", "token_type_ids")},
+                             "last_hidden_state")
+
+    def eager(text):
+        with torch.no_grad():
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=128)
+            return model(**inputs)[0][:, 0, :].numpy()[0]
+
+    reference = np.array([eager(t) for t in texts])
+    entry = {"source": config.BERT_MODEL_NAME, "eager": latency_stats(eager, texts)}
+
+    variants = {"fp32": fp32_path}
+    if quantize_models:
+        variants["int8"] = quantize(fp32_path)
+
+    for variant, path in variants.items():
+        encoder = OnnxTextEncoder(path)
+        got = np.array([encoder.encode([t])[0] for t in texts])
+        cos = np.sum(got * reference, axis=1) / (np.linalg.norm(got, axis=1) * np.linalg.norm(reference, axis=1))
+        entry[variant] = {
+            "file": os.path.basename(path),
+            "min_cosine": round(float(cos.min()), 5),
+            "parity_ok": bool(cos.min() >= MIN_COSINE[variant]),
+            "latency": latency_stats(lambda t: encoder.encode([t]), texts)
+        }
+        print(f"{variant}: {entry[variant]}")
+    return entry
+
+
+def _classifier_parity(variant, reference, got):
+    agreement = float(np.mean(reference.argmax(axis=1) == got.argmax(axis=1)))
+    max_diff = float(np.max(np.abs(reference - got)))
+    return {
+        "argmax_agreement": round(agreement, 4),
+        "max_prob_diff": round(max_diff, 5),
+        "parity_ok": bool(agreement >= MIN_ARGMAX_AGREEMENT[variant] and max_diff <= MAX_PROB_DIFF[variant])
+    }
+
+
+def check_custom_bert(name, out_dir, texts, quantize_models):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    source = os.path.join(MODEL_DIR, "custom_bert")
+    if not os.path.exists(source):
+        print(f"\n--- {name}: skipped ({source} not found) ---")
+        return None
+
+    print(f"\n--- {name}: {source} ---")
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(texts[:2], return_tensors="pt", padding=True)
+    fp32_path = export_graph(model, tokenizer, out_dir,
+                             {k: sample[k] for k in ("input_ids", "attention_mask")}, "logits")
+
+    def eager(text):
+        with torch.no_grad():
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+            return _softmax(model(**inputs)[0].numpy()[0])
+
+    reference = np.array([eager(t) for t in texts])
+    entry = {"source": source, "eager": latency_stats(eager, texts)}
+
+    variants = {"fp32": fp32_path}
+    if quantize_models:
+        variants["int8"] = quantize(fp32_path)
+
+    for variant, path in variants.items():
+        clf = OnnxTextClassifier(path)
+        got = np.array([[r["score"] for r in clf(t)[0]] for t in texts])
+        entry[variant] = dict(file=os.path.basename(path), **_classifier_parity(variant, reference, got),
+                              latency=latency_stats(clf, texts))
+        print(f"{variant}: {entry[variant]}")
+    return entry
+
+
+def check_zero_shot(name, out_dir, texts, quantize_models):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+
+    source = "facebook/bart-large-mnli"
+    print(f"\n--- {name}: {source} ---")
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    eager_pipe = pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+    export_model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    export_model.config.return_dict = False
+    sample = tokenizer([texts[0]] * 2, ["This example is Normal.", "This example is Stress."],
+                       return_tensors="pt", padding=True)
+    fp32_path = export_graph(export_model, tokenizer, out_dir,
+                             {k: sample[k] for k in ("input_ids", "attention_mask")}, "logits")
+
+    def ordered(result):
+        scores = dict(zip(result["labels"], result["scores"]))
+        return [scores[label] for label in ZERO_SHOT_LABELS]
+
+    eager = lambda t: eager_pipe(t, ZERO_SHOT_LABELS)
+    reference = np.array([ordered(eager(t)) for t in texts])
+    entry = {"source": source, "eager": latency_stats(eager, texts)}
+
+    variants = {"fp32": fp32_path}
+    if quantize_models:
+        variants["int8"] = quantize(fp32_path)
+
+    for variant, path in variants.items():
+        zs = OnnxZeroShotClassifier(path)
+        got = np.array([ordered(zs(t, ZERO_SHOT_LABELS)) for t in texts])
+        entry[variant] = dict(file=os.path.basename(path), **_classifier_parity(variant, reference, got),
+                              latency=latency_stats(lambda t: zs(t, ZERO_SHOT_LABELS), texts))
+        print(f"{variant}: {entry[variant]}")
+    return entry
+
+
+CHECKS = {
+    "bert_encoder": check_encoder,
+    "custom_bert": check_custom_bert,
+    "zero_shot": check_zero_shot,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export text models to ONNX (+ dynamic int8), check parity and benchmark.")
+    parser.add_argument("--models", nargs="+", default=list(CHECKS.keys()), choices=list(CHECKS.keys()))
+    parser.add_argument("--out", default=config.ONNX_MODEL_DIR)
+    parser.add_argument("--samples", type=int, default=64, help="Texts used for parity and latency")
+    parser.add_argument("--no-quantize", action="store_true", help="Only export fp32 graphs")
+    args = parser.parse_args()
+
+    texts = load_sample_texts(args.samples)
+    print(f"Using {len(texts)} sample texts.")
+
+    manifest_path = os.path.join(args.out, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    for name in args.models:
+        entry = CHECKS[name](name, os.path.join(args.out, name), texts, not args.no_quantize)
+        if entry:
+            manifest[name] = entry
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\nManifest written to {manifest_path}")
+    print("Only variants with parity_ok=true are loaded when INFERENCE_BACKEND=onnx.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+import time
+
+from metrics import Histogram
+
+
+class _PendingEmbedding:
+    __slots__ = ("text", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, text):
+        self.text = text
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """
+    Cross-request micro-batching around TextFeatureExtractor.
+
+    Concurrent callers enqueue cleaned text; a single collector thread groups
+    them into batches (up to max_batch_size items or max_wait_ms of waiting,
+    whichever comes first), runs one padded BERT forward and hands every
+    caller back its own CLS vector.
+
+    `extractor` may be the TextFeatureExtractor itself or a zero-argument
+    callable returning it (e.g. a model registry lookup), so the model is
+    only loaded when the first batch runs.
+    """
+    def __init__(self, extractor, max_batch_size=16, max_wait_ms=5, cache=None):
+        self._extractor = extractor
+        self.cache = cache
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+        # Tuning metrics
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_hist = Histogram([0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25])  # seconds
+        self.forward_time_hist = Histogram([0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5])  # seconds
+
+    @property
+    def extractor(self):
+        if callable(self._extractor) and not hasattr(self._extractor, "get_embeddings"):
+            return self._extractor()
+        return self._extractor
+
+    def _ensure_worker(self):
+        # Started lazily (and restarted after fork) so the collector thread
+        # always belongs to the process that is serving requests.
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def get_embedding(self, text):
+        """
+        Returns the CLS embedding for a single text (blocks until its batch ran).
+        """
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts):
+        """
+        Public batch API: returns one embedding per input text, in order.
+        Items are enqueued together so they can share batches with other callers.
+        """
+        if not texts:
+            return []
+
+        # Cache hits never need to wait for a batch
+        cache = self.cache
+        results = [cache.get(t) if cache is not None else None for t in texts]
+        pending = [(i, _PendingEmbedding(t)) for i, t in enumerate(texts) if results[i] is None]
+        if not pending:
+            return results
+
+        self._ensure_worker()
+        for _, p in pending:
+            self._queue.put(p)
+
+        for i, p in pending:
+            p.done.wait()
+            if p.error is not None:
+                raise p.error
+            results[i] = p.result
+        return results
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            for p in batch:
+                self.queue_wait_hist.observe(started - p.enqueued_at)
+            self.batch_size_hist.observe(len(batch))
+
+            try:
+                # Callers already missed the cache on these texts: don't count them twice
+                embeddings = self.extractor.get_embeddings([p.text for p in batch], lookup=self.cache is None)
+                for p, emb in zip(batch, embeddings):
+                    p.result = emb
+            except Exception as e:
+                print(f"EmbeddingBatcher: batch of {len(batch)} failed: {e}")
+                for p in batch:
+                    p.error = e
+            finally:
+                self.forward_time_hist.observe(time.perf_counter() - started)
+                for p in batch:
+                    p.done.set()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+            "forward_seconds": self.forward_time_hist.snapshot()
+        }
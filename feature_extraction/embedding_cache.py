@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_key(text, model_id):
+    """
+    Content address for a (cleaned) text under a given model.
+    Different models never share entries.
+    """
+    h = hashlib.sha1()
+    h.update(str(model_id).encode("utf-8"))
+    h.update(b"\x00")
+    h.update((text or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map with hit/miss/eviction counters.
+    """
+    def __init__(self, max_items=1024):
+        self.max_items = max(1, int(max_items))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = value
+            while len(self._data) > self.max_items:
+                evicted.append(self._data.popitem(last=False))
+                self.evictions += 1
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class _DiskTier:
+    """
+    Persistent tier: a memory-mapped float16 matrix (one row per slot) plus an
+    append-only index log of key -> slot assignments (a later line for the
+    same slot replaces the key that held it). Replayed in order on open, so
+    the LRU order survives restarts; rewritten compactly on open and whenever
+    it grows past a few times the number of slots.
+    """
+    def __init__(self, path, dim, max_items):
+        self.path = path
+        self.dim = dim
+        self.max_items = max(1, int(max_items))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._pending = []      # Log lines not yet written (after the matrix rows they point at)
+        self.read_only = False
+
+        os.makedirs(path, exist_ok=True)
+        self._matrix_path = os.path.join(path, "embeddings.f16")
+        self._log_path = os.path.join(path, "index.log")
+
+        self._index = OrderedDict()
+        self._log_lines = 0
+        try:
+            if os.path.exists(self._log_path):
+                self._replay_log()
+            else:
+                self._load_legacy_index(os.path.join(path, "index.json"))
+        except Exception as e:
+            print(f"EmbeddingCache: ignoring unreadable disk index ({e})")
+            self._index = OrderedDict()
+
+        mode = "r+" if os.path.exists(self._matrix_path) and self._index else "w+"
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float16, mode=mode,
+                                 shape=(self.max_items, dim))
+        self._free = sorted(set(range(self.max_items)) - set(self._index.values()), reverse=True)
+        self._log = None
+        self._compact()
+
+    def _replay_log(self):
+        owner = {}  # slot -> key
+        with open(self._log_path) as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("dim") != self.dim or header.get("max_items") != self.max_items:
+                return
+            for line in f:
+                try:
+                    key, slot = json.loads(line)
+                except ValueError:
+                    break  # Torn last line
+                previous = owner.get(slot)
+                if previous is not None and previous != key:
+                    self._index.pop(previous, None)
+                old_slot = self._index.pop(key, None)
+                if old_slot is not None and old_slot != slot:
+                    owner.pop(old_slot, None)
+                self._index[key] = slot
+                owner[slot] = key
+
+    def _load_legacy_index(self, index_path):
+        # Older versions rewrote a full JSON index; read it once, the log replaces it
+        if not os.path.exists(index_path):
+            return
+        with open(index_path) as f:
+            meta = json.load(f)
+        if meta.get("dim") == self.dim and meta.get("max_items") == self.max_items:
+            self._index = OrderedDict(meta["entries"])
+        os.remove(index_path)
+
+    def _compact(self):
+        # Rewrite the log as one line per live entry, in LRU order
+        if self._log is not None:
+            self._log.close()
+        tmp = self._log_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps({"dim": self.dim, "max_items": self.max_items}) + "\n")
+            for key, slot in self._index.items():
+                f.write(json.dumps([key, slot]) + "\n")
+        os.replace(tmp, self._log_path)
+        self._log_lines = len(self._index)
+        self._log = open(self._log_path, "a")
+
+    def get(self, key):
+        with self._lock:
+            slot = self._index.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return np.asarray(self._matrix[slot], dtype=np.float32)
+
+    def put(self, key, vector):
+        if self.read_only:
+            return
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+                return
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, slot = self._index.popitem(last=False)
+                self.evictions += 1
+            self._matrix[slot] = np.asarray(vector, dtype=np.float16)
+            self._index[key] = slot
+            self._pending.append(json.dumps([key, slot]) + "\n")
+            if len(self._pending) >= 64:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        # Rows first, then the log lines that point at them
+        self._matrix.flush()
+        self._log.writelines(self._pending)
+        self._log.flush()
+        self._log_lines += len(self._pending)
+        self._pending = []
+        if self._log_lines > 4 * self.max_items:
+            self._compact()
+
+    def stats(self):
+        return {
+            "size": len(self._index),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.max_items * self.dim * 2
+        }
+
+
+class EmbeddingCache:
+    """
+    Bounded two-tier cache for text embeddings keyed by hash(model, cleaned text).
+
+    Tier 1 is an in-process LRU of float32 vectors; tier 2 (optional, when
+    disk_path is set) is a memory-mapped float16 store. Disk hits are promoted
+    back into the LRU. Both tiers have a fixed item cap, so memory stays bounded.
+    """
+    def __init__(self, model_id, dim=768, max_items=10000, disk_path=None, disk_max_items=100000):
+        self.model_id = model_id
+        self.dim = dim
+        self.memory = LRUCache(max_items)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = _DiskTier(disk_path, dim, disk_max_items)
+            except Exception as e:
+                print(f"EmbeddingCache Warning: disk tier unavailable ({e}). Using memory only.")
+
+    def key(self, text):
+        return content_key(text, self.model_id)
+
+    def get(self, text):
+        key = self.key(text)
+        vec = self.memory.get(key)
+        if vec is not None:
+            return vec.copy()
+        if self.disk is not None:
+            vec = self.disk.get(key)
+            if vec is not None:
+                self.memory.put(key, vec)
+                return vec.copy()
+        return None
+
+    def put(self, text, vector):
+        key = self.key(text)
+        # Own copy: a row view would keep the caller's whole batch array alive
+        vec = np.array(vector, dtype=np.float32).reshape(-1)
+        self.memory.put(key, vec)
+        if self.disk is not None:
+            self.disk.put(key, vec)
+
+    def flush(self):
+        if self.disk is not None and not self.disk.read_only:
+            self.disk.flush()
+
+    def freeze_disk(self):
+        """
+        Stop writing to the disk tier (reads continue). Used in pre-forked
+        workers, which would otherwise race each other on the shared file.
+        """
+        if self.disk is not None:
+            self.disk.read_only = True
+
+    def stats(self):
+        return {
+            "model_id": self.model_id,
+            "memory": self.memory.stats(),
+            "memory_bytes": len(self.memory) * self.dim * 4,
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class LazyFeatures:
+    """
+    Demand-driven feature provider.
+
+    Each feature is registered as a zero-argument callable and is only
+    computed the first time someone asks for it (then memoized for the rest
+    of the request). Keeps a record of what was materialized and how long it
+    took, for per-request tracing. Thread-safe: concurrent stages asking for
+    the same feature wait for a single computation.
+    """
+    def __init__(self, **providers):
+        self._providers = dict(providers)
+        self._values = {}
+        self.timings_ms = {}
+        self._lock = threading.Lock()
+        self._feature_locks = {}
+
+    def register(self, name, provider):
+        self._providers[name] = provider
+        self._values.pop(name, None)
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+        if name not in self._providers:
+            raise KeyError(f"No provider registered for feature '{name}'")
+
+        with self._lock:
+            feature_lock = self._feature_locks.setdefault(name, threading.Lock())
+        with feature_lock:
+            if name not in self._values:
+                started = time.perf_counter()
+                self._values[name] = self._providers[name]()
+                self.timings_ms[name] = round((time.perf_counter() - started) * 1000.0, 2)
+        return self._values[name]
+
+    def is_materialized(self, name):
+        return name in self._values
+
+    @property
+    def materialized(self):
+        return list(self._values.keys())
+
+
+def resolve_features(features, name="embedding"):
+    """
+    Accepts either a plain vector or a LazyFeatures and returns the vector.
+    """
+    if isinstance(features, LazyFeatures):
+        return features.get(name)
+    return features
@@ -0,0 +1,32 @@
+import numpy as np
+
+from feature_extraction.lazy_features import LazyFeatures
+
+
+class SharedEncoder:
+    """
+    Single per-process text encoding service.
+
+    Every consumer that needs a vector for a message (RF classifier features,
+    ContextualMemory add/query) asks this service instead of running its own
+    model, so a message is encoded at most once. Backed by the EmbeddingBatcher
+    (and therefore the embedding cache).
+    """
+    def __init__(self, batcher, dim=768):
+        self.batcher = batcher
+        self.dim = dim
+
+    def encode(self, text):
+        """
+        Returns a LazyFeatures whose 'embedding' is computed on first use and
+        then shared by everyone holding the object.
+        """
+        return LazyFeatures(embedding=lambda: np.asarray(self.batcher.get_embedding(text), dtype=np.float32))
+
+    def embed_many(self, texts):
+        """
+        Eager batch encoding, e.g. for memory backfills. Returns (n, dim) float32.
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.asarray(self.batcher.get_embeddings(list(texts)), dtype=np.float32)
@@ -1,9 +1,17 @@
 import numpy as np
 
 class TextFeatureExtractor:
-    def __init__(self, model_name='bert-base-uncased'):
+    def __init__(self, model_name='bert-base-uncased', cache=None, backend='torch', onnx_dir=None, quantized=True):
         self.tokenizer = None
         self.model = None
+        self.model_name = model_name
+        self.backend = 'torch'
+        # Optional EmbeddingCache (content-addressed, see embedding_cache.py)
+        self.cache = cache
+
+        if backend == 'onnx' and self._load_onnx(onnx_dir, quantized):
+            return
+
         try:
             # Removed forced mock
             
@@ -11,6 +19,7 @@ class TextFeatureExtractor:
             import torch
             # Use Standard BERT instead of MentalBERT (Gated)
             model_name = 'bert-base-uncased'
+            self.model_name = model_name
             self.tokenizer = BertTokenizer.from_pretrained(model_name)
             self.model = BertModel.from_pretrained(model_name)
             self.model.eval() # Set to evaluation mode
@@ -18,19 +27,84 @@ class TextFeatureExtractor:
         except ImportError:
              print("Warning: Transformers/Torch not found (or mocked). Text features will be mocked.")
 
+    def _load_onnx(self, onnx_dir, quantized):
+        try:
+            from onnx_backend import resolve_model, OnnxTextEncoder
+            path = resolve_model(onnx_dir or 'models/onnx', 'bert_encoder', quantized=quantized)
+            if path is None:
+                return False
+            self.model = OnnxTextEncoder(path)
+            self.backend = 'onnx-int8' if quantized else 'onnx-fp32'
+            print(f"TextFeatureExtractor: using ONNX encoder {path}")
+            return True
+        except Exception as e:
+            print(f"TextFeatureExtractor: ONNX backend unavailable ({e}), falling back to PyTorch.")
+            return False
+
+    @property
+    def model_id(self):
+        """
+        Identity used for cache keys: quantized outputs differ slightly from fp32.
+        """
+        return f"{self.model_name}:{self.backend}"
+
+    @staticmethod
+    def expected_model_id(model_name='bert-base-uncased', backend='torch', onnx_dir=None, quantized=True):
+        """
+        model_id the extractor will report once loaded, without loading it
+        (lets the embedding cache serve hits before the model is in memory).
+        """
+        if backend == 'onnx':
+            try:
+                from onnx_backend import resolve_model
+                if resolve_model(onnx_dir or 'models/onnx', 'bert_encoder', quantized=quantized):
+                    return f"{model_name}:{'onnx-int8' if quantized else 'onnx-fp32'}"
+            except Exception:
+                pass
+        return f"{model_name}:torch"
+
     def get_embedding(self, text):
         """
         Returns the CLS token embedding for the input text.
         """
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts, lookup=True):
+        """
+        Batch version of get_embedding: one padded forward pass for all texts.
+        Returns an array of shape (len(texts), 768).
+        lookup=False skips the cache reads (the caller, e.g. EmbeddingBatcher,
+        already missed on these texts); results are still stored.
+        """
         if self.model is None:
             # Return random or zero vector of size 768 (BERT size)
             # Use deterministic seed for consistency if needed
-            return np.ones(768) * 0.1
+            return np.ones((len(texts), 768)) * 0.1
+
+        texts = list(texts)
+        results = [None] * len(texts)
+        if self.cache is not None and lookup:
+            for i, t in enumerate(texts):
+                results[i] = self.cache.get(t)
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            computed = self._forward([texts[i] for i in missing])
+            for i, emb in zip(missing, computed):
+                results[i] = emb
+                if self.cache is not None:
+                    self.cache.put(texts[i], emb)
+
+        return np.vstack(results)
+
+    def _forward(self, texts):
+        if self.backend != 'torch':
+            return self.model.encode(texts, max_length=128)
 
         with self.torch.no_grad():
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=128)
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=128)
             outputs = self.model(**inputs)
             # CLS token is at index 0
-            cls_embedding = outputs.last_hidden_state[:, 0, :].numpy()
+            cls_embeddings = outputs.last_hidden_state[:, 0, :].numpy()
             
-        return cls_embedding.flatten()
+        return cls_embeddings
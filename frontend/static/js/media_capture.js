@@ -10,6 +10,8 @@ class MediaCapture {
         this.audioChunks = [];
         this.videoFrames = []; // Array of base64 strings or Blob
         this.captureInterval = null;
+        this.audioContext = null; // Streaming turns in pcm16: shared by every turn of the session
+        this.pcmCapture = null;
 
         // Configuration
         this.frameIntervalMs = 500; // Capture frame every 500ms
@@ -231,6 +233,161 @@ class MediaCapture {
         });
     }
 
+    /**
+     * True when turns can be streamed as raw 16 kHz PCM (AudioWorklet).
+     * Otherwise they go up as MediaRecorder WebM fragments, which the
+     * server can only decode as a whole stream.
+     */
+    static pcmSupported() {
+        return !!(window.AudioContext && window.AudioWorkletNode);
+    }
+
+    /**
+     * Streaming turns, delivering a chunk every timesliceMs. 'pcm16' sends
+     * 16 kHz mono s16le (the server appends it as is); 'container' a fresh
+     * MediaRecorder per turn so every turn's upload starts with its own WebM
+     * header. Video frames keep being captured by the continuous mode's
+     * interval. Resolves false if recording could not start.
+     */
+    async startTurnRecording(onChunk, timesliceMs = 250, format = 'container') {
+        if (!this.mediaStream) {
+            console.error("No media stream. Call requestPermissions first.");
+            return false;
+        }
+        if (this.mediaRecorder && this.mediaRecorder.state !== 'inactive') {
+            this.mediaRecorder.ondataavailable = null;
+            this.mediaRecorder.stop();
+        }
+        this._stopPcm();
+        this.audioChunks = [];
+
+        if (format === 'pcm16') {
+            try {
+                await this._startPcm(onChunk, timesliceMs);
+                return true;
+            } catch (e) {
+                console.error("[MediaCapture] PCM capture failed:", e);
+                this._stopPcm();
+                return false;
+            }
+        }
+
+        const audioStream = new MediaStream(this.mediaStream.getAudioTracks());
+        try {
+            this.mediaRecorder = new MediaRecorder(audioStream, { mimeType: 'audio/webm' });
+        } catch (e) {
+            console.error("[MediaCapture] MediaRecorder init failed:", e);
+            return false;
+        }
+        this.mediaRecorder.ondataavailable = (event) => {
+            if (event.data.size > 0) onChunk(event.data);
+        };
+        this.mediaRecorder.start(timesliceMs);
+        return true;
+    }
+
+    async _ensureAudioContext() {
+        if (this.audioContext) return this.audioContext;
+        let context;
+        try {
+            // Let the browser resample to Whisper's rate
+            context = new AudioContext({ sampleRate: 16000 });
+            context.createMediaStreamSource(this.mediaStream).disconnect();
+        } catch (e) {
+            // Some browsers can't connect a mic to a context at another rate: resample here instead
+            if (context) context.close();
+            context = new AudioContext();
+        }
+        await context.audioWorklet.addModule('/static/js/pcm_capture_worklet.js');
+        this.audioContext = context;
+        return context;
+    }
+
+    async _startPcm(onChunk, timesliceMs) {
+        const context = await this._ensureAudioContext();
+        if (context.state === 'suspended') await context.resume();
+
+        const source = context.createMediaStreamSource(this.mediaStream);
+        const node = new AudioWorkletNode(context, 'pcm-capture');
+        const ratio = context.sampleRate / 16000;
+        const chunkSamples = Math.round(16000 * timesliceMs / 1000);
+        let pending = [];
+        let pendingLength = 0;
+        let position = 0; // Resampling: fractional read position, 0 = the previous block's last sample
+        let last = 0;
+
+        const flush = () => {
+            if (!pendingLength) return;
+            const pcm = new Int16Array(pendingLength);
+            let offset = 0;
+            pending.forEach((block) => {
+                for (let i = 0; i < block.length; i++) {
+                    const v = Math.max(-1, Math.min(1, block[i]));
+                    pcm[offset++] = v < 0 ? v * 32768 : v * 32767;
+                }
+            });
+            pending = [];
+            pendingLength = 0;
+            onChunk(new Blob([pcm.buffer], { type: 'application/octet-stream' }));
+        };
+
+        node.port.onmessage = (event) => {
+            let block = event.data;
+            if (ratio !== 1) {
+                // Linear interpolation down to 16 kHz
+                const input = new Float32Array(block.length + 1);
+                input[0] = last;
+                input.set(block, 1);
+                last = block[block.length - 1];
+                const out = [];
+                for (; position < input.length - 1; position += ratio) {
+                    const i = Math.floor(position);
+                    out.push(input[i] + (input[i + 1] - input[i]) * (position - i));
+                }
+                position -= block.length;
+                block = Float32Array.from(out);
+            }
+            pending.push(block);
+            pendingLength += block.length;
+            if (pendingLength >= chunkSamples) flush();
+        };
+        source.connect(node);
+        this.pcmCapture = { source, node, flush };
+    }
+
+    _stopPcm() {
+        if (!this.pcmCapture) return;
+        const { source, node, flush } = this.pcmCapture;
+        this.pcmCapture = null;
+        source.disconnect();
+        node.port.onmessage = null;
+        flush();
+    }
+
+    /**
+     * Stops the turn's recorder; resolves once its last chunk was delivered.
+     */
+    stopTurnRecording() {
+        this._stopPcm();
+        return new Promise((resolve) => {
+            if (!this.mediaRecorder || this.mediaRecorder.state === 'inactive') {
+                resolve();
+                return;
+            }
+            this.mediaRecorder.onstop = () => resolve();
+            this.mediaRecorder.stop();
+        });
+    }
+
+    /**
+     * Video frames captured since the last call.
+     */
+    takeFrames() {
+        const frames = this.videoFrames;
+        this.videoFrames = [];
+        return frames;
+    }
+
     /**
      * End the continuous session and release all resources
      */
@@ -247,6 +404,11 @@ class MediaCapture {
         if (this.mediaRecorder && this.mediaRecorder.state !== 'inactive') {
             this.mediaRecorder.stop();
         }
+        this._stopPcm();
+        if (this.audioContext) {
+            this.audioContext.close();
+            this.audioContext = null;
+        }
 
         // Stop all media tracks (turns off camera/mic lights)
         if (this.mediaStream) {
@@ -19,6 +19,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let sessionStartTime = null;
     let sessionTimerInterval = null;
     let sessionId = null; // Track backend session ID
+    let streamingTurn = null; // Current streaming turn (null: whole-recording uploads)
 
     // Create Unified Multimodal UI Container
     let mmContainer = document.getElementById('multimodal-ui-container');
@@ -73,6 +74,16 @@ document.addEventListener('DOMContentLoaded', () => {
         controlsGroup.appendChild(sendButton);
     }
 
+    // Live (partial) transcript of the streaming turn (inside container)
+    let liveTranscript = document.getElementById('live-transcript');
+    if (!liveTranscript) {
+        liveTranscript = document.createElement('div');
+        liveTranscript.id = 'live-transcript';
+        liveTranscript.className = 'live-transcript';
+        liveTranscript.style.display = 'none';
+        mmContainer.appendChild(liveTranscript);
+    }
+
     const previewVideo = document.getElementById('preview-video');
     const mediaCapture = new window.MediaCapture();
 
@@ -147,6 +158,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
             addMessage('System', 'Live session started. Speak and click "Send" when ready.', 'bot');
 
+            await beginStreamingTurn();
+
         } catch (err) {
             console.error("[Session] Failed to start:", err);
             alert(err.message);
@@ -154,6 +167,59 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    /**
+     * Start streaming the next turn: audio chunks go up as they are recorded
+     * and the server replies when it hears the end of speech (or on Send).
+     * Without streaming support the turn is uploaded whole on Send.
+     */
+    async function beginStreamingTurn() {
+        streamingTurn = null;
+        if (!window.StreamingTurn || currentState === SESSION_STATES.IDLE) return;
+
+        const format = window.MediaCapture.pcmSupported() ? 'pcm16' : 'container';
+        const turn = new window.StreamingTurn({
+            sessionId: sessionId,
+            format: format,
+            onPartial: (text) => {
+                liveTranscript.innerText = text;
+                liveTranscript.style.display = text ? 'block' : 'none';
+            }
+        });
+        try {
+            await turn.start();
+        } catch (err) {
+            console.warn('[Session] Streaming unavailable, uploading whole turns:', err);
+            return;
+        }
+        const recording = await mediaCapture.startTurnRecording(
+            (chunk) => turn.sendChunk(chunk, mediaCapture.takeFrames()), 250, format);
+        if (!recording) return;
+        streamingTurn = turn;
+
+        turn.response
+            .then((result) => {
+                if (result === null) {
+                    if (turn.sent) addMessage('System', 'No audio detected. Please speak and try again.', 'error');
+                    return;
+                }
+                if (result.transcription) addMessage('You', result.transcription, 'user');
+                displayResult(result);
+            })
+            .catch((err) => {
+                console.error("Streaming turn failed:", err);
+                addMessage('System', 'Error processing input. Please try again.', 'error');
+            })
+            .finally(() => {
+                liveTranscript.innerText = '';
+                liveTranscript.style.display = 'none';
+                if (streamingTurn !== turn || currentState === SESSION_STATES.IDLE) return;
+                currentState = SESSION_STATES.ACTIVE;
+                sendButton.disabled = false;
+                sendButton.style.opacity = '1';
+                beginStreamingTurn();
+            });
+    }
+
     /**
      * Send current turn (capture buffer and submit to backend)
      */
@@ -165,6 +231,15 @@ document.addEventListener('DOMContentLoaded', () => {
         sendButton.disabled = true;
         sendButton.style.opacity = '0.5';
 
+        if (streamingTurn) {
+            // The audio is already uploaded; the reply only waits for the last chunk's decode
+            const turn = streamingTurn;
+            turn.sent = true;
+            await mediaCapture.stopTurnRecording();
+            turn.finish(mediaCapture.takeFrames());
+            return; // beginStreamingTurn's handler shows the reply and starts the next turn
+        }
+
         // Capture current buffer
         const data = await mediaCapture.captureCurrentBuffer();
 
@@ -192,6 +267,8 @@ document.addEventListener('DOMContentLoaded', () => {
      */
     async function endSession() {
         console.log("[Session] Ending session...");
+        streamingTurn = null;
+        liveTranscript.style.display = 'none';
 
         // Stop timer
         if (sessionTimerInterval) {
@@ -281,59 +358,69 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             const result = await response.json();
+            if (response.status === 503) {
+                // Speech recognition is saturated: the server says when to retry
+                const retryAfter = response.headers.get('Retry-After') || result.retry_after || 1;
+                addMessage('System', `The server is busy right now. Please try again in ${retryAfter}s.`, 'error');
+                return;
+            }
+            displayResult(result);
 
+        } catch (err) {
+            console.error("Upload failed:", err);
+            addMessage('System', 'Error processing input. Please try again.', 'error');
+        }
+    }
 
-            // Display Bot Response
-            if (result.response) {
-                // Use the global appendMessage function from app.js if available
-                if (typeof appendMessage === 'function') {
-                    appendMessage(result.response, 'bot', true, result.state, result.risk_level);
-                } else {
-                    // Fallback if app.js not loaded
-                    addMessage('HybridBot', result.response, 'bot');
-                }
+    /**
+     * Show a turn's reply and update the state / risk indicators
+     */
+    function displayResult(result) {
+        // Display Bot Response
+        if (result.response) {
+            // Use the global appendMessage function from app.js if available
+            if (typeof appendMessage === 'function') {
+                appendMessage(result.response, 'bot', true, result.state, result.risk_level);
+            } else {
+                // Fallback if app.js not loaded
+                addMessage('HybridBot', result.response, 'bot');
             }
+        }
 
-            // Update UI State/Risk Indicators
-            if (result.state) {
-                const stateElement = document.getElementById('current-state');
-                if (stateElement) {
-                    stateElement.textContent = result.state;
-                }
+        // Update UI State/Risk Indicators
+        if (result.state) {
+            const stateElement = document.getElementById('current-state');
+            if (stateElement) {
+                stateElement.textContent = result.state;
             }
+        }
 
-            if (result.risk_level) {
-                const riskElement = document.getElementById('risk-level');
-                if (riskElement) {
-                    riskElement.textContent = result.risk_level;
-
-                    // Update risk badge color based on level
-                    const riskBadge = riskElement.closest('.risk-badge');
-                    if (riskBadge) {
-                        riskBadge.style.background =
-                            result.risk_level === 'High' ? 'rgba(255, 0, 0, 0.3)' :
-                                result.risk_level === 'Medium' ? 'rgba(255, 165, 0, 0.3)' :
-                                    'rgba(0, 255, 0, 0.2)';
-                    }
+        if (result.risk_level) {
+            const riskElement = document.getElementById('risk-level');
+            if (riskElement) {
+                riskElement.textContent = result.risk_level;
+
+                // Update risk badge color based on level
+                const riskBadge = riskElement.closest('.risk-badge');
+                if (riskBadge) {
+                    riskBadge.style.background =
+                        result.risk_level === 'High' ? 'rgba(255, 0, 0, 0.3)' :
+                            result.risk_level === 'Medium' ? 'rgba(255, 165, 0, 0.3)' :
+                                'rgba(0, 255, 0, 0.2)';
                 }
             }
+        }
 
-            // Update emotion tracker
-            if (result.state && result.risk_level && typeof updateEmotionDisplay === 'function') {
-                updateEmotionDisplay(result.state, result.risk_level);
-            }
-
-
-            // Display State/Risk Info (Debug)
-            console.log("Predicted State:", result.state);
-            console.log("Risk Level:", result.risk_level);
-            if (result.transcription) {
-                console.log("Transcription:", result.transcription);
-            }
+        // Update emotion tracker
+        if (result.state && result.risk_level && typeof updateEmotionDisplay === 'function') {
+            updateEmotionDisplay(result.state, result.risk_level);
+        }
 
-        } catch (err) {
-            console.error("Upload failed:", err);
-            addMessage('System', 'Error processing input. Please try again.', 'error');
+        // Display State/Risk Info (Debug)
+        console.log("Predicted State:", result.state);
+        console.log("Risk Level:", result.risk_level);
+        if (result.transcription) {
+            console.log("Transcription:", result.transcription);
         }
     }
 
@@ -0,0 +1,16 @@
+/**
+ * pcm_capture_worklet.js
+ * AudioWorklet processor for streaming turns: hands every render quantum
+ * of the microphone (mono, float32) to the main thread, which converts it
+ * to 16 kHz s16le and uploads it. Loaded by MediaCapture.startTurnRecording.
+ */
+
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    process(inputs) {
+        const channel = inputs[0] && inputs[0][0];
+        if (channel && channel.length) this.port.postMessage(channel.slice(0));
+        return true;
+    }
+}
+
+registerProcessor('pcm-capture', PcmCaptureProcessor);
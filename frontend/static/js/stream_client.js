@@ -0,0 +1,108 @@
+/**
+ * stream_client.js
+ * One streaming multimodal turn: audio chunks are uploaded while the user
+ * speaks and partial transcripts / the final response come back over SSE.
+ * `format` is 'pcm16' (16 kHz s16le, appended by the server as it arrives)
+ * or 'container' (WebM fragments, for browsers without AudioWorklet).
+ * `response` resolves with the reply, or null when nothing was said.
+ */
+
+class StreamingTurn {
+    constructor({ sessionId = null, format = 'pcm16', onPartial = null, onEndOfSpeech = null } = {}) {
+        this.sessionId = sessionId;
+        this.format = format;
+        this.onPartial = onPartial;
+        this.onEndOfSpeech = onEndOfSpeech;
+        this.streamId = null;
+        this.events = null;
+        this.done = false;
+        this.uploads = Promise.resolve(); // Chunks are posted one after another, in capture order
+        this.response = new Promise((resolve, reject) => {
+            this._resolve = resolve;
+            this._reject = reject;
+        });
+    }
+
+    async start() {
+        const token = localStorage.getItem('access_token');
+        const headers = { 'Content-Type': 'application/json' };
+        if (token) headers['Authorization'] = `Bearer ${token}`;
+
+        const res = await fetch('/api/multimodal_stream/start', {
+            method: 'POST',
+            headers: headers,
+            body: JSON.stringify({ format: this.format, session_id: this.sessionId })
+        });
+        if (!res.ok) throw new Error(`Stream start failed (${res.status})`);
+        this.streamId = (await res.json()).stream_id;
+
+        // The stream id is the credential here: EventSource can't send headers
+        this.events = new EventSource(`/api/multimodal_stream/${this.streamId}/events`);
+        this.events.addEventListener('partial', (e) => {
+            const data = JSON.parse(e.data);
+            if (this.onPartial) this.onPartial(data.text, data.stable);
+        });
+        this.events.addEventListener('end_of_speech', (e) => {
+            if (this.onEndOfSpeech) this.onEndOfSpeech(JSON.parse(e.data).text);
+        });
+        this.events.addEventListener('response', (e) => {
+            this._close();
+            this._resolve(JSON.parse(e.data));
+        });
+        this.events.addEventListener('no_speech', () => {
+            this._close();
+            this._resolve(null);
+        });
+        this.events.addEventListener('error', (e) => {
+            // Server-sent "error" events carry data; connection errors don't
+            const message = e.data ? JSON.parse(e.data).error : 'Stream connection lost';
+            this._close();
+            this._reject(new Error(message));
+        });
+        return this;
+    }
+
+    sendChunk(audioBlob, frames = [], final = false) {
+        if (this.done || !this.streamId) return this.uploads;
+        let url = `/api/multimodal_stream/${this.streamId}/chunk`;
+        let request;
+        if (this.format === 'pcm16' && frames.length === 0) {
+            // Raw samples, no multipart framing: the server appends the body as is
+            if (final) url += '?final=1';
+            request = {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: audioBlob || new Blob([])
+            };
+        } else {
+            const formData = new FormData();
+            formData.append('audio', audioBlob || new Blob([]), this.format === 'pcm16' ? 'chunk.pcm' : 'chunk.webm');
+            frames.forEach((frame, i) => formData.append('frames', frame, `frame_${i}.jpg`));
+            if (final) formData.append('final', '1');
+            request = { method: 'POST', body: formData };
+        }
+
+        this.uploads = this.uploads
+            .then(() => fetch(url, request))
+            .catch((err) => console.error('[Stream] Chunk upload failed:', err));
+        return this.uploads;
+    }
+
+    /**
+     * Last chunk: the server stops waiting for end-of-speech and replies.
+     */
+    finish(frames = []) {
+        this.sendChunk(null, frames, true);
+        return this.response;
+    }
+
+    _close() {
+        this.done = true;
+        if (this.events) {
+            this.events.close(); // Otherwise EventSource reconnects when the response ends
+            this.events = null;
+        }
+    }
+}
+
+window.StreamingTurn = StreamingTurn;
@@ -0,0 +1,54 @@
+# Pre-fork production server:  gunicorn -c gunicorn.conf.py wsgi:app
+#
+# That runs one worker on the default Chroma memory backend, which only one
+# process may write. For several workers switch to the mmap store:
+#   WEB_WORKERS=4 MEMORY_BACKEND=mmap gunicorn -c gunicorn.conf.py wsgi:app
+# (WEB_WORKERS defaults to 2 there.)
+#
+# The master imports wsgi:app once (preload_app), which builds the service
+# container and loads + warms up the eager models. Workers are then forked
+# and share those weights copy-on-write instead of loading N copies.
+import gc
+import os
+
+from config import config as app_config
+from services import set_torch_threads
+
+# Keep the master single-threaded while it preloads and warms up: an OpenMP
+# pool that exists before fork() is unusable (and can hang) in the children.
+# This has to happen here, at config import: the Arbiter loads the preloaded
+# app in its constructor, before any server hook (on_starting) runs.
+set_torch_threads(1)
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = app_config.WEB_WORKERS
+# Threads let concurrent requests inside one worker share embedding batches
+worker_class = 'gthread'
+threads = app_config.WEB_THREADS
+preload_app = True
+timeout = 120
+
+# Chroma's PersistentClient is not safe with several processes writing the
+# same directory; the memory-mapped store is (file locks + shared mappings)
+if workers > 1 and app_config.MEMORY_BACKEND == 'chroma':
+    raise RuntimeError("MEMORY_BACKEND=chroma supports a single worker only: "
+                       "set MEMORY_BACKEND=mmap or WEB_WORKERS=1")
+
+
+def _torch_threads_per_worker():
+    if app_config.TORCH_THREADS_PER_WORKER:
+        return app_config.TORCH_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent GC
+    # generation so collections in workers don't touch (and copy) those pages.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    app = worker.app.wsgi()
+    app.extensions['services'].post_fork(app, _torch_threads_per_worker())
+    server.log.info(f"Worker {worker.pid}: torch threads = {_torch_threads_per_worker()}")
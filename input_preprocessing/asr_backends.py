@@ -0,0 +1,132 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from input_preprocessing.audio_decode import SAMPLE_RATE
+
+
+class ASRBackend(ABC):
+    """
+    Speech-to-text engine behind AudioProcessor. `load()` builds the model
+    (called through the model registry, so it can be evicted and
+    reloaded); `transcribe(model, audio)` takes a 16 kHz mono float32
+    buffer and returns the text.
+    """
+    name = None
+    module = None  # Import that must succeed for the engine to be usable
+    memory_mb = 500
+
+    def __init__(self, model_name, compute_type="int8", beam_size=1, cpu_threads=0, language=None):
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.cpu_threads = cpu_threads
+        self.language = language or None
+
+    @classmethod
+    def available(cls):
+        try:
+            __import__(cls.module)
+            return True
+        except ImportError:
+            return False
+
+    @abstractmethod
+    def load(self):
+        pass
+
+    @abstractmethod
+    def transcribe(self, model, audio):
+        pass
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}"
+
+
+class OpenAIWhisperBackend(ASRBackend):
+    """
+    openai-whisper (PyTorch). fp32 on CPU; the reference engine.
+    """
+    name = "openai-whisper"
+    module = "whisper"
+
+    def load(self):
+        import whisper
+        import ssl
+
+        # Fix SSL certificate verification error
+        ssl._create_default_https_context = ssl._create_unverified_context
+
+        print(f"Loading Whisper model: {self.model_name}...")
+        return whisper.load_model(self.model_name)
+
+    def transcribe(self, model, audio):
+        # Suppress warnings
+        import warnings
+        warnings.filterwarnings("ignore")
+        options = {"language": self.language} if self.language else {}
+        if self.beam_size > 1:
+            options["beam_size"] = self.beam_size
+        result = model.transcribe(audio, fp16=False, **options)  # fp16=False for CPU compatibility
+        return result['text']
+
+
+class FasterWhisperBackend(ASRBackend):
+    """
+    faster-whisper: the same Whisper checkpoints converted to CTranslate2,
+    decoded with int8 weights on CPU (compute_type "int8", or "int8_float32",
+    "float32"). `model_name` is a size ("base", "small", "distil-small.en")
+    or a path to a converted model.
+    """
+    name = "faster-whisper"
+    module = "faster_whisper"
+    memory_mb = 250
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        print(f"Loading faster-whisper model: {self.model_name} ({self.compute_type})...")
+        return WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads)
+
+    def transcribe(self, model, audio):
+        segments, _ = model.transcribe(audio, beam_size=self.beam_size, language=self.language)
+        # Segments are a generator: decoding happens while they are consumed
+        return "".join(segment.text for segment in segments)
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}:{self.compute_type}"
+
+
+class TransformersWhisperBackend(ASRBackend):
+    """
+    Hugging Face speech-recognition pipeline, for distilled checkpoints such
+    as "distil-whisper/distil-small.en" (fp32 on CPU).
+    """
+    name = "transformers"
+    module = "transformers"
+    memory_mb = 700
+
+    def load(self):
+        from transformers import pipeline
+        print(f"Loading ASR pipeline: {self.model_name}...")
+        return pipeline("automatic-speech-recognition", model=self.model_name, device="cpu")
+
+    def transcribe(self, model, audio):
+        kwargs = {"generate_kwargs": {"num_beams": self.beam_size}}
+        if self.language:
+            kwargs["generate_kwargs"]["language"] = self.language
+        # Long inputs are split into 30 s windows like Whisper's own loop
+        result = model({"raw": np.asarray(audio, dtype=np.float32), "sampling_rate": SAMPLE_RATE},
+                       chunk_length_s=30, **kwargs)
+        return result["text"]
+
+
+ASR_BACKENDS = {cls.name: cls for cls in (OpenAIWhisperBackend, FasterWhisperBackend, TransformersWhisperBackend)}
+
+
+def create_asr_backend(name, model_name, **options):
+    try:
+        cls = ASR_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend '{name}' (expected one of {', '.join(ASR_BACKENDS)})")
+    return cls(model_name, **options)
@@ -0,0 +1,164 @@
+import math
+import os
+import queue
+import threading
+import time
+
+from metrics import Histogram
+
+
+class ASRBusy(Exception):
+    """
+    The ASR pool can't take (or finish) the request in time. Routes answer
+    503 with Retry-After: retry_after seconds.
+    """
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _ASRJob:
+    __slots__ = ("fn", "enqueued_at", "deadline", "done", "result", "error", "abandoned")
+
+    def __init__(self, fn, deadline):
+        self.fn = fn
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # Caller gave up: don't start it
+
+
+class ASRPool:
+    """
+    Dedicated inference pool for speech-to-text.
+
+    `replicas` worker threads each own one copy of the model
+    (get_model(i) returns replica i, e.g. from the model registry), so a
+    model is never used from two threads at once. At most max_queue
+    requests wait for a replica; beyond that run() fails straight away
+    with ASRBusy instead of letting callers pile up. A request that is still
+    queued at its deadline (timeout seconds after it arrived) is dropped,
+    and the caller stops waiting for a running one at the same deadline.
+    """
+    def __init__(self, get_model, replicas=1, max_queue=4, timeout=15.0):
+        self.get_model = get_model
+        self.replicas = max(1, int(replicas))
+        self.max_queue = max(0, int(max_queue))  # 0 = unbounded
+        self.timeout = float(timeout) if timeout else None
+
+        self._queue = queue.Queue()
+        self._workers = []
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.pending = 0  # Admitted and not finished: queued + running
+        self.busy = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0  # Deadline passed while queued (never ran)
+        self.timed_out = 0  # Caller stopped waiting
+
+        self.queue_wait_hist = Histogram([0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0])  # seconds
+        self.service_time_hist = Histogram([0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0])  # seconds
+
+    def _ensure_workers(self):
+        # Started lazily (and again after fork) so the replica threads belong
+        # to the process serving requests
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._workers = [threading.Thread(target=self._run, args=(i,), name=f"asr-replica-{i}", daemon=True)
+                             for i in range(self.replicas)]
+            for worker in self._workers:
+                worker.start()
+            self._worker_pid = os.getpid()
+
+    def retry_after(self):
+        """
+        Seconds until a replica is likely free: queued + running requests
+        times the mean service time, spread over the replicas.
+        """
+        mean = self.service_time_hist.snapshot()["mean"] or 1.0
+        return max(1, int(math.ceil(self.pending * mean / self.replicas)))
+
+    def saturated(self):
+        """
+        True when a new request would be rejected (cheap pre-check before
+        decoding an upload; run() makes the binding decision).
+        """
+        return self.max_queue > 0 and self.pending >= self.replicas + self.max_queue
+
+    def run(self, fn, timeout=None):
+        """
+        Runs fn(model) on a free replica and returns its result. Raises
+        ASRBusy when the queue is full or the deadline passes.
+        """
+        self._ensure_workers()
+        timeout = self.timeout if timeout is None else timeout
+        job = _ASRJob(fn, time.perf_counter() + timeout if timeout else None)
+        with self._stats_lock:
+            admitted = not self.saturated()
+            if admitted:
+                self.pending += 1
+            else:
+                self.rejected += 1
+        if not admitted:
+            raise ASRBusy("Speech recognition is busy", self.retry_after())
+        self._queue.put(job)
+
+        if not job.done.wait(timeout):
+            job.abandoned = True
+            with self._stats_lock:
+                self.timed_out += 1
+            raise ASRBusy(f"Speech recognition did not finish within {timeout:g}s", self.retry_after())
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _run(self, replica):
+        while True:
+            job = self._queue.get()
+            started = time.perf_counter()
+            self.queue_wait_hist.observe(started - job.enqueued_at)
+            if job.abandoned or (job.deadline is not None and started > job.deadline):
+                with self._stats_lock:
+                    self.expired += 1
+                    self.pending -= 1
+                job.error = ASRBusy("Speech recognition request expired in the queue", self.retry_after())
+                job.done.set()
+                continue
+
+            with self._stats_lock:
+                self.busy += 1
+            try:
+                job.result = job.fn(self.get_model(replica))
+            except Exception as e:
+                job.error = e
+            finally:
+                self.service_time_hist.observe(time.perf_counter() - started)
+                with self._stats_lock:
+                    self.busy -= 1
+                    self.pending -= 1
+                    self.completed += 1
+                job.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "replicas": self.replicas,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout,
+                "queue_depth": self.pending - self.busy,
+                "busy_replicas": self.busy,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "expired_in_queue": self.expired,
+                "timed_out": self.timed_out,
+                "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+                "service_seconds": self.service_time_hist.snapshot()
+            }
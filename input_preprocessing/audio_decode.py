@@ -0,0 +1,84 @@
+import io
+import subprocess
+import wave
+
+import numpy as np
+
+# Whisper's input rate; uploads are decoded once at this rate
+SAMPLE_RATE = 16000
+# Rate the prosodic features (and rf_audio.pkl) were built at: librosa.load's default
+PROSODY_SAMPLE_RATE = 22050
+# Longest clip the multimodal capture produces (prosodic features use this much)
+MAX_CLIP_SECONDS = 7.0
+
+
+def _ffmpeg(source, sr, max_seconds=None):
+    """
+    Decodes with ffmpeg into mono s16le at `sr` (the same conversion
+    whisper.load_audio does). `source` is a path, or bytes piped to stdin.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+           "-i", source if isinstance(source, str) else "pipe:0"]
+    if max_seconds:
+        cmd += ["-t", str(max_seconds)]
+    cmd += ["-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "pipe:1"]
+    out = subprocess.run(cmd, input=None if isinstance(source, str) else source,
+                         capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def resample(y, orig_sr, sr):
+    if orig_sr == sr or len(y) == 0:
+        return y
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly
+        g = gcd(int(orig_sr), int(sr))
+        return resample_poly(y, sr // g, orig_sr // g).astype(np.float32)
+    except ImportError:
+        positions = np.arange(int(len(y) * sr / orig_sr)) * (orig_sr / sr)
+        return np.interp(positions, np.arange(len(y)), y).astype(np.float32)
+
+
+def _wav(data, sr, max_seconds=None):
+    """
+    PCM WAV without ffmpeg (stdlib wave + resample).
+    """
+    with wave.open(io.BytesIO(data)) as w:
+        width, channels, orig_sr = w.getsampwidth(), w.getnchannels(), w.getframerate()
+        frames = w.getnframes() if not max_seconds else min(w.getnframes(), int(max_seconds * orig_sr))
+        raw = w.readframes(frames)
+    if width == 1:
+        y = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        y = np.frombuffer(raw, dtype).astype(np.float32) / float(np.iinfo(dtype).max + 1)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    if channels > 1:
+        y = y.reshape(-1, channels).mean(axis=1)
+    return resample(y, orig_sr, sr)
+
+
+def decode_audio(source, sr=SAMPLE_RATE, max_seconds=None):
+    """
+    Decodes an upload once into a mono float32 array at `sr`.
+
+    `source` is raw bytes, a readable stream (e.g. a werkzeug FileStorage
+    stream) or a file path. Bytes are piped through ffmpeg, so nothing is
+    written to disk; PCM WAV falls back to the stdlib decoder if ffmpeg is
+    missing or can't read the container from a pipe.
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    try:
+        return _ffmpeg(source, sr, max_seconds)
+    except (OSError, subprocess.CalledProcessError) as e:
+        data = source
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            return _wav(data, sr, max_seconds)
+        detail = e.stderr.decode(errors="ignore").strip() if getattr(e, "stderr", None) else e
+        raise ValueError(f"Could not decode audio: {detail}")
@@ -1,63 +1,147 @@
 import numpy as np
 import os
+import time
+
+from input_preprocessing.asr_backends import create_asr_backend
+from input_preprocessing.asr_pool import ASRBusy, ASRPool
+from input_preprocessing.audio_decode import MAX_CLIP_SECONDS, PROSODY_SAMPLE_RATE, SAMPLE_RATE, decode_audio, resample
+from input_preprocessing.vad import Speech, VADStats
 
 class AudioProcessor:
-    def __init__(self, model_size="base"):
+    def __init__(self, model_size="base", registry=None, backend="openai-whisper", compute_type="int8",
+                 beam_size=1, cpu_threads=0, language=None, vad=None, replicas=1, max_queue=4, timeout=15.0):
         # Lazy loading to prevent startup lag if not needed immediately
         self.model_size = model_size
-        self.model = None
-        self.has_libs = False
+        self.models = {}  # Replica index -> model, when there is no registry
+        # Speech-to-text engine (see asr_backends.ASR_BACKENDS), chosen by config
+        self.asr = create_asr_backend(backend, model_size, compute_type=compute_type, beam_size=beam_size,
+                                      cpu_threads=cpu_threads, language=language)
+        # Optional EnergyVAD: trims silence before ASR / prosody, skips ASR on silent clips
+        self.vad = vad
+        self.vad_stats = VADStats()
+        # Optional ModelRegistry that owns the ASR weights (load state, eviction)
+        self.registry = registry
+        self.has_asr = self.asr.available()
         try:
             import librosa
-            import whisper
-            self.has_libs = True
+            self.has_librosa = True
         except ImportError:
-            print("Warning: Librosa/Whisper not found. Audio features will be mocked.")
+            self.has_librosa = False
+        self.has_libs = self.has_asr and self.has_librosa
+        if not self.has_libs:
+            missing = [name for name, ok in ((self.asr.module, self.has_asr), ("librosa", self.has_librosa)) if not ok]
+            print(f"Warning: {', '.join(missing)} not found. Audio features will be mocked.")
 
-    def load_model(self):
-        if self.has_libs and not self.model:
-            import whisper
-            import ssl
-            import urllib.request
-            
-            # Fix SSL certificate verification error
-            ssl._create_default_https_context = ssl._create_unverified_context
-            
-            print(f"Loading Whisper model: {self.model_size}...")
-            self.model = whisper.load_model(self.model_size)
+        # Every ASR call goes through the pool: one model copy per replica thread, bounded queue
+        self.pool = ASRPool(self.load_model, replicas=replicas, max_queue=max_queue, timeout=timeout)
+        if self.registry is not None and self.has_asr:
+            for replica in range(self.pool.replicas):
+                self.registry.register(self._replica_name(replica), self.asr.load, memory_mb=self.asr.memory_mb,
+                                       evictable=True,
+                                       warmup=lambda m: self.asr.transcribe(m, np.zeros(SAMPLE_RATE, dtype=np.float32)))
+
+    @staticmethod
+    def _replica_name(replica):
+        return "whisper" if replica == 0 else f"whisper:{replica}"
 
-    def transcribe(self, audio_path):
+    def load_model(self, replica=0):
         """
-        Transcribes audio file to text using Whisper.
+        ASR model of one pool replica. Only that replica's thread uses it.
         """
-        if not self.has_libs:
+        if not self.has_asr:
+            return None
+        if self.registry is not None:
+            return self.registry.get(self._replica_name(replica))
+        if replica not in self.models:
+            self.models[replica] = self.asr.load()
+        return self.models[replica]
+
+    def load_audio(self, source):
+        """
+        Decodes an upload (bytes, stream or path) once into the 16 kHz mono
+        float32 buffer that transcribe and extract_prosodic_features take.
+        Returns an empty buffer if the audio can't be decoded.
+        """
+        try:
+            return decode_audio(source, sr=SAMPLE_RATE)
+        except Exception as e:
+            print(f"Audio Decode Error: {e}")
+            return np.zeros(0, dtype=np.float32)
+
+    def _as_buffer(self, audio, max_seconds=None):
+        if isinstance(audio, str):
+            return decode_audio(audio, sr=SAMPLE_RATE, max_seconds=max_seconds)
+        return np.asarray(audio, dtype=np.float32)
+
+    def detect_speech(self, audio):
+        """
+        Speech regions of a 16 kHz buffer (see vad.Speech), or None when VAD
+        is off.
+        """
+        if self.vad is None:
+            return None
+        return self.vad.detect(self._as_buffer(audio))
+
+    def transcribe(self, audio):
+        """
+        Transcribes audio to text with the configured ASR engine. `audio`
+        is a 16 kHz float32 buffer from load_audio, a file path, or the
+        Speech from detect_speech (only its speech chunks are transcribed;
+        a clip without speech never reaches ASR). Raises ASRBusy when the
+        ASR pool is full or the request's deadline passes.
+        """
+        if not self.has_asr:
             print("Warning: Wrapper called but libs missing. Returning mock.")
             return "[Audio Transcription Mock]"
             
         try:
-            self.load_model()
-            # Suppress warnings
-            import warnings
-            warnings.filterwarnings("ignore")
-            
-            result = self.model.transcribe(audio_path, fp16=False) # fp16=False for CPU compatibility
-            return result['text']
+            if isinstance(audio, Speech):
+                speech = audio
+                if not speech.has_speech:
+                    self.vad_stats.record(speech)
+                    return ""
+                text, seconds = self.pool.run(lambda model: self._timed_transcribe(model, speech.chunks))
+                self.vad_stats.record(speech, seconds)
+                return text
+            audio = self._as_buffer(audio)
+            if len(audio) == 0:
+                return ""
+            return self.pool.run(lambda model: self.asr.transcribe(model, audio))
+        except ASRBusy:
+            raise
         except Exception as e:
             print(f"Transcription Error: {e}")
             return ""
 
-    def extract_prosodic_features(self, audio_path):
+    def _timed_transcribe(self, model, chunks):
+        # Timed on the replica: the RTF in vad_stats must not include the queue wait
+        started = time.perf_counter()
+        text = " ".join(self.asr.transcribe(model, chunk).strip() for chunk in chunks)
+        return text, time.perf_counter() - started
+
+    def extract_prosodic_features(self, audio, sr=SAMPLE_RATE):
         """
         Extracts MFCC, Pitch, and Energy using Librosa.
+        `audio` is a float32 buffer at `sr` (see load_audio), a file path,
+        or the Speech from detect_speech (features over the trimmed clip;
+        rf_audio.pkl is trained on untrimmed clips, so serving passes those).
         Returns a feature vector.
         """
-        if not self.has_libs:
+        if not self.has_librosa:
              return np.zeros(15)
 
         try:
             import librosa
-            # Load audio for 7 seconds (matching max capture)
-            y, sr = librosa.load(audio_path, duration=7.0)
+            # First 7 seconds (matching max capture) of the buffer Whisper sees
+            if isinstance(audio, Speech):
+                audio = audio.audio
+            y = self._as_buffer(audio, max_seconds=MAX_CLIP_SECONDS)[:int(MAX_CLIP_SECONDS * sr)]
+            if len(y) == 0:
+                return np.zeros(15)
+            # rf_audio.pkl was trained on 22.05 kHz features: MFCC frames and
+            # mel bands depend on the rate, so resample rather than retrain
+            y = resample(y, sr, PROSODY_SAMPLE_RATE)
+            sr = PROSODY_SAMPLE_RATE
             
             # MFCC (13 coeffs)
             mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13).T, axis=0)
@@ -0,0 +1,158 @@
+import threading
+
+import numpy as np
+
+from input_preprocessing.asr_pool import ASRBusy
+from input_preprocessing.audio_decode import SAMPLE_RATE
+from metrics import Histogram
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of audio that arrives while the user speaks.
+
+    Every update() runs the VAD over the audio not yet committed:
+    - speech segments followed by at least a pause are final; they are
+      transcribed once, committed, and never decoded again
+    - the segment still in progress is re-decoded over a sliding window
+      (at most window_seconds, at most once per partial_interval_s of new
+      audio) to give a tentative partial transcript
+    - end_silence_ms of silence after speech is end-of-speech: whatever is
+      uncommitted (only the last segment) is decoded and the transcript is
+      complete, so the reply waits for one short decode instead of a pass
+      over the whole recording
+
+    `processor` is the AudioProcessor (its ASR engine does the decoding),
+    `vad` an EnergyVAD.
+    """
+    def __init__(self, processor, vad, partial_interval_s=1.0, end_silence_ms=700, window_seconds=30.0,
+                 sr=SAMPLE_RATE):
+        self.processor = processor
+        self.vad = vad
+        self.sr = sr
+        self.interval = int(sr * partial_interval_s)
+        self.end_silence = int(sr * end_silence_ms / 1000)
+        self.window = int(sr * window_seconds)
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.committed = 0  # Samples already transcribed into self.parts
+        self.parts = []
+        self.partial = ""
+        self.partial_at = 0  # len(self.audio) when the partial was decoded
+        self.ended = False
+        self.decodes = 0
+
+    @property
+    def text(self):
+        return " ".join(part for part in self.parts + [self.partial] if part)
+
+    def append(self, samples):
+        """
+        New samples at the end of the stream (raw PCM uploads).
+        """
+        if len(samples):
+            self.audio = np.concatenate([self.audio, np.asarray(samples, dtype=np.float32)])
+
+    def replace(self, audio):
+        """
+        The whole stream decoded again (container uploads: only the full
+        byte stream is decodable). The prefix is unchanged, so committed
+        offsets stay valid.
+        """
+        if len(audio) >= len(self.audio):
+            self.audio = np.asarray(audio, dtype=np.float32)
+
+    def _decode(self, chunk):
+        self.decodes += 1
+        return self.processor.transcribe(chunk).strip()
+
+    def _commit(self, tail, segments):
+        for chunk in self.vad.chunks(tail, segments):
+            text = self._decode(chunk)
+            if text:
+                self.parts.append(text)
+        self.committed += segments[-1][1]
+        self.partial = ""
+
+    def update(self, final=False):
+        """
+        Process the audio received so far. Returns a list of
+        (event, payload) for the client: "partial" transcripts and a
+        single "end_of_speech".
+        """
+        if self.ended:
+            return []
+        events = []
+        tail = self.audio[self.committed:]
+        segments = self.vad.segments(tail)
+        if not segments:
+            if final:
+                self.ended = True
+                events.append(("end_of_speech", {"text": self.text}))
+            return events
+
+        last_end = segments[-1][1]
+        trailing = len(tail) - last_end + self.vad.pad if last_end < len(tail) else 0
+        speech_over = final or trailing >= self.end_silence
+        closed = segments if speech_over else segments[:-1]
+        if closed:
+            self._commit(tail, closed)
+            events.append(("partial", {"text": self.text, "stable": True}))
+        if speech_over:
+            self.ended = True
+            events.append(("end_of_speech", {"text": self.text}))
+            return events
+
+        # Segment in progress: tentative decode over the sliding window
+        start = self.committed + segments[-1][0] - (closed[-1][1] if closed else 0)
+        if len(self.audio) - start > self.window:
+            # Longer than one ASR window without a pause: commit a window's worth
+            self.committed = start
+            self._commit(self.audio[start:], [(0, self.window)])
+            start = self.committed
+        if len(self.audio) - self.partial_at >= self.interval and len(self.audio) > start:
+            self.partial_at = len(self.audio)
+            try:
+                self.partial = self._decode(self.audio[start:])
+            except ASRBusy:
+                return events  # Partials are optional: skip this one rather than fail the turn
+            events.append(("partial", {"text": self.text, "stable": False}))
+        return events
+
+    def finish(self):
+        """
+        Final transcript (the client signalled the end, or the stream timed out).
+        """
+        events = self.update(final=True)
+        return self.text, events
+
+
+class StreamingStats:
+    """
+    Streaming turn counters: partials sent, decodes per turn, and time from
+    end-of-speech (or the client's last chunk) to the reply being sent.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.partials = 0
+        self.decodes = 0
+        self.audio_seconds = 0.0
+        self.time_to_response = Histogram([0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0])
+
+    def record(self, partials, decodes, audio_seconds, seconds_to_response):
+        with self._lock:
+            self.turns += 1
+            self.partials += partials
+            self.decodes += decodes
+            self.audio_seconds += audio_seconds
+        self.time_to_response.observe(seconds_to_response)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "partials": self.partials,
+                "decodes": self.decodes,
+                "audio_s": round(self.audio_seconds, 2),
+                "end_of_speech_to_response_s": self.time_to_response.snapshot()
+            }
@@ -1,18 +1,27 @@
 import concurrent.futures
 
 class SyncController:
-    def __init__(self):
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    def __init__(self, max_workers=4, timeout=None):
+        # Only video runs here; audio waits on the ASR pool from the request thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix="sync-video")
+        self.timeout = timeout
 
     def process_parallel(self, audio_func, video_func, audio_args=(), video_args=()):
         """
         Executes audio and video processing functions in parallel.
         Returns a tuple of (audio_result, video_result).
+        The audio function runs on the calling thread (its ASR work is
+        already bounded by the ASR pool), the video function on the
+        executor. Waiting for video is bounded by `timeout` seconds
+        (concurrent.futures.TimeoutError).
         """
-        future_audio = self.executor.submit(audio_func, *audio_args)
         future_video = self.executor.submit(video_func, *video_args)
-        
-        audio_result = future_audio.result()
-        video_result = future_video.result()
-        
+        try:
+            audio_result = audio_func(*audio_args)
+        except BaseException:
+            future_video.cancel()
+            raise
+        video_result = future_video.result(timeout=self.timeout)
+
         return audio_result, video_result
@@ -0,0 +1,154 @@
+import threading
+
+import numpy as np
+
+from input_preprocessing.audio_decode import SAMPLE_RATE
+from metrics import Histogram
+
+
+class Speech:
+    """
+    Result of EnergyVAD.detect for one clip.
+
+    audio: the clip with leading / trailing silence trimmed (pauses
+        between speech segments are kept), empty if there is no speech
+    segments: (start, end) sample offsets of the speech regions
+    chunks: ASR inputs, each at most max_chunk_seconds long and cut only
+        at silences (a single longer speech run is cut hard)
+    """
+    def __init__(self, audio, segments, chunks, total_seconds, sr=SAMPLE_RATE):
+        self.audio = audio
+        self.segments = segments
+        self.chunks = chunks
+        self.total_seconds = total_seconds
+        self.sr = sr
+
+    @property
+    def has_speech(self):
+        return bool(self.segments)
+
+    @property
+    def kept_seconds(self):
+        return len(self.audio) / float(self.sr)
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detection: no model, well under a
+    millisecond for a 7 s clip. A frame is speech when its RMS level (dBFS) is above both an
+    absolute floor and the clip's own noise floor (10th percentile level)
+    plus margin_db. A clip with frames above the floor but nothing over
+    the relative threshold is kept by the floor alone: only silence
+    skips ASR. Speech runs closer than min_silence_ms are merged,
+    runs shorter than min_speech_ms dropped, and each kept run padded by
+    pad_ms so word onsets and tails survive.
+    """
+    def __init__(self, sr=SAMPLE_RATE, frame_ms=30, floor_db=-50.0, margin_db=12.0, min_speech_ms=120,
+                 min_silence_ms=300, pad_ms=150, max_chunk_seconds=30.0):
+        self.sr = sr
+        self.frame = int(sr * frame_ms / 1000)
+        self.floor_db = floor_db
+        self.margin_db = margin_db
+        self.min_speech = int(sr * min_speech_ms / 1000)
+        self.min_silence = int(sr * min_silence_ms / 1000)
+        self.pad = int(sr * pad_ms / 1000)
+        self.max_chunk = int(sr * max_chunk_seconds)
+
+    def frame_levels(self, audio):
+        n = len(audio) // self.frame
+        frames = np.asarray(audio[:n * self.frame], dtype=np.float32).reshape(n, self.frame)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return 20.0 * np.log10(rms + 1e-10)
+
+    def segments(self, audio):
+        levels = self.frame_levels(audio)
+        if len(levels) == 0 or not (levels > self.floor_db).any():
+            return []
+        # Steady background noise sits at the 10th percentile level, speech
+        # margin_db above it. Clips with no pause (continuous speech) or
+        # speech barely over loud noise find nothing that way: fail open to
+        # everything above the absolute floor, so ASR still hears the clip.
+        threshold = max(self.floor_db, np.percentile(levels, 10) + self.margin_db)
+        return self._runs(levels, threshold, len(audio)) or self._runs(levels, self.floor_db, len(audio))
+
+    def _runs(self, levels, threshold, length):
+        voiced = np.concatenate([[False], levels > threshold, [False]])
+        edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+        runs = [[start * self.frame, end * self.frame] for start, end in zip(edges[::2], edges[1::2])]
+
+        merged = []
+        for start, end in runs:
+            if merged and start - merged[-1][1] < self.min_silence:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        return [(max(0, start - self.pad), min(length, end + self.pad))
+                for start, end in merged if end - start >= self.min_speech]
+
+    def chunks(self, audio, segments):
+        chunks, current = [], None
+        for start, end in segments:
+            if current is not None and end - current[0] <= self.max_chunk:
+                current[1] = end
+                continue
+            if current is not None:
+                chunks.append(current)
+            current = [start, end]
+        if current is not None:
+            chunks.append(current)
+        out = []
+        for start, end in chunks:
+            for cut in range(start, end, self.max_chunk):
+                out.append(audio[cut:min(end, cut + self.max_chunk)])
+        return out
+
+    def detect(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        segments = self.segments(audio)
+        trimmed = audio[segments[0][0]:segments[-1][1]] if segments else audio[:0]
+        return Speech(trimmed, segments, self.chunks(audio, segments), len(audio) / float(self.sr), self.sr)
+
+
+class VADStats:
+    """
+    How much audio VAD kept away from ASR, and what ASR cost per second
+    of audio it did get (to estimate the latency that saved).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clips = 0
+        self.skipped = 0  # Clips with no speech: ASR not called
+        self.audio_seconds = 0.0
+        self.kept_seconds = 0.0
+        self.asr_seconds = 0.0
+        self.asr_audio_seconds = 0.0
+        self.asr_latency = Histogram([0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0])
+
+    def record(self, speech, asr_seconds=None):
+        with self._lock:
+            self.clips += 1
+            self.audio_seconds += speech.total_seconds
+            self.kept_seconds += speech.kept_seconds
+            if asr_seconds is None:
+                self.skipped += 1
+            else:
+                self.asr_seconds += asr_seconds
+                self.asr_audio_seconds += speech.kept_seconds
+        if asr_seconds is not None:
+            self.asr_latency.observe(asr_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            saved = self.audio_seconds - self.kept_seconds
+            rtf = self.asr_seconds / self.asr_audio_seconds if self.asr_audio_seconds else None
+            return {
+                "clips": self.clips,
+                "asr_skipped_no_speech": self.skipped,
+                "audio_s": round(self.audio_seconds, 2),
+                "speech_s": round(self.kept_seconds, 2),
+                "audio_s_saved": round(saved, 2),
+                "asr_rtf": round(rtf, 4) if rtf is not None else None,
+                # ASR time the trimmed / skipped audio would have cost at the observed RTF
+                "est_asr_s_saved": round(saved * rtf, 2) if rtf is not None else None,
+                "asr_latency_s": self.asr_latency.snapshot()
+            }
@@ -0,0 +1,140 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Every keyword list the request path matches against, by category. All of
+# them are compiled into one pattern, so a message is scanned once no
+# matter how many call sites look at it.
+LEXICONS = {
+    # SafetyGuard.is_safe
+    "safety": ["die", "kill", "suicide", "hurt myself"],
+    # chat() risk keyword count
+    "risk": ["sad", "hopeless", "dark"],
+    # CBTEngine topic reflection (checked in this order)
+    "topic:academic": ["exam", "test", "study", "grade", "fail"],
+    "topic:work": ["job", "work", "boss", "career"],
+    "topic:loneliness": ["lonely", "alone", "isolated"],
+    "topic:sleep": ["sleep", "tired", "insomnia"],
+    "topic:relationship": ["breakup", "ex", "relationship", "sad"],
+    "topic:risk": ["die", "kill", "suicide", "end it"],
+    # /api/multimodal text cues
+    "cue:Sadness": ["sad", "down", "depressed", "cry", "heavy"],
+    "cue:Anxiety": ["anxious", "worry", "scared", "panic"],
+    "cue:Stress": ["stress", "overwhelmed", "tired", "busy"],
+    "cue:Happy": ["happy", "good", "great", "joy"],
+    # Classifier cascade lexicon stage (labels follow the zero-shot label set)
+    "label:Depression": ["depressed", "depression", "hopeless", "worthless", "empty inside", "numb", "no point",
+                         "give up", "nothing matters", "can't get out of bed", "hate myself"],
+    "label:Anxiety": ["anxious", "anxiety", "panic", "panicking", "worried", "worry", "worrying", "nervous",
+                      "scared", "afraid", "racing heart", "heart is racing", "can't breathe", "on edge"],
+    "label:Stress": ["stressed", "stress", "overwhelmed", "pressure", "deadline", "deadlines", "burnt out",
+                     "burned out", "too much work", "exhausted", "overworked"],
+    "label:Sadness": ["sad", "crying", "cry", "cried", "heartbroken", "lonely", "alone", "miss them", "grief",
+                      "upset", "down"],
+    "label:ADHD": ["can't focus", "cannot focus", "distracted", "procrastinate", "procrastinating", "restless",
+                   "fidgety", "forgetful", "jumping between tasks"],
+    "label:Bipolar": ["manic", "mania", "mood swings", "euphoric", "racing thoughts", "no sleep for days"],
+    "label:Normal": ["happy", "great", "good day", "fine", "relaxed", "calm", "excited", "grateful", "okay",
+                     "went well", "enjoyed"],
+}
+
+# Categories whose call sites used plain substring tests (`w in text`) and
+# keep them: "hopeless" counts in "hopelessness", "sad" in "sadness" (and
+# in "crusade"). The risk count feeds RiskAssessor, so it must not drop
+# inflections. Everything else is whole-word only.
+SUBSTRING_CATEGORIES = {"risk", "cue:Sadness", "cue:Anxiety", "cue:Stress", "cue:Happy"}
+
+Hit = namedtuple("Hit", ["category", "phrase", "start", "end"])
+
+
+def _trie_pattern(phrases):
+    """
+    Regex alternation of `phrases` factored into a character trie, so the
+    engine follows one branch per character instead of retrying every
+    phrase at every position. Optional groups are greedy: the longest
+    phrase at a position wins.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+def _prefix_map(phrases):
+    # Phrases matched at the same position as `p` are exactly the phrases p starts with
+    return {p: [q for q in phrases if p.startswith(q)] for p in phrases}
+
+
+class KeywordScanner:
+    """
+    Multi-pattern keyword matcher: every phrase in one trie-shaped regex
+    inside a lookahead, so a single left-to-right pass reports every phrase
+    starting at every word boundary, overlaps included. Each match is then
+    expanded to the shorter phrases it starts with and to every category
+    that owns them. Substring categories get a second (small) pass that
+    matches at any position.
+
+    Text is lowercased before matching; results for recently seen texts
+    are cached, since the same message goes through several call sites.
+    """
+    def __init__(self, lexicons, substring_categories=(), cache_size=256):
+        self.lexicons = {category: list(phrases) for category, phrases in lexicons.items()}
+        owners, anywhere = {}, {}
+        for category, phrases in self.lexicons.items():
+            target = anywhere if category in substring_categories else owners
+            for phrase in phrases:
+                target.setdefault(phrase.lower(), []).append(category)
+        self._owners, self._anywhere = owners, anywhere
+        self._starts_with = _prefix_map(sorted(owners))
+        self._anywhere_starts_with = _prefix_map(sorted(anywhere))
+        self._pattern = re.compile(r"\b(?=(" + _trie_pattern(sorted(owners)) + r")(\w*))")
+        self._anywhere_pattern = (re.compile(r"(?=(" + _trie_pattern(sorted(anywhere)) + r"))")
+                                  if anywhere else None)
+        self._cached_scan = lru_cache(maxsize=cache_size)(self._scan)
+
+    def scan(self, text):
+        """
+        Every hit in `text` as (category, phrase, start, end), in text order.
+        """
+        if not text:
+            return ()
+        return self._cached_scan(text.lower())
+
+    def categories(self, text):
+        return {hit.category for hit in self.scan(text)}
+
+    def phrases(self, text, category):
+        return {hit.phrase for hit in self.scan(text) if hit.category == category}
+
+    def _scan(self, text):
+        hits = []
+        for match in self._pattern.finditer(text):
+            longest, tail = match.group(1), match.group(2)
+            start = match.start()
+            for phrase in self._starts_with[longest]:
+                rest = longest[len(phrase):] + tail
+                if not rest or not (rest[0].isalnum() or rest[0] == "_"):
+                    for category in self._owners[phrase]:
+                        hits.append(Hit(category, phrase, start, start + len(phrase)))
+        if self._anywhere_pattern is not None:
+            for match in self._anywhere_pattern.finditer(text):
+                start = match.start()
+                for phrase in self._anywhere_starts_with[match.group(1)]:
+                    for category in self._anywhere[phrase]:
+                        hits.append(Hit(category, phrase, start, start + len(phrase)))
+            hits.sort(key=lambda hit: hit.start)
+        return tuple(hits)
+
+
+SCANNER = KeywordScanner(LEXICONS, SUBSTRING_CATEGORIES)
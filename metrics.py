@@ -0,0 +1,39 @@
+import threading
+
+
+class Histogram:
+    """
+    Minimal cumulative histogram (Prometheus-style 'le' buckets).
+    Thread-safe, no external dependencies.
+    """
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self._counts[i] += 1
+                    return
+            self._counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for upper, c in zip(self.buckets, self._counts):
+                running += c
+                cumulative[str(upper)] = running
+            cumulative["+Inf"] = running + self._counts[-1]
+            return {
+                "buckets": cumulative,
+                "count": self._count,
+                "sum": round(self._sum, 6),
+                "mean": round(self._sum / self._count, 6) if self._count else 0.0
+            }
@@ -0,0 +1,249 @@
+import gc
+import os
+import threading
+import time
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB (Linux /proc, falls back to
+    peak RSS from getrusage elsewhere).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KB on Linux
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    except Exception:
+        return 0.0
+
+
+class ModelSpec:
+    def __init__(self, name, loader, memory_mb, eager=False, warmup=None, evictable=False):
+        self.name = name
+        self.loader = loader
+        self.memory_mb = memory_mb      # Declared cost, used for budgeting before load
+        self.eager = eager
+        self.warmup = warmup            # callable(model), run once after load
+        self.evictable = evictable
+
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.measured_mb = None         # RSS delta observed while loading
+        self.loaded_at = None
+        self.last_used = None
+        self.use_count = 0
+        self.load_count = 0
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+
+class ModelRegistry:
+    """
+    Central place where every heavy model is declared with a loader and its
+    memory cost. Models are loaded on first get() (or at boot if eager), warmed
+    up once, and evictable models are dropped least-recently-used first when
+    the process RSS goes over the configured budget. A background reaper also
+    drops evictable models that sat idle longer than idle_ttl_s and re-checks
+    the budget every check_interval_s, so memory comes back after a burst
+    even if nothing else is ever loaded.
+    """
+    def __init__(self, rss_budget_mb=0, eager_models=None, warmup=True,
+                 idle_ttl_s=0, check_interval_s=60):
+        self.rss_budget_mb = rss_budget_mb or 0
+        self.eager_models = set(eager_models or [])
+        self.warmup_enabled = warmup
+        self.idle_ttl_s = idle_ttl_s or 0
+        self.check_interval_s = check_interval_s
+        self._specs = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._reaper_pid = None
+
+    def register(self, name, loader, memory_mb, eager=False, warmup=None, evictable=False):
+        with self._lock:
+            if name in self._specs:
+                return self._specs[name]
+            spec = ModelSpec(name, loader, memory_mb,
+                             eager=eager or name in self.eager_models,
+                             warmup=warmup, evictable=evictable)
+            self._specs[name] = spec
+            return spec
+
+    def is_registered(self, name):
+        return name in self._specs
+
+    def is_loaded(self, name):
+        spec = self._specs.get(name)
+        return spec is not None and spec.loaded
+
+    def get(self, name):
+        """
+        Returns the model, loading (and warming up) it on first use.
+        """
+        spec = self._specs[name]
+        model = spec.model
+        if model is None:
+            model = self._load(spec)
+        spec.last_used = time.time()
+        spec.use_count += 1
+        self._ensure_reaper()
+        return model
+
+    def _ensure_reaper(self):
+        # Started lazily in the serving process: a thread started before a
+        # gunicorn fork would not exist in the workers
+        if self._reaper_pid == os.getpid() or not (self.idle_ttl_s or self.rss_budget_mb):
+            return
+        with self._lock:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        threading.Thread(target=self._reaper, name="model-reaper", daemon=True).start()
+
+    def _reaper(self):
+        while True:
+            time.sleep(self.check_interval_s)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"ModelRegistry: reaper failed: {e}")
+
+    def reap(self, now=None):
+        """
+        Evicts evictable models idle for longer than idle_ttl_s, then enforces
+        the RSS budget. Returns the names evicted for being idle.
+        """
+        now = now or time.time()
+        idle = []
+        if self.idle_ttl_s:
+            for spec in list(self._specs.values()):
+                if (spec.loaded and spec.evictable
+                        and now - (spec.last_used or spec.loaded_at or now) > self.idle_ttl_s):
+                    with spec.lock:  # Not while a load of the same model is in progress
+                        if self.unload(spec.name):
+                            self.evictions += 1
+                            idle.append(spec.name)
+        self._enforce_budget()
+        return idle
+
+    def _load(self, spec):
+        with spec.lock:
+            if spec.model is not None:
+                return spec.model
+
+            # Make room first if the declared cost would blow the budget
+            self._enforce_budget(extra_mb=spec.memory_mb, keep=spec.name)
+
+            print(f"ModelRegistry: loading '{spec.name}'...")
+            rss_before = current_rss_mb()
+            started = time.perf_counter()
+            try:
+                model = spec.loader()
+            except Exception as e:
+                spec.error = str(e)
+                print(f"ModelRegistry: failed to load '{spec.name}': {e}")
+                raise
+            spec.load_seconds = round(time.perf_counter() - started, 3)
+
+            if self.warmup_enabled and spec.warmup is not None:
+                started = time.perf_counter()
+                try:
+                    spec.warmup(model)
+                except Exception as e:
+                    print(f"ModelRegistry: warmup of '{spec.name}' failed: {e}")
+                spec.warmup_seconds = round(time.perf_counter() - started, 3)
+
+            spec.measured_mb = round(max(0.0, current_rss_mb() - rss_before), 1)
+            spec.loaded_at = time.time()
+            spec.load_count += 1
+            spec.error = None
+            spec.model = model
+            print(f"ModelRegistry: '{spec.name}' ready in {spec.load_seconds}s (+{spec.measured_mb} MB RSS)")
+            return model
+
+    def unload(self, name):
+        spec = self._specs.get(name)
+        if spec is None or spec.model is None:
+            return False
+        # In-flight callers keep their own reference; memory is returned once they finish
+        spec.model = None
+        gc.collect()
+        print(f"ModelRegistry: evicted '{name}'")
+        return True
+
+    def _enforce_budget(self, extra_mb=0, keep=None):
+        if not self.rss_budget_mb:
+            return
+        while current_rss_mb() + extra_mb > self.rss_budget_mb:
+            candidates = [s for s in self._specs.values()
+                          if s.loaded and s.evictable and s.name != keep]
+            if not candidates:
+                return
+            victim = min(candidates, key=lambda s: s.last_used or 0)
+            self.unload(victim.name)
+            self.evictions += 1
+
+    def load_eager(self):
+        """
+        Boot-time: load and warm up every model declared eager.
+        """
+        for spec in list(self._specs.values()):
+            if spec.eager and not spec.loaded:
+                try:
+                    self.get(spec.name)
+                except Exception:
+                    pass
+        self._enforce_budget()
+
+    def status(self):
+        models = []
+        for spec in self._specs.values():
+            models.append({
+                "name": spec.name,
+                "loaded": spec.loaded,
+                "eager": spec.eager,
+                "evictable": spec.evictable,
+                "declared_mb": spec.memory_mb,
+                "measured_mb": spec.measured_mb,
+                "load_seconds": spec.load_seconds,
+                "warmup_seconds": spec.warmup_seconds,
+                "load_count": spec.load_count,
+                "use_count": spec.use_count,
+                "last_used": spec.last_used,
+                "error": spec.error
+            })
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(current_rss_mb(), 1),
+            "rss_budget_mb": self.rss_budget_mb,
+            "idle_ttl_s": self.idle_ttl_s,
+            "evictions": self.evictions,
+            "models": models
+        }
+
+
+def _env_list(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def build_registry(cfg):
+    return ModelRegistry(rss_budget_mb=cfg.MODEL_RSS_BUDGET_MB,
+                         eager_models=_env_list(cfg.MODEL_EAGER_LOAD),
+                         warmup=cfg.MODEL_WARMUP,
+                         idle_ttl_s=cfg.MODEL_IDLE_TTL_S,
+                         check_interval_s=cfg.MODEL_REAP_INTERVAL_S)
+
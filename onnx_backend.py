@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+
+from classification.zero_shot import BatchedZeroShot, PairEncoder, entailment_index
+
+# Written by export_onnx_models.py; one entry per exported model
+MANIFEST_NAME = "manifest.json"
+
+
+def load_manifest(onnx_dir):
+    path = os.path.join(onnx_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"ONNX manifest unreadable ({e}).")
+        return {}
+
+
+def resolve_model(onnx_dir, name, quantized=True):
+    """
+    Returns the .onnx path to serve for `name`, or None if it was never
+    exported or did not pass the fp32 parity check at export time.
+    """
+    entry = load_manifest(onnx_dir).get(name)
+    if not entry:
+        return None
+
+    variant = "int8" if quantized else "fp32"
+    info = entry.get(variant)
+    if not info or not info.get("parity_ok"):
+        print(f"ONNX: '{name}' ({variant}) not accepted by parity check, using PyTorch.")
+        return None
+
+    path = os.path.join(onnx_dir, name, info["file"])
+    return path if os.path.exists(path) else None
+
+
+def _softmax(x, axis=-1):
+    x = x - np.max(x, axis=axis, keepdims=True)
+    e = np.exp(x)
+    return e / np.sum(e, axis=axis, keepdims=True)
+
+
+class _OnnxModel:
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = int(num_threads)
+
+        self.session = ort.InferenceSession(model_path, sess_options=opts,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # Tokenizer and config.json are saved next to the .onnx files
+        self.model_dir = os.path.dirname(model_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+    def _run(self, encoded):
+        feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        return self.session.run(None, feeds)[0]
+
+
+class OnnxTextEncoder(_OnnxModel):
+    """
+    ONNX replacement for BertModel: returns CLS embeddings, shape (n, hidden).
+    """
+    def encode(self, texts, max_length=128):
+        encoded = self.tokenizer(list(texts), return_tensors="np", padding=True,
+                                 truncation=True, max_length=max_length)
+        last_hidden_state = self._run(encoded)
+        return last_hidden_state[:, 0, :]
+
+
+class OnnxTextClassifier(_OnnxModel):
+    """
+    ONNX replacement for the custom_bert text-classification pipeline.
+    Call signature and output match pipeline(..., return_all_scores=True).
+    """
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path, num_threads)
+        with open(os.path.join(self.model_dir, "config.json")) as f:
+            id2label = json.load(f).get("id2label", {})
+        self.id2label = {int(k): v for k, v in id2label.items()}
+
+    def __call__(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        encoded = self.tokenizer(list(texts), return_tensors="np", padding=True,
+                                 truncation=True, max_length=512)
+        probs = _softmax(self._run(encoded))
+        return [[{"label": self.id2label.get(i, str(i)), "score": float(p)} for i, p in enumerate(row)]
+                for row in probs]
+
+
+class OnnxZeroShotClassifier(_OnnxModel, BatchedZeroShot):
+    """
+    ONNX replacement for the bart-large-mnli zero-shot pipeline
+    (single-label mode: softmax over the entailment logits of each label).
+    Accepts one text or a list; see BatchedZeroShot for the batching.
+    """
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path, num_threads)
+        with open(os.path.join(self.model_dir, "config.json")) as f:
+            self.entailment_id = entailment_index(json.load(f).get("label2id"))
+        self.encoder = PairEncoder(self.tokenizer)
+
+    def _logits(self, encoded):
+        return self._run(encoded)
@@ -1,5 +1,6 @@
 import random
-import re
+
+from keyword_scanner import SCANNER
 
 class CBTEngine:
     def __init__(self):
@@ -92,14 +93,14 @@ class CBTEngine:
             }
         }
         
-        # 2. Keyword Triggers for specific topics
+        # 2. Keyword Triggers for specific topics (keyword lists live in keyword_scanner.LEXICONS)
         self.topics = {
-            r"\b(exam|test|study|grade|fail)\b": "It sounds like academic pressure is weighing on you. Remember, a grade does not define your worth.",
-            r"\b(job|work|boss|career)\b": "Work stress can be all-consuming. Are you able to set any boundaries today?",
-            r"\b(lonely|alone|isolated)\b": "Loneliness is a universal human feeling, but it hurts deeply. Connection starts with small steps.",
-            r"\b(sleep|tired|insomnia)\b": "Rest is foundational to mental health. Have you been sleeping okay lately?",
-            r"\b(breakup|ex|relationship|sad)\b": "Heartbreak is a unique kind of grief. Be gentle with yourself.",
-            r"\b(die|kill|suicide|end it)\b": "RISK_TRIGGER"
+            "topic:academic": "It sounds like academic pressure is weighing on you. Remember, a grade does not define your worth.",
+            "topic:work": "Work stress can be all-consuming. Are you able to set any boundaries today?",
+            "topic:loneliness": "Loneliness is a universal human feeling, but it hurts deeply. Connection starts with small steps.",
+            "topic:sleep": "Rest is foundational to mental health. Have you been sleeping okay lately?",
+            "topic:relationship": "Heartbreak is a unique kind of grief. Be gentle with yourself.",
+            "topic:risk": "RISK_TRIGGER"
         }
 
     def get_cbt_response(self, state, risk_level, conversation_history=None, user_input=None):
@@ -112,9 +113,9 @@ class CBTEngine:
              
         # 2. Topic/Keyword Reflection (Simulated Empathy)
         if user_input:
-            user_input_lower = user_input.lower()
-            for pattern, topic_response in self.topics.items():
-                if re.search(pattern, user_input_lower):
+            matched = SCANNER.categories(user_input)
+            for topic, topic_response in self.topics.items():
+                if topic in matched:
                     if topic_response == "RISK_TRIGGER":
                         return random.choice(self.templates["High_Risk"]["Coping"])
                     return f"{topic_response} {random.choice(self.templates.get(state, self.templates['Normal'])['Questioning'])}"
@@ -1,17 +1,17 @@
+from keyword_scanner import LEXICONS, SCANNER
+
+
 class SafetyGuard:
     def __init__(self):
-        self.prohibited_words = ["die", "kill", "suicide", "hurt myself"]
-        
+        self.prohibited_words = LEXICONS["safety"]
+
     def is_safe(self, text):
         """
          Checks if the text contains prohibited content using whole-word matching.
         """
-        import re
-        text = text.lower()
-        for word in self.prohibited_words:
-            # Use regex to match whole words only (e.g., 'die' but not 'studies')
-            if re.search(r'\b' + re.escape(word) + r'\b', text):
-                return False, "Unsafe content detected."
+        # Whole words only (e.g., 'die' but not 'studies'), via the shared one-pass scanner
+        if "safety" in SCANNER.categories(text):
+            return False, "Unsafe content detected."
         return True, ""
 
     def sanitize_output(self, text):
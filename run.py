@@ -20,6 +20,10 @@ def create_app():
     # Ensure upload directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # Shared pipeline singletons (one copy of each model per process)
+    from services import init_services
+    services = init_services(app, config)
+    
     # Register Blueprints (Imports inside to avoid circular deps)
     from api.routes import api_bp
     from api.auth import auth_bp
@@ -31,6 +35,9 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(multimodal_bp, url_prefix='/api')
+
+    # Load + warm up the models declared eager (MODEL_EAGER_LOAD); the rest load on first use
+    services.warmup()
     
     # Main UI Route
     from flask import render_template
@@ -42,6 +49,14 @@ def create_app():
     def admin():
         return render_template('admin.html')
 
+    @app.route('/ready')
+    def ready():
+        # Readiness probe: 200 only once the eager models are loaded and warmed up
+        from flask import jsonify
+        from model_registry import current_rss_mb
+        status = {"ready": services.ready, "pid": os.getpid(), "rss_mb": round(current_rss_mb(), 1)}
+        return jsonify(status), (200 if services.ready else 503)
+
 
         
     return app
@@ -0,0 +1,214 @@
+import atexit
+import concurrent.futures
+
+from flask import current_app
+
+from model_registry import build_registry, current_rss_mb
+from write_behind import WriteBehindQueue
+
+
+class ServiceContainer:
+    """
+    One instance per process, built in run.create_app and shared by every
+    blueprint (app.extensions['services']). Holds the pipeline singletons and
+    declares the heavy models in the registry, so each model exists once.
+    """
+    def __init__(self, cfg):
+        # Imported here so importing this module stays cheap
+        from input_preprocessing.text_clean import TextPreprocessor
+        from input_preprocessing.sync_controller import SyncController
+        from input_preprocessing.video_preprocess import VideoPreprocessor
+        from input_preprocessing.audio_processor import AudioProcessor
+        from input_preprocessing.streaming_asr import StreamingStats
+        from feature_extraction.text_features import TextFeatureExtractor
+        from feature_extraction.embedding_batcher import EmbeddingBatcher
+        from feature_extraction.embedding_cache import EmbeddingCache
+        from feature_extraction.shared_encoder import SharedEncoder
+        from classification.risk_assessor import RiskAssessor
+        from response_generation.cbt_engine import CBTEngine
+        from response_generation.safety_guard import SafetyGuard
+        from response_generation.summarizer import HeuristicSummarizer
+        from contextual_memory.chroma_manager import ContextualMemory
+        from contextual_memory.retrieval_cache import RetrievalCache
+        from contextual_memory.lifecycle import MemoryLifecycle
+
+        self.config = cfg
+        self.registry = build_registry(cfg)
+        self.ready = False  # Flipped by warmup(); served by /ready
+
+        # Lightweight helpers
+        self.text_cleaner = TextPreprocessor()
+        self.risk_assessor = RiskAssessor()
+        self.cbt_engine = CBTEngine()
+        self.safety_guard = SafetyGuard()
+        self.summarizer = HeuristicSummarizer()
+        self.sync_ctrl = SyncController(max_workers=cfg.SYNC_VIDEO_WORKERS, timeout=cfg.SYNC_VIDEO_TIMEOUT)
+        # Bounded pool for the concurrent stages of /api/chat
+        self.stage_pool = concurrent.futures.ThreadPoolExecutor(max_workers=cfg.CHAT_STAGE_WORKERS,
+                                                                thread_name_prefix="chat-stage")
+        self.video_prep = VideoPreprocessor()
+
+        # Text encoding: cache -> micro-batcher -> shared encoder
+        self.embedding_cache = EmbeddingCache(
+            TextFeatureExtractor.expected_model_id(cfg.BERT_MODEL_NAME, cfg.INFERENCE_BACKEND,
+                                                   cfg.ONNX_MODEL_DIR, cfg.ONNX_QUANTIZED),
+            max_items=cfg.EMBED_CACHE_MAX_ITEMS,
+            disk_path=cfg.EMBED_CACHE_DIR,
+            disk_max_items=cfg.EMBED_CACHE_DISK_MAX_ITEMS)
+        atexit.register(self.embedding_cache.flush)
+
+        self.registry.register("bert_encoder", self._load_feature_extractor, memory_mb=450,
+                               warmup=lambda m: m.get_embeddings(["warmup"]))
+        self.registry.register("text_classifier", self._load_classifier, memory_mb=300,
+                               warmup=self._warmup_classifier)
+
+        # Concurrent callers share padded BERT forwards instead of running batch-size-1
+        self.embedding_batcher = EmbeddingBatcher(lambda: self.registry.get("bert_encoder"),
+                                                  max_batch_size=cfg.EMBED_BATCH_MAX_SIZE,
+                                                  max_wait_ms=cfg.EMBED_BATCH_MAX_WAIT_MS,
+                                                  cache=self.embedding_cache)
+        # One encoder for the whole turn: RF features and Chroma memory share the same vector
+        self.shared_encoder = SharedEncoder(self.embedding_batcher)
+        retrieval_cache = None
+        if cfg.RETRIEVAL_CACHE_ENABLED:
+            retrieval_cache = RetrievalCache(max_users=cfg.RETRIEVAL_CACHE_MAX_USERS,
+                                             queries_per_user=cfg.RETRIEVAL_CACHE_QUERIES_PER_USER,
+                                             ttl_seconds=cfg.RETRIEVAL_CACHE_TTL,
+                                             match_threshold=cfg.RETRIEVAL_CACHE_MATCH)
+        self.memory = ContextualMemory(cfg.CHROMA_DB_PATH, encoder=self.shared_encoder,
+                                       backend=cfg.MEMORY_BACKEND,
+                                       vector_dtype=cfg.MEMORY_VECTOR_DTYPE,
+                                       rerank_dtype=cfg.MEMORY_RERANK_DTYPE,
+                                       rerank_factor=cfg.MEMORY_RERANK_FACTOR,
+                                       segment_rows=cfg.MEMORY_MMAP_SEGMENT_ROWS,
+                                       num_shards=cfg.MEMORY_SHARDS,
+                                       retrieval_cache=retrieval_cache)
+        # Expiry / consolidation / per-user cap; runs in a background thread of whichever worker gets the lock
+        self.memory_lifecycle = MemoryLifecycle(self.memory, self.summarizer, cfg.CHROMA_DB_PATH,
+                                                ttl_days=cfg.MEMORY_TTL_DAYS,
+                                                consolidate_after_days=cfg.MEMORY_CONSOLIDATE_AFTER_DAYS,
+                                                group_size=cfg.MEMORY_CONSOLIDATE_GROUP,
+                                                max_per_user=cfg.MEMORY_MAX_PER_USER,
+                                                interval_seconds=cfg.MEMORY_LIFECYCLE_INTERVAL)
+        self.memory.access_tracker = self.memory_lifecycle
+        atexit.register(self.memory_lifecycle.close)
+        # Chat turns are journaled and group-committed off the request path
+        self.write_behind = WriteBehindQueue(cfg.WRITE_BEHIND_DIR, memory=self.memory,
+                                             batch_size=cfg.WRITE_BEHIND_BATCH_SIZE,
+                                             max_wait_ms=cfg.WRITE_BEHIND_MAX_WAIT_MS,
+                                             fsync=cfg.WRITE_BEHIND_FSYNC,
+                                             read_timeout=cfg.WRITE_BEHIND_READ_TIMEOUT,
+                                             compact_bytes=cfg.WRITE_BEHIND_COMPACT_BYTES,
+                                             enabled=cfg.WRITE_BEHIND_ENABLED)
+        atexit.register(self.write_behind.close)
+
+        # Audio (Whisper weights are declared in the registry by the processor)
+        self.audio_prep = AudioProcessor(model_size=cfg.ASR_MODEL, registry=self.registry,
+                                         backend=cfg.ASR_BACKEND, compute_type=cfg.ASR_COMPUTE_TYPE,
+                                         beam_size=cfg.ASR_BEAM_SIZE, cpu_threads=cfg.ASR_CPU_THREADS,
+                                         language=cfg.ASR_LANGUAGE, vad=self._build_vad(),
+                                         replicas=cfg.ASR_REPLICAS, max_queue=cfg.ASR_MAX_QUEUE,
+                                         timeout=cfg.ASR_TIMEOUT)
+        self._register_audio_model()
+        self.streaming_stats = StreamingStats()
+
+    def _build_vad(self):
+        if not self.config.VAD_ENABLED:
+            return None
+        from input_preprocessing.vad import EnergyVAD
+        return EnergyVAD(floor_db=self.config.VAD_FLOOR_DB, margin_db=self.config.VAD_MARGIN_DB,
+                         min_silence_ms=self.config.VAD_MIN_SILENCE_MS, pad_ms=self.config.VAD_PAD_MS)
+
+    def _load_feature_extractor(self):
+        from feature_extraction.text_features import TextFeatureExtractor
+        extractor = TextFeatureExtractor(backend=self.config.INFERENCE_BACKEND,
+                                         onnx_dir=self.config.ONNX_MODEL_DIR,
+                                         quantized=self.config.ONNX_QUANTIZED) # This loads BERT, might take a sec
+        extractor.cache = self.embedding_cache
+        return extractor
+
+    def _load_classifier(self):
+        from classification.hybrid_classifier import HybridClassifier
+        return HybridClassifier(prediction_cache_size=self.config.PREDICTION_CACHE_MAX_ITEMS,
+                                backend=self.config.INFERENCE_BACKEND,
+                                onnx_dir=self.config.ONNX_MODEL_DIR,
+                                quantized=self.config.ONNX_QUANTIZED,
+                                registry=self.registry,
+                                rf_backend=self.config.RF_BACKEND,
+                                cascade=self.config.CLASSIFIER_CASCADE)
+
+    @staticmethod
+    def _warmup_classifier(clf):
+        # Only touch the always-on branches; zero-shot is loaded separately on demand
+        if clf.custom_bert_pipeline:
+            clf.custom_bert_pipeline("warmup")
+
+    def _register_audio_model(self):
+        import os
+        import joblib
+        import numpy as np
+
+        model_path = os.path.join("models", "rf_audio.pkl")
+
+        def load():
+            model = joblib.load(model_path)
+            if self.config.RF_BACKEND == 'compiled':
+                from classification.forest_compiler import compile_forest
+                model = compile_forest(model)
+            return model
+
+        if os.path.exists(model_path):
+            self.registry.register("audio_rf", load, memory_mb=50,
+                                   warmup=lambda m: m.predict_proba(np.zeros((1, 15))))
+
+    @property
+    def classifier(self):
+        return self.registry.get("text_classifier")
+
+    def warmup(self):
+        """
+        Load + warm up the models declared eager (MODEL_EAGER_LOAD).
+        """
+        rss_before = current_rss_mb()
+        self.registry.load_eager()
+        self.ready = True
+        print(f"Services ready: RSS {current_rss_mb():.0f} MB (models +{current_rss_mb() - rss_before:.0f} MB)")
+
+    def post_fork(self, app, torch_threads):
+        """
+        Per-worker fixups after a pre-forking server (gunicorn --preload) forked
+        us from the master that already loaded and warmed up the models.
+        """
+        set_torch_threads(torch_threads)
+
+        # Never share DB / SQLite handles across fork
+        with app.app_context():
+            from database import db
+            db.engine.dispose()
+        self.memory.reopen()
+        self.embedding_cache.freeze_disk()
+        self.memory_lifecycle.start()
+
+
+def set_torch_threads(n):
+    try:
+        import torch
+        torch.set_num_threads(max(1, int(n)))
+    except ImportError:
+        pass
+
+
+def init_services(app, cfg):
+    services = ServiceContainer(cfg)
+    app.extensions['services'] = services
+    # Replays journals left by a crashed process before we serve anything
+    services.write_behind.init_app(app)
+    # Not started here: with gunicorn --preload this runs in the master, and a
+    # thread alive at fork() can leave its locks held in every worker. Workers
+    # start it in post_fork; the dev server on its first request.
+    app.before_request(services.memory_lifecycle.start)
+    return services
+
+
+def get_services():
+    return current_app.extensions['services']
@@ -0,0 +1,98 @@
+import concurrent.futures
+import time
+
+
+class _Stage:
+    def __init__(self, name, fn, deps, timeout, fallback):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+class StageGraph:
+    """
+    Tiny dependency-graph runner for request handlers.
+
+    Each stage is fn(results) -> value, where `results` holds the values of
+    the stages it depends on. Independent stages run concurrently on a shared
+    bounded executor. A stage that raises or exceeds its timeout resolves to
+    its fallback (a value, or a callable taking the exception), so one slow
+    dependency can't stall the whole request.
+    """
+    def __init__(self, executor, wrap=None):
+        self.executor = executor
+        # Optional decorator applied to every stage fn (e.g. to push an app context)
+        self.wrap = wrap
+        self._stages = {}
+        self.report = {}
+        # name -> future of a stage that timed out but may still be running
+        self.timed_out = {}
+
+    def add(self, name, fn, deps=(), timeout=None, fallback=None):
+        for d in deps:
+            if d not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{d}'")
+        self._stages[name] = _Stage(name, fn, deps, timeout, fallback)
+        return self
+
+    def _resolve_fallback(self, stage, error):
+        if callable(stage.fallback):
+            return stage.fallback(error)
+        return stage.fallback
+
+    def run(self):
+        results = {}
+        pending = dict(self._stages)
+        running = {}  # future -> (stage, started, deadline)
+        started_all = time.perf_counter()
+
+        def submit_ready():
+            for name in list(pending):
+                stage = pending[name]
+                if all(d in results for d in stage.deps):
+                    del pending[name]
+                    inputs = {d: results[d] for d in stage.deps}
+                    fn = self.wrap(stage.fn) if self.wrap else stage.fn
+                    started = time.perf_counter()
+                    deadline = started + stage.timeout if stage.timeout else None
+                    running[self.executor.submit(fn, inputs)] = (stage, started, deadline)
+
+        def finish(stage, started, status, value):
+            results[stage.name] = value
+            self.report[stage.name] = {
+                "status": status,
+                "ms": round((time.perf_counter() - started) * 1000.0, 2)
+            }
+
+        submit_ready()
+        while running:
+            now = time.perf_counter()
+            deadlines = [d for (_, _, d) in running.values() if d is not None]
+            wait_for = max(0.0, min(deadlines) - now) if deadlines else None
+            done, _ = concurrent.futures.wait(list(running), timeout=wait_for,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                stage, started, _ = running.pop(future)
+                try:
+                    finish(stage, started, "ok", future.result())
+                except Exception as e:
+                    print(f"[StageGraph] stage '{stage.name}' failed: {e}")
+                    finish(stage, started, "error", self._resolve_fallback(stage, e))
+
+            now = time.perf_counter()
+            for future in [f for f, (_, _, d) in running.items() if d is not None and now >= d]:
+                stage, started, _ = running.pop(future)
+                # The thread keeps running in the background; its result is ignored
+                # (callers that can't redo the work safely can still wait on self.timed_out)
+                if not future.cancel():
+                    self.timed_out[stage.name] = future
+                print(f"[StageGraph] stage '{stage.name}' timed out after {stage.timeout}s")
+                finish(stage, started, "timeout", self._resolve_fallback(stage, TimeoutError(stage.name)))
+
+            submit_ready()
+
+        self.report["_total"] = {"ms": round((time.perf_counter() - started_all) * 1000.0, 2)}
+        return results
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process consumer lock (single dev process)
+    fcntl = None
+
+# Streams nobody finished (client went away) are swept after this long
+STALE_SECONDS = 600
+
+
+class StreamSpool:
+    """
+    On-disk hand-off for one streaming upload, shared by all workers.
+
+    Chunk POSTs and the event stream of a turn can land on different
+    gunicorn workers, so the upload isn't kept in process memory: each
+    chunk is appended (O_APPEND, one write) to <dir>/<id>/audio.bin, the
+    per-frame video emotions to frames.jsonl, and the last chunk leaves a
+    `final` marker. The one consumer (the SSE response, holding an flock
+    on consumer.lock) reads what is new since its last poll and removes
+    the directory when the turn is done.
+    """
+    def __init__(self, root, stream_id):
+        if not stream_id or not all(c in "0123456789abcdef" for c in stream_id):
+            raise ValueError("Invalid stream id")
+        self.root = root
+        self.stream_id = stream_id
+        self.path = os.path.join(root, stream_id)
+        self._offset = 0
+        self._lock_file = None
+
+    @classmethod
+    def create(cls, root, **meta):
+        os.makedirs(root, exist_ok=True)
+        cls.sweep(root)
+        spool = cls(root, uuid.uuid4().hex)
+        os.makedirs(spool.path)
+        with open(os.path.join(spool.path, "meta.json"), "w") as f:
+            json.dump(dict(meta, created=time.time()), f)
+        return spool
+
+    @staticmethod
+    def sweep(root, max_age=STALE_SECONDS):
+        now = time.time()
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.isdir(path) and now - os.path.getmtime(path) > max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def meta(self):
+        with open(os.path.join(self.path, "meta.json")) as f:
+            return json.load(f)
+
+    def _append(self, name, data):
+        fd = os.open(os.path.join(self.path, name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def write_audio(self, data):
+        if data:
+            self._append("audio.bin", data)
+
+    def write_frames(self, emotions):
+        if emotions:
+            self._append("frames.jsonl", "".join(json.dumps(e) + "\n" for e in emotions).encode("utf-8"))
+
+    def mark_final(self):
+        self._append("final", b"")
+
+    @property
+    def finished(self):
+        return os.path.exists(os.path.join(self.path, "final"))
+
+    def acquire(self):
+        """
+        Become the stream's only consumer; False if another one is attached.
+        """
+        self._lock_file = open(os.path.join(self.path, "consumer.lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                self._lock_file = None
+                return False
+        return True
+
+    def read_audio(self, everything=False):
+        """
+        Audio bytes appended since the last call (or all of them).
+        """
+        path = os.path.join(self.path, "audio.bin")
+        if not os.path.exists(path):
+            return b""
+        with open(path, "rb") as f:
+            if not everything:
+                f.seek(self._offset)
+            data = f.read()
+        self._offset = (0 if everything else self._offset) + len(data)
+        return data
+
+    def audio_size(self):
+        path = os.path.join(self.path, "audio.bin")
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def has_new_audio(self):
+        path = os.path.join(self.path, "audio.bin")
+        return os.path.exists(path) and os.path.getsize(path) > self._offset
+
+    def frame_emotions(self):
+        path = os.path.join(self.path, "frames.jsonl")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def remove(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from contextual_memory.chroma_manager import ContextualMemory
+from contextual_memory.retrieval_cache import RetrievalCache
+from feature_extraction.lazy_features import LazyFeatures
+
+DIM = 8
+
+
+class Encoder:
+    dim = DIM
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_many(self, texts):
+        self.calls += 1
+        return np.ones((len(texts), DIM), dtype=np.float32)
+
+
+def lazy_query(encoder):
+    return LazyFeatures(embedding=lambda: encoder.embed_many(["q"])[0])
+
+
+def test_lazy_query_embedding_only_resolved_when_searching(tmp_path):
+    encoder = Encoder()
+    memory = ContextualMemory(str(tmp_path), encoder=encoder, backend="mmap")
+
+    features = lazy_query(encoder)
+    assert memory.retrieve_context("1", "hello", query_embedding=features) == []
+    assert not features.is_materialized("embedding")
+    assert encoder.calls == 0
+
+    memory.add_memory("1", "earlier turn", {"state": "Normal"})  # Encoded in the batch
+    assert encoder.calls == 1
+    features = lazy_query(encoder)
+    hits = memory.retrieve_context("1", "hello", query_embedding=features)
+    assert [h["text"] for h in hits] == ["earlier turn"]
+    assert features.is_materialized("embedding")
+
+
+def test_retrieval_cache_sees_other_workers_writes(tmp_path):
+    # Two workers sharing one mmap store, each with its own retrieval cache
+    encoder = Encoder()
+    a = ContextualMemory(str(tmp_path), encoder=encoder, backend="mmap", retrieval_cache=RetrievalCache())
+    b = ContextualMemory(str(tmp_path), encoder=encoder, backend="mmap", retrieval_cache=RetrievalCache())
+    query = np.ones(DIM, dtype=np.float32)
+
+    a.add_memory("1", "first", embedding=query)
+    assert [h["text"] for h in a.retrieve_context("1", "q", query_embedding=query)] == ["first"]
+    a.add_memory("1", "own write", embedding=query)  # Written through, entry stays valid
+    assert len(a.retrieve_context("1", "q", query_embedding=query)) == 2
+    assert a.retrieval_cache.hits == 1
+
+    b.add_memory("1", "other worker", embedding=query)
+    texts = [h["text"] for h in a.retrieve_context("1", "q", query_embedding=query)]
+    assert "other worker" in texts
+    assert a.retrieval_cache.stale == 1
+
+    b.delete_memories("1", [a.retrieve_context("1", "q", query_embedding=query, n_results=1)[0]["id"]])
+    assert len(a.retrieve_context("1", "q", query_embedding=query)) == 2
@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+
+from feature_extraction.embedding_cache import _DiskTier
+
+DIM = 4
+
+
+def vec(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+
+def log_lines(path):
+    with open(os.path.join(path, "index.log")) as f:
+        return f.readlines()
+
+
+def test_reopen_replays_the_index_log(tmp_path):
+    path = str(tmp_path)
+    tier = _DiskTier(path, DIM, max_items=3)
+    for i in range(5):  # Keys 0 and 1 are evicted, their slots reused
+        tier.put(f"k{i}", vec(i))
+    tier.flush()
+
+    reopened = _DiskTier(path, DIM, max_items=3)
+    assert list(reopened._index) == ["k2", "k3", "k4"]
+    for i in (2, 3, 4):
+        assert np.array_equal(reopened.get(f"k{i}"), vec(i))
+    assert reopened.get("k0") is None
+    assert len(log_lines(path)) == 1 + 3  # Compacted on open
+
+
+def test_unflushed_puts_are_not_in_the_log(tmp_path):
+    path = str(tmp_path)
+    tier = _DiskTier(path, DIM, max_items=8)
+    tier.put("a", vec(1))
+    tier.flush()
+    tier.put("b", vec(2))
+
+    reopened = _DiskTier(path, DIM, max_items=8)
+    assert list(reopened._index) == ["a"]
+
+
+def test_log_is_appended_and_compacted(tmp_path):
+    path = str(tmp_path)
+    tier = _DiskTier(path, DIM, max_items=16)
+    for i in range(64):
+        tier.put(f"k{i}", vec(i))
+    assert len(log_lines(path)) == 1 + 64  # One batch appended, not rewritten
+    for i in range(64, 128):
+        tier.put(f"k{i}", vec(i))
+    assert len(log_lines(path)) == 1 + 16  # Past 4x the slots: compacted
+    assert np.array_equal(_DiskTier(path, DIM, max_items=16).get("k127"), vec(127))
+
+
+def test_legacy_json_index_is_migrated(tmp_path):
+    path = str(tmp_path)
+    tier = _DiskTier(path, DIM, max_items=4)
+    tier.put("old", vec(7))
+    tier.flush()
+    os.remove(os.path.join(path, "index.log"))
+    with open(os.path.join(path, "index.json"), "w") as f:
+        json.dump({"dim": DIM, "max_items": 4, "entries": [["old", tier._index["old"]]]}, f)
+
+    reopened = _DiskTier(path, DIM, max_items=4)
+    assert np.array_equal(reopened.get("old"), vec(7))
+    assert not os.path.exists(os.path.join(path, "index.json"))
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from classification.forest_compiler import CompiledForest, compile_forest, parity_probe
+
+
+def training_data(n_classes=3, nan_rate=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((400, 15)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 3] - X[:, 7] > 0).astype(int) + (X[:, 1] > 1.0).astype(int) * (n_classes - 2)
+    if nan_rate:
+        X[rng.random(X.shape) < nan_rate] = np.nan
+    return X, y
+
+
+MODELS = [
+    lambda: RandomForestClassifier(n_estimators=25, random_state=0),
+    lambda: RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0),
+    lambda: ExtraTreesClassifier(n_estimators=25, random_state=0),
+    lambda: DecisionTreeClassifier(random_state=0),
+]
+
+
+@pytest.mark.parametrize("make_model", MODELS)
+def test_matches_sklearn(make_model):
+    X, y = training_data()
+    model = make_model().fit(X, y)
+    compiled = compile_forest(model)
+    assert isinstance(compiled, CompiledForest)
+
+    rng = np.random.default_rng(1)
+    for batch in (parity_probe(model, seed=2), rng.standard_normal((64, 15)).astype(np.float32), X[:1]):
+        np.testing.assert_allclose(compiled.predict_proba(batch), model.predict_proba(batch), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(compiled.predict(batch), model.predict(batch))
+
+
+@pytest.mark.parametrize("make_model", [MODELS[0], MODELS[3]])
+def test_matches_sklearn_with_nan_inputs(make_model):
+    # Trained with missing values, so splits learn where NaNs go
+    X, y = training_data(nan_rate=0.1)
+    model = make_model().fit(X, y)
+    compiled = compile_forest(model)
+    assert isinstance(compiled, CompiledForest)
+
+    probe = parity_probe(model, seed=3)
+    probe[np.random.default_rng(4).random(probe.shape) < 0.2] = np.nan
+    np.testing.assert_allclose(compiled.predict_proba(probe), model.predict_proba(probe), rtol=0, atol=1e-12)
+
+
+def test_single_row_and_large_batches():
+    X, y = training_data()
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    compiled = compile_forest(model, max_compiled_rows=32)
+
+    np.testing.assert_allclose(compiled.predict_proba(X[0]), model.predict_proba(X[:1]), rtol=0, atol=1e-12)
+    # Above max_compiled_rows the original model answers
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_falls_back_when_parity_fails(monkeypatch):
+    X, y = training_data()
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    monkeypatch.setattr(model, "predict_proba", lambda X: np.full((len(X), 3), 1.0 / 3))
+    assert compile_forest(model) is model
+
+
+def test_multi_output_is_not_compiled():
+    X, y = training_data()
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.column_stack([y, y]))
+    assert compile_forest(model) is model
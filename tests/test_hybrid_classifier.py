@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from classification.hybrid_classifier import HybridClassifier
+
+
+class Forest:
+    classes_ = np.array(["Normal", "Stress"])
+
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.8], (len(X), 1))
+
+
+@pytest.fixture
+def classifier(tmp_path):
+    clf = HybridClassifier(model_dir=str(tmp_path), cascade="lexicon:0.3,rf")
+    clf.rf_model = Forest()
+    return clf
+
+
+def test_features_without_texts(classifier):
+    traces = [{}, {}]
+    probs = classifier.predict_batch(np.zeros((2, 4)), traces=traces)
+    assert [max(p, key=p.get) for p in probs] == ["Stress", "Stress"]
+    assert [t["branch"] for t in traces] == ["rf", "rf"]
+
+
+def test_texts_without_features(classifier):
+    traces = [{}, {}]
+    probs = classifier.predict_batch(None, ["I'm so anxious and worried", "hello"], traces=traces)
+    assert max(probs[0], key=probs[0].get) == "Anxiety"
+    assert [t["branch"] for t in traces] == ["lexicon", "default"]
+
+
+def test_needs_some_input(classifier):
+    with pytest.raises(ValueError):
+        classifier.predict_batch(None, None)
+    with pytest.raises(ValueError):
+        classifier.predict_batch(np.zeros((2, 4)), ["only one"])
@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from keyword_scanner import LEXICONS, SCANNER
+
+# Same inputs through the call sites as they were before the shared scanner
+MESSAGES = [
+    "I feel hopeless",
+    "Hopelessness is all I have left",
+    "so much sadness and darkness",
+    "It's a crusade against the dark",
+    "I've been feeling suicidal",
+    "I want to kill myself",
+    "skills from my diet course",
+    "I'm worrying about stressful deadlines",
+    "Had a good day",
+]
+
+
+def baseline_risk(text):
+    return sum(1 for w in LEXICONS["risk"] if w in text.lower())
+
+
+def baseline_unsafe(text):
+    return any(re.search(r"\b" + re.escape(w) + r"\b", text.lower()) for w in LEXICONS["safety"])
+
+
+def baseline_cue(text, label):
+    return any(w in text.lower() for w in LEXICONS[f"cue:{label}"])
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_matches_the_baseline_call_sites(text):
+    categories = SCANNER.categories(text)
+    assert len(SCANNER.phrases(text, "risk")) == baseline_risk(text)
+    assert ("safety" in categories) == baseline_unsafe(text)
+    for label in ("Sadness", "Anxiety", "Stress", "Happy"):
+        assert (f"cue:{label}" in categories) == baseline_cue(text, label)
+
+
+def test_risk_phrases_match_inflections():
+    assert SCANNER.phrases("Hopelessness, every day", "risk") == {"hopeless"}
+    assert SCANNER.phrases("sadness and darkness", "risk") == {"sad", "dark"}
+    assert SCANNER.phrases("I feel fine", "risk") == set()
+
+
+def test_whole_word_categories_stay_whole_word():
+    assert "safety" not in SCANNER.categories("skills from my diet course")
+    assert "safety" in SCANNER.categories("I want to kill myself")
+    assert "label:Sadness" not in SCANNER.categories("sadness")
+    assert "label:Sadness" in SCANNER.categories("so sad")
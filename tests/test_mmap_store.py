@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+
+from contextual_memory.mmap_store import MmapVectorStore
+
+DIM = 8
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def add(store, user, start, vecs):
+    ids = [f"{user}-{start + i}" for i in range(len(vecs))]
+    store.add_batch([user] * len(ids), ids, [f"doc {i}" for i in ids], [{"user_id": user}] * len(ids), vecs)
+    return ids
+
+
+def test_reopen_adopts_saved_segment_rows(tmp_path, capsys):
+    path = str(tmp_path / "store")
+    first = vectors(6, seed=1)
+    store = MmapVectorStore(path, DIM, segment_rows=4)
+    ids = add(store, "u1", 0, first)
+
+    reopened = MmapVectorStore(path, DIM, segment_rows=16)
+    assert reopened.segment_rows == 4
+    assert "ignoring the configured 16" in capsys.readouterr().out
+    assert sorted(i for i, _, _, _ in reopened.items("u1")) == sorted(ids)
+
+    second = vectors(6, seed=2)
+    more = add(reopened, "u1", 6, second)
+    assert reopened.count("u1") == 12
+    for id_, vector in zip(ids + more, np.concatenate([first, second])):
+        assert reopened.search("u1", vector, k=1)[0][0] == id_
+    assert MmapVectorStore(path, DIM, segment_rows=4).count("u1") == 12
+
+
+def test_store_without_saved_segment_rows(tmp_path):
+    # Stores created before segment_rows was recorded: read it off the segment files
+    path = str(tmp_path / "store")
+    ids = add(MmapVectorStore(path, DIM, segment_rows=4), "u1", 0, vectors(6))
+    state_file = os.path.join(path, "state.json")
+    with open(state_file) as f:
+        state = json.load(f)
+    del state["segment_rows"]
+    with open(state_file, "w") as f:
+        json.dump(state, f)
+
+    reopened = MmapVectorStore(path, DIM, segment_rows=16)
+    assert reopened.segment_rows == 4
+    assert sorted(i for i, _, _, _ in reopened.items("u1")) == sorted(ids)
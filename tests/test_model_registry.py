@@ -0,0 +1,37 @@
+import model_registry
+from model_registry import ModelRegistry
+
+
+def registry(**kwargs):
+    reg = ModelRegistry(warmup=False, **kwargs)
+    reg.register("zero_shot", lambda: object(), memory_mb=1, evictable=True)
+    reg.register("encoder", lambda: object(), memory_mb=1)
+    reg._reaper_pid = model_registry.os.getpid()  # Reap by hand, no thread
+    return reg
+
+
+def test_idle_evictable_model_is_reaped():
+    reg = registry(idle_ttl_s=60)
+    reg.get("zero_shot")
+    reg.get("encoder")
+    now = reg._specs["zero_shot"].last_used
+
+    assert reg.reap(now=now + 30) == []
+    assert reg.reap(now=now + 61) == ["zero_shot"]
+    assert not reg.is_loaded("zero_shot")
+    assert reg.is_loaded("encoder")  # Not evictable, however idle
+    assert reg.evictions == 1
+
+    reg.get("zero_shot")  # Reloaded on the next use
+    assert reg._specs["zero_shot"].load_count == 2
+
+
+def test_reap_enforces_budget_without_a_load(monkeypatch):
+    reg = registry(rss_budget_mb=100)
+    reg.get("zero_shot")
+    reg.get("encoder")
+    monkeypatch.setattr(model_registry, "current_rss_mb", lambda: 150.0)
+
+    assert reg.reap() == []
+    assert not reg.is_loaded("zero_shot")
+    assert reg.is_loaded("encoder")
@@ -0,0 +1,44 @@
+import numpy as np
+
+from input_preprocessing.streaming_asr import StreamingTranscriber
+from input_preprocessing.vad import EnergyVAD
+from test_vad import SR, noise, voice
+
+
+class FakeASR:
+    def __init__(self):
+        self.inputs = []
+
+    def transcribe(self, audio):
+        self.inputs.append(len(audio))
+        return f"w{len(self.inputs)}"
+
+
+def stream(transcriber, audio, step=SR // 4):
+    events = []
+    for start in range(0, len(audio), step):
+        transcriber.append(audio[start:start + step])
+        events += transcriber.update()
+    return events
+
+
+def test_continuous_speech_gets_partials_and_commits():
+    asr = FakeASR()
+    transcriber = StreamingTranscriber(asr, EnergyVAD(), window_seconds=3.0)
+    events = stream(transcriber, voice(7.0, depth=0.3))
+
+    assert any(event == "partial" and not payload["stable"] for event, payload in events)
+    # No pause in 7 s: committed one 3 s window at a time
+    assert transcriber.committed == 2 * 3 * SR
+    text, _ = transcriber.finish()
+    assert text
+
+
+def test_pause_ends_the_utterance():
+    asr = FakeASR()
+    transcriber = StreamingTranscriber(asr, EnergyVAD(), end_silence_ms=700)
+    events = stream(transcriber, np.concatenate([noise(0.5, 0.001), voice(1.5), noise(1.5, 0.001)]))
+
+    assert transcriber.ended
+    assert events[-1][0] == "end_of_speech"
+    assert events[-1][1]["text"]
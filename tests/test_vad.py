@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from input_preprocessing.vad import EnergyVAD
+
+SR = 16000
+
+
+def voice(seconds, depth=0.5, level=0.3, seed=0):
+    # Harmonic "voice" under a 4 Hz syllable envelope; depth 0 = steady tone
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SR * seconds)) / SR
+    carrier = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi)) / i
+                  for i, f in enumerate((140, 280, 420, 560), start=1))
+    envelope = 1.0 + depth * np.sin(2 * np.pi * 4 * t)
+    return (level * carrier * envelope / np.abs(carrier).max()).astype(np.float32)
+
+
+def noise(seconds, rms, seed=1):
+    return (np.random.default_rng(seed).standard_normal(int(SR * seconds)) * rms).astype(np.float32)
+
+
+def rms(x):
+    return float(np.sqrt(np.mean(x * x)))
+
+
+def test_pure_silence_skips_asr():
+    speech = EnergyVAD().detect(np.zeros(SR * 3, dtype=np.float32))
+    assert not speech.has_speech
+    assert speech.chunks == []
+
+
+def test_noise_below_floor_skips_asr():
+    speech = EnergyVAD().detect(noise(3.0, rms=10 ** (-60 / 20)))
+    assert not speech.has_speech
+
+
+def test_speech_between_pauses_is_trimmed():
+    audio = np.concatenate([noise(1.0, 0.001), voice(1.5), noise(1.0, 0.001)])
+    speech = EnergyVAD().detect(audio)
+    assert speech.has_speech
+    assert 1.5 <= speech.kept_seconds < 2.0
+
+
+@pytest.mark.parametrize("depth", [0.3, 0.6])
+def test_continuous_speech_is_kept(depth):
+    # No pause at all: the 10th percentile level is speech, not background
+    audio = voice(7.0, depth=depth)
+    speech = EnergyVAD().detect(audio)
+    assert speech.has_speech
+    assert speech.kept_seconds >= 6.5
+    assert sum(len(c) for c in speech.chunks) >= 6.5 * SR
+
+
+@pytest.mark.parametrize("snr_db, depth", [(11, 0.0), (9, 0.3)])
+def test_noisy_speech_is_kept(snr_db, depth):
+    # 1.5 s of speech less than margin_db over steady background noise
+    background = noise(4.0, rms=0.02)
+    burst = voice(1.5, depth=depth)
+    burst *= 0.02 * 10 ** (snr_db / 20) / rms(burst)
+    audio = background.copy()
+    audio[SR:SR + len(burst)] += burst
+    speech = EnergyVAD().detect(audio)
+    assert speech.has_speech
+    start, end = speech.segments[0][0], speech.segments[-1][1]
+    assert start <= SR and end >= SR + len(burst)
@@ -0,0 +1,117 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from database import Assessment, ChatMessage, db
+from write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + str(tmp_path / "t.db")
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def turn(text):
+    return dict(messages=[dict(session_id=1, sender="user", content_text=text)],
+                assessments=[dict(user_id=1, predicted_state="Normal", risk_level="Low", confidence_score=0.1)])
+
+
+def journal_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def dead_journal(journal_dir, seq=1):
+    # A turn of a process that died after committing it but before acknowledging it
+    entry = {"user_id": "1", "seq": seq, "journal": "4242-deadbeef0000", "submitted_at": 0,
+             "messages": [dict(session_id=1, sender="user", content_text="hello",
+                               timestamp="2026-01-01T00:00:00")],
+             "assessments": [dict(user_id=1, predicted_state="Normal", risk_level="Low",
+                                  timestamp="2026-01-01T00:00:00")],
+             "memories": []}
+    with open(os.path.join(journal_dir, "journal-4242-deadbeef0000.jsonl"), "w") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def test_replay_does_not_duplicate_rows(app, tmp_path):
+    journal_dir = str(tmp_path / "wb")
+    os.makedirs(journal_dir)
+    queue = WriteBehindQueue(journal_dir)
+    dead_journal(journal_dir)
+    queue.init_app(app)
+    # Same turn again: committed, then the process crashed before the ack
+    dead_journal(journal_dir)
+    queue.recover()
+
+    with app.app_context():
+        assert ChatMessage.query.count() == 1
+        assert Assessment.query.count() == 1
+    assert os.listdir(journal_dir) == []
+
+
+def test_journal_keeps_only_unapplied_turns(app, tmp_path):
+    queue = WriteBehindQueue(str(tmp_path / "wb"), batch_size=1, max_wait_ms=0, fsync=False, compact_bytes=1)
+    queue.init_app(app)
+    apply, gate = queue._apply, threading.Event()
+
+    def gated_apply(batch):
+        if batch[0]["seq"] >= 3:
+            gate.wait(5)
+        apply(batch)
+
+    queue._apply = gated_apply
+    for i in range(5):
+        queue.submit(1, **turn(f"t{i}"))
+    deadline = time.monotonic() + 5
+    while queue._applied_seq < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [e["seq"] for e in journal_lines(queue.journal_path)] == [3, 4, 5]
+    gate.set()
+    assert queue.wait_for_user(1, timeout=5)
+    assert os.path.getsize(queue.journal_path) == 0
+    with app.app_context():
+        assert ChatMessage.query.count() == 5
+
+
+def test_foreign_journal_is_read_incrementally(app, tmp_path):
+    journal_dir = str(tmp_path / "wb")
+    queue = WriteBehindQueue(journal_dir, read_timeout=0.05)
+    queue.init_app(app)
+    path = os.path.join(journal_dir, "journal-999999-abcdef000000.jsonl")
+    with open(path, "w") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)  # Its owner is alive
+        other.write(json.dumps({"user_id": "7", "seq": 1}) + "\n")
+        other.flush()
+        assert queue._foreign_pending("7")
+        assert not queue._foreign_pending("8")
+        read = queue._foreign[path][1]
+
+        other.write(json.dumps({"applied": 1}) + "\n")
+        other.write(json.dumps({"user_id": "8", "seq": 2}))  # Torn: no newline yet
+        other.flush()
+        assert not queue._foreign_pending("7")
+        assert not queue._foreign_pending("8")
+        assert queue._foreign[path][1] > read
+
+        other.write("\n")
+        other.flush()
+        assert queue._foreign_pending("8")
+        assert not queue.wait_for_user("8")
+
+    # Rotated by its owner: a new file under the same name is read from the start
+    with open(path + ".new", "w") as f:
+        f.write(json.dumps({"user_id": "9", "seq": 3}) + "\n")
+    os.rename(path + ".new", path)
+    assert queue._foreign_pending("9")
+    assert not queue._foreign_pending("8")
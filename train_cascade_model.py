@@ -0,0 +1,66 @@
+import os
+
+import joblib
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+
+from classification.cascade import LINEAR_MODEL_NAME
+
+# Configuration
+DATASET_PATH = "dataset.csv"
+MODEL_DIR = "models"
+MODEL_PATH = os.path.join(MODEL_DIR, LINEAR_MODEL_NAME)
+HASH_FEATURES = 2 ** 18
+
+
+def load_dataset():
+    df = pd.read_csv(DATASET_PATH)
+    # Normalize column names (same conventions as train_text_model.py)
+    df.columns = [c.lower() for c in df.columns]
+    if 'content' in df.columns: df.rename(columns={'content': 'text'}, inplace=True)
+    if 'label' in df.columns: df.rename(columns={'label': 'emotion'}, inplace=True)
+    if 'sentiment' in df.columns: df.rename(columns={'sentiment': 'emotion'}, inplace=True)
+    if 'text' not in df.columns or 'emotion' not in df.columns:
+        raise ValueError("Dataset must have 'text' and 'emotion' columns.")
+    df = df.dropna(subset=['text', 'emotion'])
+    return df['text'].astype(str).tolist(), df['emotion'].astype(str).tolist()
+
+
+def train_cascade_model():
+    """
+    First stage of the classifier cascade: a logistic-regression model over
+    hashed word unigrams + bigrams. No vocabulary to store and no BERT
+    forward, so it scores a message in well under a millisecond.
+    """
+    print("--- Cascade Linear Model Training Script ---")
+    if not os.path.exists(DATASET_PATH):
+        print(f"Error: Dataset not found at '{DATASET_PATH}'.")
+        return
+
+    texts, labels = load_dataset()
+    print(f"Loaded {len(texts)} samples.")
+    X_train, X_test, y_train, y_test = train_test_split(texts, labels, test_size=0.2, random_state=42)
+
+    model = make_pipeline(
+        HashingVectorizer(n_features=HASH_FEATURES, ngram_range=(1, 2), alternate_sign=False,
+                          lowercase=True, norm='l2'),
+        SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=50, tol=1e-4, random_state=42)
+    )
+    print("Training...")
+    model.fit(X_train, y_train)
+
+    y_pred = model.predict(X_test)
+    print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print(classification_report(y_test, y_pred))
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(model, MODEL_PATH)
+    print(f"Saved to {MODEL_PATH}. Tune its exit threshold with `python evaluate_models.py --cascade`.")
+
+
+if __name__ == "__main__":
+    train_cascade_model()
@@ -0,0 +1,539 @@
+import base64
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from metrics import Histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process journal locking (single dev process)
+    fcntl = None
+
+
+def _encode_vector(vector):
+    if vector is None:
+        return None
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(data):
+    if data is None:
+        return None
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists but belongs to someone else
+    return True
+
+
+class WriteBehindQueue:
+    """
+    Durable write-behind queue for the per-turn writes of the chat endpoints
+    (ChatMessage / Assessment rows and the Chroma memory snippet).
+
+    submit() appends the turn to a local append-only journal (one file per
+    process start, journal-<pid>-<boot id>.jsonl, so a restarted process
+    that gets the same PID never reopens a dead one's journal) and returns
+    immediately; a background thread group-commits many
+    turns in one SQL transaction and sends their memories to Chroma in one
+    batch call. Applied turns are acknowledged with an {"applied": seq} line.
+    The journal is replaced by an empty one whenever it is fully drained,
+    and by just its unapplied turns once it grows past compact_bytes, so it
+    stays small under steady traffic. Journals left behind by a dead
+    process are replayed on the next start; every row and memory carries a
+    deterministic id from the journal, so a turn committed just before a
+    crash is skipped on replay rather than written twice.
+
+    Turns are applied in submission order. Readers call wait_for_user() to
+    get read-your-writes: it blocks until every turn submitted for that user
+    (in this process, or in another worker's journal) is committed.
+    """
+    def __init__(self, journal_dir, memory=None, batch_size=64, max_wait_ms=50,
+                 fsync=True, read_timeout=2.0, enabled=True, compact_bytes=1 << 20):
+        self.journal_dir = journal_dir
+        self.memory = memory
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.fsync = fsync
+        self.read_timeout = read_timeout
+        self.enabled = enabled
+        self.compact_bytes = max(0, int(compact_bytes))
+        self.app = None
+
+        self._pid = None
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._reset_process_state()
+
+        self.failed = 0
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.commit_time_hist = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0])  # seconds
+        self.lag_hist = Histogram([0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5])  # submit -> committed
+
+    def init_app(self, app):
+        self.app = app
+        os.makedirs(self.journal_dir, exist_ok=True)
+        with app.app_context():
+            try:
+                from database import ensure_write_ids
+                ensure_write_ids()
+            except Exception as e:
+                print(f"WriteBehind: could not check the write_id columns: {e}")
+        self.recover()
+
+    # --- process-local state -------------------------------------------------
+
+    def _reset_process_state(self):
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._journal = None
+        self._journal_path = None
+        self._journal_id = None
+        self._seq = 0
+        self._applied_seq = 0
+        self._pending_by_user = {}
+        self._unapplied = {}  # seq -> journal line, what a compaction keeps
+        self._foreign = {}  # Other workers' journals: path -> [inode, bytes read, applied seq, {seq: user_id}]
+        self._foreign_lock = threading.Lock()
+
+    @property
+    def journal_path(self):
+        """
+        This process's journal (None until the first submit).
+        """
+        return self._journal_path if self._pid == os.getpid() else None
+
+    @staticmethod
+    def _journal_owner(path):
+        # journal-<pid>-<boot id>.jsonl (or journal-<pid>.jsonl from older versions)
+        name = os.path.basename(path)[len("journal-"):-len(".jsonl")]
+        try:
+            return int(name.split("-", 1)[0])
+        except ValueError:
+            return None
+
+    def _ensure_worker(self):
+        # Journal + collector thread belong to the serving process; after a
+        # fork (gunicorn --preload) each worker opens its own journal.
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._reset_process_state()
+                self._pid = os.getpid()
+                os.makedirs(self.journal_dir, exist_ok=True)
+                self._journal_id = f"{self._pid}-{uuid.uuid4().hex[:12]}"
+                self._journal_path = os.path.join(self.journal_dir, f"journal-{self._journal_id}.jsonl")
+                self._journal = self._new_journal([])
+                # A replacement worker picks up what a crashed one left behind
+                self.recover()
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _new_journal(self, lines):
+        """
+        Open a journal file holding `lines` and move it into place under
+        self._journal_path (replacing the current one, if any). It is
+        locked before it is visible under its journal-*.jsonl name, so
+        recover() in another process can never take it for a dead one.
+        """
+        journal = open(self._journal_path + ".new", "w+", encoding="utf-8")
+        if fcntl is not None:
+            fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        journal.writelines(lines)
+        journal.flush()
+        if self.fsync and lines:
+            os.fsync(journal.fileno())
+        os.rename(self._journal_path + ".new", self._journal_path)
+        return journal
+
+    def _rotate(self):
+        # Caller holds self._cond: swap in a journal with only the unapplied turns
+        journal = self._new_journal(list(self._unapplied.values()))
+        self._journal.close()
+        self._journal = journal
+
+    def _append(self, record):
+        # Caller holds self._cond
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._journal.write(line)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        return line
+
+    # --- producer side -------------------------------------------------------
+
+    def submit(self, user_id, messages=(), assessments=(), memories=()):
+        """
+        Queue one turn's writes. Rows are plain dicts of column values;
+        memories are dicts with text, metadata and an optional embedding.
+        Timestamps are taken now, so history order follows request order
+        rather than commit order. Returns the journal sequence number.
+        """
+        now = datetime.utcnow()
+        entry = {
+            "user_id": str(user_id),
+            "submitted_at": time.time(),
+            "messages": [],
+            "assessments": [],
+            "memories": []
+        }
+        for i, m in enumerate(messages):
+            row = dict(m)
+            # Keep the user/bot pair strictly ordered even with equal clocks
+            row.setdefault("timestamp", (now + timedelta(microseconds=i)).isoformat())
+            entry["messages"].append(row)
+        for a in assessments:
+            row = dict(a)
+            if row.get("confidence_score") is not None:
+                row["confidence_score"] = float(row["confidence_score"])
+            row.setdefault("timestamp", now.isoformat())
+            entry["assessments"].append(row)
+        for mem in memories:
+            entry["memories"].append({
+                "text": mem["text"],
+                "metadata": dict(mem.get("metadata") or {}),
+                "timestamp": datetime.now().isoformat(),
+                "embedding": _encode_vector(mem.get("embedding"))
+            })
+
+        if not self.enabled:
+            # Synchronous mode (debugging): same apply path, on the request thread
+            self._apply([entry])
+            return 0
+
+        self._ensure_worker()
+        with self._cond:
+            self._seq += 1
+            entry["seq"] = self._seq
+            entry["journal"] = self._journal_id
+            self._unapplied[entry["seq"]] = self._append(entry)
+            self._pending_by_user[entry["user_id"]] = self._pending_by_user.get(entry["user_id"], 0) + 1
+            # Enqueued under the lock so the worker sees turns in seq order
+            self._queue.put(entry)
+        return entry["seq"]
+
+    # --- read-your-writes ----------------------------------------------------
+
+    def wait_for_user(self, user_id, timeout=None):
+        """
+        Block until every queued turn for this user is committed.
+        Returns False if it gave up after `timeout` seconds.
+        """
+        if not self.enabled or user_id is None:
+            return True
+        user_id = str(user_id)
+        timeout = self.read_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        if self._pid == os.getpid():
+            with self._cond:
+                while self._pending_by_user.get(user_id):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        print(f"WriteBehind: read for user {user_id} timed out waiting on local writes")
+                        return False
+                    self._cond.wait(remaining)
+
+        # Another worker process may still hold writes for this user
+        while self._foreign_pending(user_id):
+            if time.monotonic() >= deadline:
+                print(f"WriteBehind: read for user {user_id} timed out waiting on another worker")
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _foreign_pending(self, user_id):
+        own = self.journal_path
+        paths = set(glob.glob(os.path.join(self.journal_dir, "journal-*.jsonl"))) - {own}
+        with self._foreign_lock:
+            for gone in set(self._foreign) - paths:
+                del self._foreign[gone]
+            return any(user_id in self._scan_foreign(path) for path in paths)
+
+    def _scan_foreign(self, path):
+        """
+        User ids with unapplied turns in another worker's journal. Only the
+        bytes appended since the last call are parsed; a rotated journal
+        (new inode) is read again from the start.
+        """
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                state = self._foreign.get(path)
+                if state is None or state[0] != inode:
+                    state = self._foreign[path] = [inode, 0, 0, {}]
+                f.seek(state[1])
+                data = f.read()
+        except OSError:
+            self._foreign.pop(path, None)
+            return ()
+        complete = data.rfind(b"\n") + 1  # A torn tail is read again next time
+        state[1] += complete
+        applied = state[2]
+        for line in data[:complete].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "applied" in record:
+                applied = max(applied, record["applied"])
+            else:
+                state[3][record["seq"]] = record["user_id"]
+        if applied != state[2]:
+            state[2] = applied
+            state[3] = {seq: user for seq, user in state[3].items() if seq > applied}
+        return set(state[3].values())
+
+    @staticmethod
+    def _read_journal(path):
+        entries = []
+        applied = 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn tail of an in-progress write
+                    if "applied" in record:
+                        applied = max(applied, record["applied"])
+                    else:
+                        entries.append(record)
+        except OSError:
+            pass
+        return entries, applied
+
+    # --- consumer side -------------------------------------------------------
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            self._apply(batch)
+
+            now = time.time()
+            for entry in batch:
+                self.lag_hist.observe(now - entry["submitted_at"])
+            with self._cond:
+                self._applied_seq = batch[-1]["seq"]
+                for entry in batch:
+                    self._unapplied.pop(entry["seq"], None)
+                if self._journal is None:
+                    pass  # Closed at shutdown
+                elif self._applied_seq == self._seq or self._journal.tell() >= self.compact_bytes:
+                    # Drained (nothing left to replay) or large: keep only the unapplied tail
+                    self._rotate()
+                else:
+                    self._append({"applied": self._applied_seq})
+                for entry in batch:
+                    left = self._pending_by_user.get(entry["user_id"], 1) - 1
+                    if left:
+                        self._pending_by_user[entry["user_id"]] = left
+                    else:
+                        self._pending_by_user.pop(entry["user_id"], None)
+                self._cond.notify_all()
+
+    def _apply(self, batch):
+        """
+        One SQL transaction + one Chroma batch for the whole group. If the
+        group commit fails, entries are retried one by one so a single bad
+        turn can't hold up everyone else; entries that still fail are
+        written to a .failed file next to the journal.
+        """
+        from database import db
+
+        started = time.perf_counter()
+        self.batch_size_hist.observe(len(batch))
+        with self.app.app_context():
+            try:
+                existing = self._existing_write_ids(batch)
+                for entry in batch:
+                    self._add_rows(db, entry, existing)
+                db.session.commit()
+                committed = batch
+            except Exception as e:
+                db.session.rollback()
+                print(f"WriteBehind: group commit of {len(batch)} turns failed ({e}), retrying individually")
+                committed = []
+                for entry in batch:
+                    try:
+                        self._add_rows(db, entry, self._existing_write_ids([entry]))
+                        db.session.commit()
+                        committed.append(entry)
+                    except Exception as e:
+                        db.session.rollback()
+                        self._dead_letter(entry, e)
+        self.commit_time_hist.observe(time.perf_counter() - started)
+
+        memories = []
+        for entry in committed:
+            for i, mem in enumerate(entry["memories"]):
+                memories.append({
+                    # Deterministic id: replaying a journal never duplicates a memory
+                    "id": f"wb-{entry['user_id']}-{entry.get('seq', 0)}-{mem['timestamp']}-{i}",
+                    "user_id": entry["user_id"],
+                    "text": mem["text"],
+                    "metadata": mem["metadata"],
+                    "timestamp": mem["timestamp"],
+                    "embedding": _decode_vector(mem["embedding"])
+                })
+        if memories and self.memory is not None:
+            try:
+                self.memory.add_memories(memories)
+            except Exception as e:
+                print(f"WriteBehind: memory batch of {len(memories)} failed: {e}")
+
+    @staticmethod
+    def _write_ids(entry, kind, rows):
+        # Unique per journal (boot id), turn and row; None for synchronous writes
+        if not entry.get("journal"):
+            return [None] * len(rows)
+        return [f"{entry['journal']}-{entry['seq']}-{kind}{i}" for i in range(len(rows))]
+
+    def _existing_write_ids(self, batch):
+        """
+        write_ids of the batch already in the database: rows of a replayed
+        turn that was committed before the crash, skipped by _add_rows.
+        """
+        from database import ChatMessage, Assessment
+
+        existing = set()
+        for model, kind, key in ((ChatMessage, "m", "messages"), (Assessment, "a", "assessments")):
+            ids = [w for entry in batch for w in self._write_ids(entry, kind, entry[key]) if w]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                existing.update(w for (w,) in model.query.with_entities(model.write_id)
+                                .filter(model.write_id.in_(chunk)))
+        return existing
+
+    def _add_rows(self, db, entry, existing=()):
+        from database import ChatMessage, Assessment
+
+        for model, kind, key in ((ChatMessage, "m", "messages"), (Assessment, "a", "assessments")):
+            for row, write_id in zip(entry[key], self._write_ids(entry, kind, entry[key])):
+                if write_id in existing:
+                    continue
+                row = dict(row, write_id=write_id)
+                row["timestamp"] = _parse_ts(row.get("timestamp"))
+                db.session.add(model(**row))
+
+    def _dead_letter(self, entry, error):
+        self.failed += 1
+        print(f"WriteBehind: dropping turn {entry.get('seq')} for user {entry['user_id']}: {error}")
+        try:
+            with open(os.path.join(self.journal_dir, "failed.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(entry, error=str(error))) + "\n")
+        except OSError:
+            pass
+
+    # --- recovery ------------------------------------------------------------
+
+    def recover(self):
+        """
+        Replay journals of processes that died with unapplied turns.
+        A live process holds an flock on its journal for its whole life, so
+        a journal we can lock belongs to a dead process, whatever its PID
+        (PIDs are reused, e.g. PID 1 in a restarted container). Without
+        fcntl, the owner PID must be gone.
+        """
+        if self.app is None or not self.enabled:
+            return
+        own = self.journal_path
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "journal-*.jsonl"))):
+            owner = self._journal_owner(path)
+            if path == own or owner is None:
+                continue
+            if fcntl is None and (owner == os.getpid() or _pid_alive(owner)):
+                continue
+            try:
+                with open(path, "a+", encoding="utf-8") as f:
+                    if fcntl is not None:
+                        try:
+                            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue  # Owner is alive
+                        if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                            continue  # Opened just before its owner rotated it: the owner is alive
+                    entries, applied = self._read_journal(path)
+                    journal = os.path.basename(path)[len("journal-"):-len(".jsonl")]
+                    for entry in entries:
+                        entry.setdefault("journal", journal)  # Written before entries carried it
+                    pending = [e for e in entries if e["seq"] > applied]
+                    if pending:
+                        print(f"WriteBehind: replaying {len(pending)} turns from {os.path.basename(path)}")
+                        for i in range(0, len(pending), self.batch_size):
+                            self._apply(pending[i:i + self.batch_size])
+                os.remove(path)
+            except OSError as e:
+                print(f"WriteBehind: could not recover {path}: {e}")
+            except Exception as e:
+                # Keep the journal for the next start (e.g. tables not created yet)
+                print(f"WriteBehind: recovery of {path} failed: {e}")
+
+    def close(self, timeout=5.0):
+        """
+        Give the worker a chance to drain at shutdown; whatever is left stays
+        in the journal and is replayed by the next process.
+        """
+        if self._pid != os.getpid() or self._journal is None:
+            return
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._applied_seq < self._seq and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            drained = self._applied_seq == self._seq
+            self._journal.close()
+            self._journal = None
+        if drained:
+            try:
+                os.remove(self._journal_path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._cond:
+            pending = self._seq - self._applied_seq if self._pid == os.getpid() else 0
+        return {
+            "enabled": self.enabled,
+            "pending_turns": pending,
+            "failed_turns": self.failed,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "commit_seconds": self.commit_time_hist.snapshot(),
+            "lag_seconds": self.lag_hist.snapshot()
+        }
@@ -0,0 +1,7 @@
+# WSGI entry point for production servers (see gunicorn.conf.py)
+from run import create_app
+from database import db
+
+app = create_app()
+with app.app_context():
+    db.create_all()